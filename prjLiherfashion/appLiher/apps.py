@@ -4,3 +4,5 @@ class AppliherConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'appLiher'
 
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,171 @@
+#sugerencias del buscador (autocompletado por nombre y referencia)
+
+import bisect
+import hashlib
+import threading
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from .busqueda import normalizar, palabras
+from .models import Producto
+
+
+CLAVE_VERSION = 'autocompletar:version'
+LONGITUD_MINIMA = 2
+
+
+def version_catalogo():
+    """
+    Versión de los datos de autocompletado, compartida entre procesos por la
+    caché. Cambia cada vez que se modifica un producto.
+    """
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        cache.add(CLAVE_VERSION, 1, None)
+        version = cache.get(CLAVE_VERSION, 1)
+    return version
+
+
+def _subir_version():
+    try:
+        cache.incr(CLAVE_VERSION)
+    except ValueError:
+        cache.set(CLAVE_VERSION, 1, None)
+
+
+def invalidar_autocompletar():
+    # Tras el commit: antes, otra petición podría reconstruir la lista con
+    # los datos sin confirmar y guardarla bajo la versión nueva
+    transaction.on_commit(_subir_version)
+
+
+# ============================================================
+# POSTGRESQL: pg_trgm
+# ============================================================
+
+class AutocompletarTrigramas:
+    """
+    Coincidencia difusa con los índices GIN gin_trgm_ops de nombre y
+    referencia (migración 0007).
+    """
+
+    def sugerir(self, texto, limite):
+        return list(
+            Producto.objects
+            .filter(estado='Activo')
+            .filter(Q(nombre__trigram_word_similar=texto) | Q(referencia__trigram_word_similar=texto))
+            .annotate(similitud=Greatest(
+                TrigramWordSimilarity(texto, 'nombre'),
+                TrigramWordSimilarity(texto, 'referencia'),
+            ))
+            .order_by('-similitud', 'nombre')
+            .values('idproducto', 'nombre', 'referencia')[:limite]
+        )
+
+
+# ============================================================
+# RESPALDO EN MEMORIA
+# ============================================================
+
+class AutocompletarPrefijos:
+    """
+    Lista ordenada de (palabra, producto) recorrida con bisect: cada palabra
+    del nombre o la referencia de un producto activo es un punto de entrada.
+    Se reconstruye cuando cambia version_catalogo().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._entradas = []
+        self._productos = {}
+
+    def _construir(self, version):
+        entradas = []
+        productos = {}
+        filas = Producto.objects.filter(estado='Activo').values_list('pk', 'nombre', 'referencia')
+        for producto_id, nombre, referencia in filas.iterator():
+            productos[producto_id] = (nombre, referencia, normalizar(nombre))
+            for palabra in set(palabras(nombre) + palabras(referencia) + [normalizar(referencia)]):
+                entradas.append((palabra, producto_id))
+        entradas.sort()
+        self._entradas = entradas
+        self._productos = productos
+        self._version = version
+
+    def _con_prefijo(self, termino):
+        inicio = bisect.bisect_left(self._entradas, (termino,))
+        for palabra, producto_id in self._entradas[inicio:]:
+            if not palabra.startswith(termino):
+                break
+            yield producto_id
+
+    def sugerir(self, texto, limite):
+        terminos = palabras(texto)
+        if not terminos:
+            return []
+        version = version_catalogo()
+        with self._lock:
+            if self._version != version:
+                self._construir(version)
+            candidatos = set(self._con_prefijo(terminos[0]))
+            for termino in terminos[1:]:
+                candidatos &= set(self._con_prefijo(termino))
+            productos = self._productos
+
+        consulta = normalizar(texto)
+        ordenados = sorted(
+            candidatos,
+            key=lambda pk: (not productos[pk][2].startswith(consulta), productos[pk][2])
+        )
+        return [
+            {'idproducto': pk, 'nombre': productos[pk][0], 'referencia': productos[pk][1]}
+            for pk in ordenados[:limite]
+        ]
+
+
+# ============================================================
+# SELECCIÓN DEL BACKEND
+# ============================================================
+
+_BACKENDS = {
+    'postgres': AutocompletarTrigramas,
+    'memoria': AutocompletarPrefijos,
+}
+_backend = None
+
+
+def obtener_backend():
+    """
+    Usa el mismo ajuste que la búsqueda (settings.BUSQUEDA_BACKEND).
+    """
+    global _backend
+    if _backend is None:
+        nombre = getattr(settings, 'BUSQUEDA_BACKEND', None)
+        if nombre is None:
+            nombre = 'postgres' if connection.vendor == 'postgresql' else 'memoria'
+        _backend = _BACKENDS[nombre]()
+    return _backend
+
+
+def sugerencias(texto, limite=8):
+    """
+    Top-N productos activos para el texto escrito. Las respuestas se guardan
+    en caché por versión del catálogo, así que no hace falta borrarlas.
+    """
+    consulta = ' '.join(palabras(texto))
+    if len(consulta) < LONGITUD_MINIMA:
+        return []
+    # La consulta va como hash: sin espacios ni acentos y de largo fijo
+    firma = hashlib.md5(consulta.encode()).hexdigest()
+    clave = f'autocompletar:{version_catalogo()}:{limite}:{firma}'
+    resultados = cache.get(clave)
+    if resultados is None:
+        resultados = obtener_backend().sugerir(consulta, limite)
+        cache.set(clave, resultados, getattr(settings, 'AUTOCOMPLETAR_TTL', 300))
+    return resultados
@@ -1,30 +1,101 @@
 #backend de autenticación por email.
 
-from django.contrib.auth.backends import BaseBackend
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from .limites import CubetaFichas
 
 UserModel = get_user_model()
 
-class EmailBackend(BaseBackend):
+BACKEND_EMAIL = 'appLiher.backends.EmailBackend'
+
+
+def normalizar_email(email):
+    return (email or '').strip().lower()
+
+
+def _cubetas():
+    recarga = getattr(settings, 'ACCESO_RECARGA_SEGUNDOS', 60)
+    intentos_ip = getattr(settings, 'ACCESO_INTENTOS_IP', 0)
+    return (
+        CubetaFichas('acceso:email', getattr(settings, 'ACCESO_INTENTOS_EMAIL', 5), recarga),
+        CubetaFichas('acceso:ip', intentos_ip, recarga) if intentos_ip else None,
+    )
+
+
+def ip_cliente(request):
+    """
+    IP del cliente para el límite por IP. Con ACCESO_CABECERA_IP se lee de
+    la cabecera que llena el proxy de confianza: cada proxy agrega al final
+    la dirección de quien le habló, así que la entrada fiable es la que
+    está ACCESO_PROXIES_CONFIABLES posiciones antes del final (las de más
+    a la izquierda las puede inventar el cliente).
+    """
+    if request is None:
+        return ''
+    cabecera = getattr(settings, 'ACCESO_CABECERA_IP', None)
+    if cabecera:
+        entradas = [e.strip() for e in request.META.get(cabecera, '').split(',') if e.strip()]
+        if entradas:
+            proxies = getattr(settings, 'ACCESO_PROXIES_CONFIABLES', 1)
+            return entradas[-min(proxies, len(entradas))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def verificar_credenciales(request, email, password):
     """
-    Backend simple para autenticación por email.
+    Retorna (resultado, usuario) con una sola consulta por índice y como
+    mucho un hash de contraseña. `resultado` es 'ok', 'inactivo',
+    'incorrecto' o 'limitado'. Los fallos consumen fichas por correo y,
+    si ACCESO_INTENTOS_IP está activo, por IP; sin fichas se rechaza antes
+    de consultar o de calcular el hash, que es lo que más CPU cuesta en
+    una ráfaga de intentos.
     """
-    def authenticate(self, request, email=None, password=None, **kwargs):
+    email = normalizar_email(email)
+    por_email, por_ip = _cubetas()
+    ip = ip_cliente(request)
+    if not ip:
+        por_ip = None
+    if not por_email.disponible(email) or (por_ip and not por_ip.disponible(ip)):
+        return 'limitado', None
+
+    user = UserModel._default_manager.filter(email=email).first()
+    if user is None:
+        # Mismo costo que una contraseña incorrecta, para no delatar qué
+        # correos existen por el tiempo de respuesta.
+        UserModel().set_password(password)
+        resultado = 'incorrecto'
+    elif not user.is_active:
+        resultado = 'inactivo'
+    elif user.check_password(password):
+        # check_password vuelve a guardar el hash si PASSWORD_HASHERS cambió
+        por_email.reiniciar(email)
+        return 'ok', user
+    else:
+        resultado = 'incorrecto'
+
+    por_email.consumir(email)
+    if por_ip:
+        por_ip.consumir(ip)
+    return resultado, user
+
+
+class EmailBackend(ModelBackend):
+    """
+    Autenticación por email (también el login del admin de Django, que
+    envía el correo como `username`). Si la petición trae credenciales de
+    email, este backend decide: ante un fallo corta la cadena con
+    PermissionDenied para que los demás backends no repitan la consulta ni
+    el hash.
+    """
+
+    def authenticate(self, request, email=None, password=None, username=None, **kwargs):
+        email = email or username
         if email is None or password is None:
             return None
-        try:
-            user = UserModel.objects.get(email__iexact=email)
-        except UserModel.DoesNotExist:
-            return None
-        if user.check_password(password) and self.user_can_authenticate(user):
-            return user
-        return None
-
-    def get_user(self, user_id):
-        try:
-            return UserModel.objects.get(pk=user_id)
-        except UserModel.DoesNotExist:
-            return None
-
-    def user_can_authenticate(self, user):
-        return getattr(user, "is_active", True)
+        resultado, user = verificar_credenciales(request, email, password)
+        if resultado != 'ok':
+            raise PermissionDenied
+        return user
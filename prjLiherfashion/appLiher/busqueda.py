@@ -0,0 +1,253 @@
+#búsqueda de productos por texto (parámetro q del catálogo)
+
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+
+from .models import Producto
+
+
+# Configuración de texto creada en la migración 0006 (spanish + unaccent)
+CONFIG_BUSQUEDA = 'es_unaccent'
+
+# Peso de cada campo en el ranking: nombre y referencia pesan más
+PESOS = {'nombre': 'A', 'referencia': 'A', 'descripcion': 'B'}
+CAMPOS_BUSQUEDA = set(PESOS)
+_VALOR_PESO = {'A': 1.0, 'B': 0.4}
+
+_PALABRA = re.compile(r'\w+')
+
+
+def normalizar(texto):
+    """
+    Minúsculas y sin tildes, igual que unaccent en PostgreSQL.
+    """
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def palabras(texto):
+    return _PALABRA.findall(normalizar(texto))
+
+
+def raiz(palabra):
+    """
+    Reducción simple de plurales en español para el índice en memoria
+    (camisas -> camisa, pantalones -> pantalon).
+    """
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] not in 'aeiou':
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s'):
+        return palabra[:-1]
+    return palabra
+
+
+def _sin_resultados(productos):
+    return productos.none().annotate(rango=Value(0.0, output_field=FloatField()))
+
+
+# ============================================================
+# POSTGRESQL: tsvector + índice GIN
+# ============================================================
+
+class BusquedaPostgres:
+    """
+    Usa la columna producto.vector_busqueda (tsvector con índice GIN).
+    Cada término se busca como prefijo para que "cami" encuentre "camisa".
+    """
+
+    def vector(self):
+        vector = None
+        for campo, peso in PESOS.items():
+            parcial = SearchVector(campo, weight=peso, config=CONFIG_BUSQUEDA)
+            vector = parcial if vector is None else vector + parcial
+        return vector
+
+    def actualizar(self, producto_id):
+        Producto.objects.filter(pk=producto_id).update(vector_busqueda=self.vector())
+
+    def eliminar(self, producto_id):
+        pass
+
+    def buscar(self, productos, texto):
+        terminos = palabras(texto)
+        if not terminos:
+            return _sin_resultados(productos)
+        consulta = SearchQuery(
+            ' & '.join(f'{termino}:*' for termino in terminos),
+            search_type='raw',
+            config=CONFIG_BUSQUEDA
+        )
+        return (
+            productos
+            .filter(vector_busqueda=consulta)
+            .annotate(rango=SearchRank(F('vector_busqueda'), consulta))
+        )
+
+
+# ============================================================
+# RESPALDO EN MEMORIA (SQLite / pruebas)
+# ============================================================
+
+class BusquedaIndiceInvertido:
+    """
+    Índice invertido en memoria del proceso: raíz -> {producto: puntaje}.
+    Se construye la primera vez que se busca, se mantiene con
+    actualizar()/eliminar() desde las señales de Producto y se reconstruye
+    cuando cambia la versión del catálogo, que comparten los procesos por
+    la caché (así un worker ve lo que se editó en otro).
+    Solo los BUSQUEDA_MAX_RESULTADOS más relevantes llegan a la consulta:
+    el orden se arma con un CASE por producto y con miles de coincidencias
+    era más lento que el icontains que reemplaza.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._indice = None
+        self._terminos = []
+        self._por_producto = {}
+
+    def _puntajes(self, nombre, referencia, descripcion):
+        puntajes = defaultdict(float)
+        for campo, texto in (('nombre', nombre), ('referencia', referencia), ('descripcion', descripcion)):
+            for palabra in palabras(texto):
+                puntajes[raiz(palabra)] += _VALOR_PESO[PESOS[campo]]
+        return puntajes
+
+    def _agregar(self, producto_id, puntajes):
+        self._por_producto[producto_id] = list(puntajes)
+        for termino, puntaje in puntajes.items():
+            if termino not in self._indice:
+                bisect.insort(self._terminos, termino)
+                self._indice[termino] = {}
+            self._indice[termino][producto_id] = puntaje
+
+    def _quitar(self, producto_id):
+        for termino in self._por_producto.pop(producto_id, []):
+            self._indice[termino].pop(producto_id, None)
+
+    def _construir(self, version):
+        self._version = version
+        self._indice = {}
+        self._terminos = []
+        self._por_producto = {}
+        filas = Producto.objects.values_list('pk', 'nombre', 'referencia', 'descripcion')
+        for producto_id, nombre, referencia, descripcion in filas.iterator():
+            self._agregar(producto_id, self._puntajes(nombre, referencia, descripcion))
+
+    def actualizar(self, producto_id):
+        with self._lock:
+            if self._indice is None:
+                return
+            self._quitar(producto_id)
+            fila = (
+                Producto.objects
+                .filter(pk=producto_id)
+                .values_list('nombre', 'referencia', 'descripcion')
+                .first()
+            )
+            if fila:
+                self._agregar(producto_id, self._puntajes(*fila))
+
+    def eliminar(self, producto_id):
+        with self._lock:
+            if self._indice is not None:
+                self._quitar(producto_id)
+
+    def _coincidencias(self, termino):
+        # Todas las raíces que empiezan por el término (búsqueda por prefijo)
+        resultado = defaultdict(float)
+        inicio = bisect.bisect_left(self._terminos, termino)
+        for clave in self._terminos[inicio:]:
+            if not clave.startswith(termino):
+                break
+            for producto_id, puntaje in self._indice[clave].items():
+                resultado[producto_id] = max(resultado[producto_id], puntaje)
+        return resultado
+
+    def buscar(self, productos, texto):
+        # Importado aquí: appLiher.autocompletar importa este módulo
+        from .autocompletar import version_catalogo
+
+        terminos = [raiz(palabra) for palabra in palabras(texto)]
+        if not terminos:
+            return _sin_resultados(productos)
+        version = version_catalogo()
+        with self._lock:
+            if self._indice is None or self._version != version:
+                self._construir(version)
+            rangos = None
+            for termino in terminos:
+                coincidencias = self._coincidencias(termino)
+                if rangos is None:
+                    rangos = coincidencias
+                else:
+                    rangos = {
+                        producto_id: rango + coincidencias[producto_id]
+                        for producto_id, rango in rangos.items()
+                        if producto_id in coincidencias
+                    }
+        if not rangos:
+            return _sin_resultados(productos)
+        tope = getattr(settings, 'BUSQUEDA_MAX_RESULTADOS', 240)
+        if len(rangos) > tope:
+            # A igual relevancia se prefieren los productos más nuevos (id mayor)
+            rangos = dict(heapq.nlargest(tope, rangos.items(), key=lambda par: (par[1], par[0])))
+        return productos.filter(pk__in=rangos).annotate(
+            rango=Case(
+                *[When(pk=producto_id, then=Value(rango)) for producto_id, rango in rangos.items()],
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        )
+
+
+# ============================================================
+# SELECCIÓN DEL BACKEND
+# ============================================================
+
+_BACKENDS = {
+    'postgres': BusquedaPostgres,
+    'memoria': BusquedaIndiceInvertido,
+}
+_backend = None
+
+
+def obtener_backend():
+    """
+    settings.BUSQUEDA_BACKEND ('postgres' o 'memoria'); por defecto se elige
+    según el motor de la base de datos.
+    """
+    global _backend
+    if _backend is None:
+        nombre = getattr(settings, 'BUSQUEDA_BACKEND', None)
+        if nombre is None:
+            nombre = 'postgres' if connection.vendor == 'postgresql' else 'memoria'
+        _backend = _BACKENDS[nombre]()
+    return _backend
+
+
+def buscar_productos(productos, texto):
+    """
+    Filtra el queryset por el texto buscado y lo ordena por relevancia
+    (anotación `rango`), conservando el orden previo como desempate.
+    """
+    orden = list(productos.query.order_by)
+    return obtener_backend().buscar(productos, texto).order_by('-rango', *orden)
+
+
+def actualizar_producto(producto_id):
+    obtener_backend().actualizar(producto_id)
+
+
+def eliminar_producto(producto_id):
+    obtener_backend().eliminar(producto_id)
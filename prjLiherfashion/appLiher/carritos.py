@@ -0,0 +1,412 @@
+#operaciones sobre el carrito que mantienen sus totales desnormalizados
+
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.utils import timezone
+
+from .detalle_productos import invalidar_detalle_variantes
+from .models import Carrito, ItemCarrito, ReservaStock, VarianteProducto
+from .reservas import (
+    duracion_reserva,
+    fijar_reserva,
+    liberar_reservas_carrito,
+    liberar_reservas_carritos,
+    reservas_liberadas,
+)
+from .stock import escribir_stock
+
+logger = logging.getLogger(__name__)
+
+
+# Clave de sesión donde se guarda el contador del ícono del carrito
+CLAVE_CONTADOR = 'carrito_items'
+
+
+def _ajustar_totales(carrito_id, delta_items, delta_subtotal):
+    """
+    Suma (o resta) al contador y subtotal guardados en el carrito
+    con una sola sentencia UPDATE atómica.
+    """
+    Carrito.objects.filter(pk=carrito_id).update(
+        cantidad_items=F('cantidad_items') + delta_items,
+        subtotal=F('subtotal') + delta_subtotal,
+        fecha_actualizacion=timezone.now()
+    )
+
+
+def agregar_item(carrito, variante, cantidad):
+    """
+    Agrega una variante al carrito o incrementa su cantidad, reservando
+    el stock correspondiente.
+    Lanza ValueError si no hay stock disponible para la cantidad final.
+    """
+    with transaction.atomic():
+        # select_for_update no bloquea un ítem que aún no existe: se bloquea
+        # el carrito para que dos agregados simultáneos de la misma variante
+        # no creen dos ítems ni dos reservas
+        Carrito.objects.select_for_update().only('pk').get(pk=carrito.pk)
+        item, creado = ItemCarrito.objects.select_for_update().get_or_create(
+            carrito=carrito,
+            producto=variante,
+            defaults={
+                'cantidad': cantidad,
+                'precio_unitario': variante.producto.precio
+            }
+        )
+        fijar_reserva(carrito.pk, variante.pk, cantidad if creado else item.cantidad + cantidad)
+        if not creado:
+            ItemCarrito.objects.filter(pk=item.pk).update(cantidad=F('cantidad') + cantidad)
+            item.cantidad += cantidad
+        _ajustar_totales(carrito.pk, cantidad, cantidad * item.precio_unitario)
+    return item, creado
+
+
+def actualizar_cantidad_item(item, cantidad):
+    """
+    Fija la cantidad de un ítem, ajusta su reserva de stock y los totales.
+    Lanza ValueError si no hay stock disponible para la nueva cantidad.
+    """
+    with transaction.atomic():
+        actual = ItemCarrito.objects.select_for_update().get(pk=item.pk)
+        fijar_reserva(actual.carrito_id, actual.producto_id, cantidad)
+        diferencia = cantidad - actual.cantidad
+        ItemCarrito.objects.filter(pk=item.pk).update(cantidad=cantidad)
+        _ajustar_totales(actual.carrito_id, diferencia, diferencia * actual.precio_unitario)
+    item.cantidad = cantidad
+    return item
+
+
+def eliminar_item(item):
+    """
+    Elimina un ítem, libera su reserva y descuenta su aporte de los totales.
+    """
+    with transaction.atomic():
+        actual = ItemCarrito.objects.select_for_update().filter(pk=item.pk).first()
+        if actual is None:
+            return
+        fijar_reserva(actual.carrito_id, actual.producto_id, 0)
+        actual.delete()
+        _ajustar_totales(actual.carrito_id, -actual.cantidad, -actual.total_precio)
+
+
+def vaciar_carrito(carrito):
+    """
+    Elimina todos los ítems del carrito y deja los totales en cero.
+    Retorna el número de ítems eliminados.
+    """
+    with transaction.atomic():
+        liberar_reservas_carrito(carrito.pk)
+        eliminados, _ = ItemCarrito.objects.filter(carrito=carrito).delete()
+        Carrito.objects.filter(pk=carrito.pk).update(
+            cantidad_items=0, subtotal=Decimal('0.00'),
+            fecha_actualizacion=timezone.now()
+        )
+    carrito.cantidad_items = 0
+    carrito.subtotal = Decimal('0.00')
+    return eliminados
+
+
+def descontar_variantes(variante_ids):
+    """
+    Antes de borrar variantes, descuenta de los totales de cada carrito
+    los ítems que la cascada va a eliminar (una consulta agregada y un
+    UPDATE por carrito afectado).
+    """
+    afectados = (
+        ItemCarrito.objects
+        .filter(producto_id__in=variante_ids)
+        .values('carrito')
+        .annotate(
+            items=Sum('cantidad'),
+            total=Sum(
+                F('cantidad') * F('precio_unitario'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+    )
+    for fila in afectados:
+        _ajustar_totales(fila['carrito'], -fila['items'], -fila['total'])
+
+
+def recargar_totales(carrito):
+    """
+    Lee de nuevo solo los campos de totales del carrito.
+    """
+    carrito.refresh_from_db(fields=['cantidad_items', 'subtotal'])
+    return carrito
+
+
+def reconciliar_totales(tamano_lote=500):
+    """
+    Recalcula los totales guardados a partir de las filas de ItemCarrito,
+    recorriendo los carritos por lotes de ids.
+    Retorna la lista de ids de carritos que estaban desfasados.
+    """
+    corregidos = []
+    ultimo_id = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                Carrito.objects
+                .select_for_update()
+                .filter(pk__gt=ultimo_id)
+                .order_by('pk')
+                .values_list('id', 'cantidad_items', 'subtotal')[:tamano_lote]
+            )
+            if not lote:
+                break
+            ultimo_id = lote[-1][0]
+
+            reales = {
+                fila['carrito']: (fila['items'], fila['total'])
+                for fila in (
+                    ItemCarrito.objects
+                    .filter(carrito_id__in=[carrito_id for carrito_id, _, _ in lote])
+                    .values('carrito')
+                    .annotate(
+                        items=Sum('cantidad'),
+                        total=Sum(
+                            F('cantidad') * F('precio_unitario'),
+                            output_field=DecimalField(max_digits=12, decimal_places=2)
+                        )
+                    )
+                )
+            }
+
+            for carrito_id, cantidad_items, subtotal in lote:
+                items, total = reales.get(carrito_id, (0, Decimal('0.00')))
+                if cantidad_items != items or subtotal != total:
+                    Carrito.objects.filter(pk=carrito_id).update(
+                        cantidad_items=items, subtotal=total
+                    )
+                    corregidos.append(carrito_id)
+    return corregidos
+
+
+# ============================================================
+# PURGA DE CARRITOS ABANDONADOS
+# ============================================================
+
+def carritos_abandonados(dias=None, incluir_usuarios=False):
+    """
+    Carritos sin completar y sin actividad en los últimos `dias`
+    (CARRITO_ABANDONADO_DIAS por defecto). Solo los de invitados, salvo
+    que se pida incluir también los de usuarios registrados.
+    """
+    if dias is None:
+        dias = getattr(settings, 'CARRITO_ABANDONADO_DIAS', 14)
+    limite = timezone.now() - timedelta(days=dias)
+    carritos = Carrito.objects.filter(completado=False, fecha_actualizacion__lt=limite)
+    if not incluir_usuarios:
+        carritos = carritos.filter(usuario__isnull=True)
+    return carritos
+
+
+def purgar_carritos_abandonados(dias=None, incluir_usuarios=False, tamano_lote=500, simular=False):
+    """
+    Borra los carritos abandonados por lotes de ids, cada lote en su propia
+    transacción corta: las filas que otra petición tiene bloqueadas se
+    saltan y, si se interrumpe, volver a ejecutarla sigue donde quedó.
+    Con simular=True solo cuenta. Retorna un diccionario de métricas.
+    """
+    inicio = time.monotonic()
+    candidatos = carritos_abandonados(dias, incluir_usuarios)
+    metricas = {'carritos': 0, 'items': 0, 'unidades_liberadas': 0, 'lotes': 0}
+
+    if simular:
+        conteo = candidatos.aggregate(carritos=Count('pk'), items=Count('items_carrito'))
+        metricas.update(carritos=conteo['carritos'], items=conteo['items'])
+    else:
+        ultimo_id = 0
+        while True:
+            with transaction.atomic():
+                ids = list(
+                    candidatos
+                    .filter(pk__gt=ultimo_id)
+                    .order_by('pk')
+                    .select_for_update(skip_locked=True)
+                    .values_list('pk', flat=True)[:tamano_lote]
+                )
+                if not ids:
+                    break
+                ultimo_id = ids[-1]
+                metricas['unidades_liberadas'] += liberar_reservas_carritos(ids)
+                metricas['items'] += ItemCarrito.objects.filter(carrito_id__in=ids).delete()[0]
+                with reservas_liberadas():
+                    metricas['carritos'] += Carrito.objects.filter(pk__in=ids).delete()[0]
+                metricas['lotes'] += 1
+
+    metricas['segundos'] = round(time.monotonic() - inicio, 2)
+    logger.info(
+        "Purga de carritos%s: %d carritos, %d ítems, %d unidades liberadas, %d lotes en %s s",
+        " (simulación)" if simular else "", metricas['carritos'], metricas['items'],
+        metricas['unidades_liberadas'], metricas['lotes'], metricas['segundos']
+    )
+    return metricas
+
+
+# ============================================================
+# FUSIÓN DEL CARRITO DE INVITADO AL INICIAR SESIÓN
+# ============================================================
+
+def fusionar_carrito_invitado(carrito_invitado_id, usuario):
+    """
+    Pasa los ítems del carrito anónimo al carrito abierto del usuario,
+    sumando cantidades por variante y recortándolas al stock disponible
+    (contando lo que ya reservaban ambos carritos). Usa un número fijo de
+    sentencias sin importar cuántos ítems tenga el carrito.
+    Retorna el carrito del usuario, o None si no había nada que fusionar.
+    """
+    with transaction.atomic():
+        invitado = (
+            Carrito.objects
+            .select_for_update()
+            .filter(pk=carrito_invitado_id, usuario__isnull=True, completado=False)
+            .first()
+        )
+        if invitado is None:
+            return None
+        carrito, _ = Carrito.objects.get_or_create(usuario=usuario, completado=False)
+
+        items = list(ItemCarrito.objects.filter(carrito_id__in=[invitado.pk, carrito.pk]))
+        if not items:
+            invitado.delete()
+            return carrito
+
+        # Variantes bloqueadas en orden de id, como en reservas._liberar
+        variantes = {
+            variante.pk: variante
+            for variante in (
+                VarianteProducto.objects
+                .select_for_update()
+                .filter(pk__in={item.producto_id for item in items})
+                .order_by('pk')
+                .only('stock', 'stock_reservado')
+            )
+        }
+        reservado_propio = {}
+        for variante_id, cantidad in (
+            ReservaStock.objects
+            .filter(carrito_id__in=[invitado.pk, carrito.pk])
+            .values_list('variante_id', 'cantidad')
+        ):
+            reservado_propio[variante_id] = reservado_propio.get(variante_id, 0) + cantidad
+
+        del_usuario = {item.producto_id: item for item in items if item.carrito_id == carrito.pk}
+        del_invitado = {item.producto_id: item for item in items if item.carrito_id == invitado.pk}
+
+        actualizar, mover, borrar = [], [], []
+        finales = {}
+        for variante_id, variante in variantes.items():
+            propio = reservado_propio.get(variante_id, 0)
+            maximo = max(variante.stock - variante.stock_reservado + propio, 0)
+            existente = del_usuario.get(variante_id)
+            nuevo = del_invitado.get(variante_id)
+            deseado = (existente.cantidad if existente else 0) + (nuevo.cantidad if nuevo else 0)
+            final = min(deseado, maximo)
+
+            item = existente or nuevo
+            if existente and nuevo:
+                borrar.append(nuevo.pk)
+            elif nuevo:
+                mover.append(nuevo.pk)
+            if final == 0:
+                borrar.append(item.pk)
+            elif final != item.cantidad:
+                item.cantidad = final
+                actualizar.append(item)
+            # Ajuste de lo reservado con la fila ya bloqueada
+            variante.stock_reservado = max(variante.stock_reservado - propio + final, 0)
+            finales[variante_id] = final
+
+        if mover:
+            ItemCarrito.objects.filter(pk__in=mover).update(carrito=carrito)
+        if actualizar:
+            ItemCarrito.objects.bulk_update(actualizar, ['cantidad'])
+        if borrar:
+            ItemCarrito.objects.filter(pk__in=borrar).delete()
+        VarianteProducto.objects.bulk_update(variantes.values(), ['stock_reservado'])
+
+        ReservaStock.objects.filter(carrito_id__in=[invitado.pk, carrito.pk]).delete()
+        expira = timezone.now() + duracion_reserva()
+        ReservaStock.objects.bulk_create([
+            ReservaStock(
+                carrito=carrito, variante_id=variante_id,
+                cantidad=cantidad, expira=expira
+            )
+            for variante_id, cantidad in finales.items() if cantidad
+        ])
+        # Ya sin ítems ni reservas: la señal de borrado no tiene nada que liberar
+        invitado.delete()
+
+        totales = ItemCarrito.objects.filter(carrito=carrito).aggregate(
+            items=Sum('cantidad'),
+            total=Sum(
+                F('cantidad') * F('precio_unitario'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+        carrito.cantidad_items = totales['items'] or 0
+        carrito.subtotal = totales['total'] or Decimal('0.00')
+        Carrito.objects.filter(pk=carrito.pk).update(
+            cantidad_items=carrito.cantidad_items, subtotal=carrito.subtotal,
+            fecha_actualizacion=timezone.now()
+        )
+        escribir_stock(list(variantes))
+        invalidar_detalle_variantes(list(variantes))
+    return carrito
+
+
+# ============================================================
+# CONTADOR DEL CARRITO (BADGE)
+# ============================================================
+
+def guardar_contador(request, cantidad):
+    """
+    Escribe en la sesión el contador que muestra el ícono del carrito.
+    Las vistas que modifican el carrito lo llaman con el total ya recargado.
+    Si el valor no cambió no se toca la sesión, así no hay que guardarla.
+    """
+    if request.session.get(CLAVE_CONTADOR) != cantidad:
+        request.session[CLAVE_CONTADOR] = cantidad
+
+
+def invalidar_contador(request):
+    """
+    Descarta el contador guardado para que se vuelva a leer del carrito.
+    """
+    request.session.pop(CLAVE_CONTADOR, None)
+
+
+def contador_carrito(request):
+    """
+    Retorna el número de productos en el carrito de la sesión.
+    Solo consulta la base de datos si el contador no está en la sesión.
+    """
+    contador = request.session.get(CLAVE_CONTADOR)
+    if contador is not None:
+        return contador
+
+    if request.user.is_authenticated:
+        filtro = {'usuario': request.user}
+    else:
+        carrito_id = request.session.get('carrito_id')
+        if not carrito_id:
+            # Visitante sin carrito: no se escribe la sesión
+            return 0
+        filtro = {'id': carrito_id, 'usuario__isnull': True}
+
+    contador = (
+        Carrito.objects
+        .filter(completado=False, **filtro)
+        .values_list('cantidad_items', flat=True)
+        .first()
+    ) or 0
+    guardar_contador(request, contador)
+    return contador
@@ -0,0 +1,21 @@
+#verificaciones de configuración para el despliegue (manage.py check --deploy)
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def revisar_cache_compartida(app_configs, **kwargs):
+    """
+    Las invalidaciones de caché, las claves de idempotencia y el límite de
+    intentos de acceso solo funcionan entre procesos con una caché compartida.
+    """
+    if getattr(settings, 'CACHE_COMPARTIDA', False):
+        return []
+    return [
+        Warning(
+            "La caché es local a cada proceso.",
+            hint="Define REDIS_URL si corres varios workers de gunicorn o los workers de docker-compose.",
+            id='appLiher.W001',
+        )
+    ]
@@ -0,0 +1,12 @@
+#context processors de la tienda
+
+from .carritos import contador_carrito
+
+
+def carrito_context(request):
+    """
+    Context processor para mostrar el contador del carrito en todas las páginas.
+    """
+    return {
+        'carrito_count': contador_carrito(request)
+    }
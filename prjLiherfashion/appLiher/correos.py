@@ -0,0 +1,227 @@
+#correos de la tienda: composición, bandeja de salida y envío desde un worker
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .models import CorreoPendiente
+
+logger = logging.getLogger(__name__)
+
+
+ASUNTO_ACTIVACION = 'Activa tu cuenta en Liher Fashion'
+ASUNTO_REENVIO_ACTIVACION = 'Reenvío: Activa tu cuenta en Liher Fashion'
+ASUNTO_RESET = 'Restablece tu contraseña en Liher Fashion'
+
+
+# ============================================================
+# BANDEJA DE SALIDA
+# ============================================================
+
+def nuevo_correo(asunto, texto, destinatarios, html=None, remitente=None):
+    """
+    CorreoPendiente sin guardar, para encolarlo solo o junto con otros
+    (ver encolar_correos).
+    """
+    return CorreoPendiente(
+        asunto=asunto,
+        cuerpo_texto=texto or '',
+        cuerpo_html=html or '',
+        remitente=remitente or settings.DEFAULT_FROM_EMAIL or '',
+        destinatarios=list(destinatarios),
+    )
+
+
+def encolar_correo(asunto, texto, destinatarios, html=None, remitente=None):
+    """
+    Guarda el correo en la bandeja de salida. Si hay una transacción
+    abierta el correo se confirma (o se descarta) junto con ella, así no
+    sale un correo de un registro que se deshizo.
+    """
+    correo = nuevo_correo(asunto, texto, destinatarios, html=html, remitente=remitente)
+    correo.save()
+    return correo
+
+
+def encolar_correos(correos):
+    """
+    Encola varios correos con un solo INSERT; el worker los enviará por
+    la misma conexión SMTP si caen en el mismo lote.
+    """
+    return CorreoPendiente.objects.bulk_create(correos, batch_size=500)
+
+
+# ============================================================
+# COMPOSICIÓN DE CORREOS DE CUENTA
+# ============================================================
+
+def _renderizar(nombre, contexto):
+    # get_template pasa por el loader en caché de TEMPLATES: la plantilla
+    # se compila una vez por proceso y aquí solo se renderiza.
+    return get_template(nombre).render(contexto)
+
+
+def enlace_con_token(request, vista, user):
+    """
+    URL absoluta a `vista` (activar_cuenta, nueva_contrasena) con el uid y
+    el token de un solo uso del usuario.
+    """
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    return request.build_absolute_uri(reverse(vista, kwargs={'uidb64': uid, 'token': token}))
+
+
+def correo_activacion(user, request, asunto=ASUNTO_ACTIVACION):
+    contexto = {'user': user, 'activar_url': enlace_con_token(request, 'activar_cuenta', user)}
+    return nuevo_correo(
+        asunto,
+        _renderizar('usuarios/autenticacion/activacion_email.txt', contexto),
+        [user.email],
+        html=_renderizar('usuarios/autenticacion/activacion_email.html', contexto),
+    )
+
+
+def correo_reset(user, request):
+    reset_url = enlace_con_token(request, 'nueva_contrasena', user)
+    return nuevo_correo(
+        ASUNTO_RESET,
+        f"Hola {user.email}, usa este enlace para restablecer tu contraseña: {reset_url}",
+        [user.email],
+        html=_renderizar('usuarios/contrasena/correo_reset.html', {'user': user, 'reset_url': reset_url}),
+    )
+
+
+def enviar_activacion(user, request, asunto=ASUNTO_ACTIVACION):
+    correo = correo_activacion(user, request, asunto)
+    correo.save()
+    return correo
+
+
+def enviar_activaciones(usuarios, request, asunto=ASUNTO_REENVIO_ACTIVACION):
+    """
+    Encola el correo de activación de varios usuarios (p. ej. reenviarlo a
+    todos los administradores pendientes) con un solo INSERT.
+    """
+    return encolar_correos([correo_activacion(user, request, asunto) for user in usuarios])
+
+
+def enviar_reset(user, request):
+    correo = correo_reset(user, request)
+    correo.save()
+    return correo
+
+
+# ============================================================
+# ENVÍO (WORKER)
+# ============================================================
+
+def _max_intentos():
+    return getattr(settings, 'CORREOS_MAX_INTENTOS', 5)
+
+
+def _espera_reintento(intentos):
+    """
+    Espera exponencial antes del siguiente intento: 1, 2, 4, 8... minutos
+    hasta un máximo de una hora.
+    """
+    base = getattr(settings, 'CORREOS_REINTENTO_SEGUNDOS', 60)
+    return timedelta(seconds=min(base * 2 ** (intentos - 1), 3600))
+
+
+def _mensaje(correo, conexion):
+    mensaje = EmailMultiAlternatives(
+        correo.asunto, correo.cuerpo_texto,
+        correo.remitente or None, correo.destinatarios,
+        connection=conexion
+    )
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, "text/html")
+    return mensaje
+
+
+def _reclamar(tamano_lote):
+    """
+    Toma un lote de correos pendientes y les corre el próximo intento por
+    CORREOS_BLOQUEO_SEGUNDOS para que otro worker no los envíe a la vez.
+    Si este worker muere a mitad del lote, los correos vuelven a quedar
+    disponibles cuando vence ese plazo.
+    """
+    ahora = timezone.now()
+    bloqueo = timedelta(seconds=getattr(settings, 'CORREOS_BLOQUEO_SEGUNDOS', 300))
+    with transaction.atomic():
+        correos = list(
+            CorreoPendiente.objects
+            .filter(estado='pendiente', proximo_intento__lte=ahora)
+            .order_by('proximo_intento')
+            .select_for_update(skip_locked=True)[:tamano_lote]
+        )
+        if correos:
+            CorreoPendiente.objects.filter(pk__in=[c.pk for c in correos]).update(
+                intentos=F('intentos') + 1,
+                proximo_intento=ahora + bloqueo
+            )
+    for correo in correos:
+        correo.intentos += 1
+    return correos
+
+
+def _registrar_fallo(correo, error):
+    if correo.intentos >= _max_intentos():
+        estado, proximo = 'fallido', timezone.now()
+        logger.error("Correo %s descartado tras %d intentos: %s", correo.pk, correo.intentos, error)
+    else:
+        estado, proximo = 'pendiente', timezone.now() + _espera_reintento(correo.intentos)
+        logger.warning("Correo %s falló (intento %d): %s", correo.pk, correo.intentos, error)
+    CorreoPendiente.objects.filter(pk=correo.pk).update(
+        estado=estado, proximo_intento=proximo, ultimo_error=str(error)[:1000]
+    )
+
+
+def enviar_pendientes(tamano_lote=50):
+    """
+    Envía un lote de la bandeja de salida por una sola conexión SMTP.
+    Retorna (enviados, fallidos). Con CORREOS_BACKEND se puede usar otro
+    backend de Django, p. ej. el de memoria (locmem) en pruebas.
+    """
+    correos = _reclamar(tamano_lote)
+    if not correos:
+        return 0, 0
+
+    enviados = []
+    fallidos = 0
+    conexion = get_connection(getattr(settings, 'CORREOS_BACKEND', None))
+    reabrir = True
+    try:
+        for correo in correos:
+            try:
+                if reabrir:
+                    conexion.open()
+                    reabrir = False
+                conexion.send_messages([_mensaje(correo, conexion)])
+            except Exception as e:
+                # La conexión puede haber quedado inservible: se reabre
+                # para el siguiente correo del lote.
+                conexion.close()
+                reabrir = True
+                fallidos += 1
+                _registrar_fallo(correo, e)
+            else:
+                enviados.append(correo.pk)
+    finally:
+        conexion.close()
+
+    if enviados:
+        CorreoPendiente.objects.filter(pk__in=enviados).update(
+            estado='enviado', fecha_envio=timezone.now(), ultimo_error=''
+        )
+    return len(enviados), fallidos
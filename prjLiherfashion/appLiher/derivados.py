@@ -0,0 +1,72 @@
+#mantenimiento de los datos derivados del catálogo (facetas, resumen, detalle, stock y fragmentos)
+
+import threading
+from contextlib import contextmanager
+
+from .detalle_productos import invalidar_detalle
+from .facetas import reindexar_producto
+from .fragmentos import invalidar_filtros, invalidar_tarjeta
+from .inventario import actualizar_resumen
+from .stock import escribir_stock_producto
+
+
+_estado = threading.local()
+
+
+def _actualizar(producto_id):
+    reindexar_producto(producto_id)
+    actualizar_resumen(producto_id)
+    invalidar_detalle(producto_id)
+    escribir_stock_producto(producto_id)
+    invalidar_tarjeta(producto_id)
+    invalidar_filtros()
+
+
+def _eliminando():
+    if getattr(_estado, 'eliminando', None) is None:
+        _estado.eliminando = set()
+    return _estado.eliminando
+
+
+def solicitar_actualizacion(producto_id):
+    """
+    Actualiza las tablas derivadas del producto de inmediato, o lo acumula
+    si hay un bloque agrupar_actualizaciones() activo en este hilo.
+    Los productos que se están eliminando se ignoran: la cascada ya borra
+    sus filas derivadas y recrearlas rompería la llave foránea.
+    """
+    if producto_id in _eliminando():
+        return
+    pendientes = getattr(_estado, 'pendientes', None)
+    if pendientes is None:
+        _actualizar(producto_id)
+    else:
+        pendientes.add(producto_id)
+
+
+@contextmanager
+def agrupar_actualizaciones():
+    """
+    Agrupa las solicitudes de un bloque (por ejemplo, un delete() de varias
+    variantes) y actualiza cada producto una sola vez.
+    """
+    if getattr(_estado, 'pendientes', None) is not None:
+        yield
+        return
+    _estado.pendientes = set()
+    try:
+        yield
+        pendientes = _estado.pendientes
+    finally:
+        _estado.pendientes = None
+    for producto_id in pendientes:
+        if producto_id not in _eliminando():
+            _actualizar(producto_id)
+
+
+def marcar_eliminacion(producto_id):
+    _eliminando().add(producto_id)
+
+
+def desmarcar_eliminacion(producto_id):
+    _eliminando().discard(producto_id)
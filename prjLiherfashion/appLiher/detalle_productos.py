@@ -0,0 +1,107 @@
+#caché del JSON de detalle de producto (vista rápida de la tienda)
+
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Producto, VarianteProducto
+
+
+def _clave_version(producto_id):
+    return f'detalle:version:{producto_id}'
+
+
+def version_producto(producto_id):
+    """
+    Marca de tiempo de la última escritura del producto o sus variantes.
+    Sirve como versión de la caché y como Last-Modified de la respuesta.
+    """
+    clave = _clave_version(producto_id)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time(), None)
+        version = cache.get(clave, time.time())
+    return version
+
+
+def invalidar_detalle(producto_id):
+    # Tras el commit, para que nadie guarde en caché datos sin confirmar
+    transaction.on_commit(
+        lambda: cache.set(_clave_version(producto_id), time.time(), None)
+    )
+
+
+def invalidar_detalle_variantes(variante_ids):
+    """
+    Para escrituras hechas con update() sobre variantes (reservas de stock),
+    que no emiten señales.
+    """
+    productos = (
+        VarianteProducto.objects
+        .filter(pk__in=variante_ids)
+        .values_list('producto_id', flat=True)
+        .distinct()
+    )
+    for producto_id in productos:
+        invalidar_detalle(producto_id)
+
+
+def _serializar(producto):
+    imagen_producto = producto.imagen.url if producto.imagen else None
+    variantes = (
+        producto.variantes
+        .filter(activo=True)
+        .select_related('talla', 'color')
+    )
+    return {
+        'idproducto': producto.idproducto,
+        'nombre': producto.nombre,
+        'referencia': producto.referencia,
+        'precio': str(producto.precio),
+        'descripcion': producto.descripcion or '',
+        'imagen': imagen_producto,
+        'categoria': producto.categoria.categoria if producto.categoria else None,
+        'variantes': [
+            {
+                'id': variante.idvariante,
+                'talla': {
+                    'id': variante.talla.id,
+                    'talla': variante.talla.talla
+                },
+                'color': {
+                    'id': variante.color.id,
+                    'color': variante.color.color,
+                    'codigo_hex': variante.color.codigo_hex
+                },
+                'stock': variante.stock_disponible,
+                'imagen': variante.imagen.url if variante.imagen else imagen_producto
+            }
+            for variante in variantes
+        ],
+    }
+
+
+def obtener_detalle(producto_id):
+    """
+    Retorna {'contenido', 'etag', 'modificado'} del producto, o None si no
+    existe. El JSON se serializa una vez por versión del producto.
+    """
+    version = version_producto(producto_id)
+    clave = f'detalle:{producto_id}:{version}'
+    detalle = cache.get(clave)
+    if detalle is None:
+        producto = Producto.objects.select_related('categoria').filter(pk=producto_id).first()
+        if producto is None:
+            return None
+        contenido = json.dumps(_serializar(producto)).encode()
+        detalle = {
+            'contenido': contenido,
+            'etag': '"%s"' % hashlib.md5(contenido).hexdigest(),
+            'modificado': int(version),
+        }
+        cache.set(clave, detalle, getattr(settings, 'DETALLE_PRODUCTO_TTL', 3600))
+    return detalle
@@ -0,0 +1,237 @@
+#envíos masivos de correo a segmentos de usuarios
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import DestinatarioEnvio, EnvioMasivo, Pedidos, Usuarios
+
+logger = logging.getLogger(__name__)
+
+
+def usuarios_segmento(segmento):
+    activos = Usuarios.objects.filter(is_active=True)
+    con_pedidos = Exists(Pedidos.objects.filter(cliente=OuterRef('email')))
+    if segmento == 'todos':
+        return activos
+    if segmento == 'clientes':
+        return activos.filter(is_staff=False)
+    if segmento == 'clientes_con_pedidos':
+        return activos.filter(con_pedidos, is_staff=False)
+    if segmento == 'clientes_sin_pedidos':
+        return activos.filter(~con_pedidos, is_staff=False)
+    if segmento == 'administradores':
+        return activos.filter(Q(is_staff=True) | Q(is_superuser=True))
+    raise ValueError(f"Segmento desconocido: {segmento}")
+
+
+def crear_envio(asunto, texto, segmento, html='', creado_por=None):
+    usuarios_segmento(segmento)  # valida el segmento antes de guardar
+    return EnvioMasivo.objects.create(
+        asunto=asunto,
+        cuerpo_texto=texto,
+        cuerpo_html=html,
+        segmento=segmento,
+        creado_por=creado_por,
+    )
+
+
+def preparar_destinatarios(envio, tamano_lote=1000):
+    """
+    Copia los correos del segmento a DestinatarioEnvio, leyendo los
+    usuarios en trozos con iterator() para no cargar el segmento completo
+    en memoria. Si se corta a mitad, volver a llamarla no duplica filas.
+    """
+    lote = []
+    filas = (
+        usuarios_segmento(envio.segmento)
+        .order_by('pk')
+        .values_list('pk', 'email')
+        .iterator(chunk_size=tamano_lote)
+    )
+    for usuario_id, email in filas:
+        lote.append(DestinatarioEnvio(envio=envio, usuario_id=usuario_id, email=email))
+        if len(lote) >= tamano_lote:
+            DestinatarioEnvio.objects.bulk_create(lote, ignore_conflicts=True)
+            lote = []
+    if lote:
+        DestinatarioEnvio.objects.bulk_create(lote, ignore_conflicts=True)
+
+    envio.total_destinatarios = envio.destinatarios.count()
+    envio.estado = 'enviando'
+    envio.save(update_fields=['total_destinatarios', 'estado'])
+
+
+# ============================================================
+# CONEXIÓN Y RITMO DE ENVÍO
+# ============================================================
+
+class ConexionLarga:
+    """
+    Conexión SMTP que se mantiene abierta entre mensajes y se recicla cada
+    `mensajes_por_conexion` (los proveedores cortan las sesiones muy
+    largas) o cuando un envío falla.
+    """
+
+    def __init__(self, mensajes_por_conexion):
+        self.mensajes_por_conexion = mensajes_por_conexion
+        self.conexion = get_connection(getattr(settings, 'CORREOS_BACKEND', None))
+        self.abierta = False
+        self.enviados = 0
+
+    def enviar(self, mensaje):
+        if self.abierta and self.enviados >= self.mensajes_por_conexion:
+            self.cerrar()
+        if not self.abierta:
+            self.conexion.open()
+            self.abierta = True
+            self.enviados = 0
+        mensaje.connection = self.conexion
+        try:
+            self.conexion.send_messages([mensaje])
+        except Exception:
+            self.cerrar()
+            raise
+        self.enviados += 1
+
+    def cerrar(self):
+        try:
+            self.conexion.close()
+        finally:
+            self.abierta = False
+
+
+class Limitador:
+    """
+    Espera lo necesario para no superar `por_segundo` mensajes por segundo
+    (el límite del proveedor SMTP). Con 0 o None no limita.
+    """
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.siguiente = time.monotonic()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        ahora = time.monotonic()
+        if self.siguiente > ahora:
+            time.sleep(self.siguiente - ahora)
+        self.siguiente = max(self.siguiente, ahora) + self.intervalo
+
+
+# ============================================================
+# DESPACHO
+# ============================================================
+
+def _guardar_resultados(enviados, fallidos):
+    if enviados:
+        DestinatarioEnvio.objects.filter(pk__in=enviados).update(
+            estado='enviado', fecha_envio=timezone.now(), error='',
+            intentos=F('intentos') + 1
+        )
+    for pk, error in fallidos:
+        DestinatarioEnvio.objects.filter(pk=pk).update(
+            estado='fallido', error=str(error)[:1000],
+            intentos=F('intentos') + 1
+        )
+
+
+def _reclamar_lote(envio, tamano_lote):
+    """
+    Bloquea un lote de destinatarios pendientes. Los que ya tiene tomados
+    otro proceso (un cron que se solapa) se saltan, así nadie los envía
+    dos veces.
+    """
+    return list(
+        envio.destinatarios
+        .filter(estado='pendiente')
+        .order_by('pk')
+        .select_for_update(skip_locked=True)
+        .values_list('pk', 'email')[:tamano_lote]
+    )
+
+
+def enviar_envio(envio, por_segundo=None, tamano_lote=50):
+    """
+    Envía un correo por destinatario pendiente, por una conexión que se
+    reutiliza y al ritmo de CORREOS_MASIVOS_POR_SEGUNDO. Cada lote se
+    reclama, se envía y se marca en una misma transacción: si el proceso
+    muere a mitad, el lote vuelve a quedar pendiente (como mucho se repite
+    ese lote). El envío se da por terminado cuando ya no quedan pendientes.
+    Retorna (enviados, fallidos).
+    """
+    if envio.estado == 'pendiente':
+        preparar_destinatarios(envio)
+    if por_segundo is None:
+        por_segundo = getattr(settings, 'CORREOS_MASIVOS_POR_SEGUNDO', 5)
+
+    conexion = ConexionLarga(getattr(settings, 'CORREOS_MASIVOS_POR_CONEXION', 100))
+    limitador = Limitador(por_segundo)
+    remitente = settings.DEFAULT_FROM_EMAIL or None
+    total_enviados = total_fallidos = 0
+
+    try:
+        while True:
+            with transaction.atomic():
+                lote = _reclamar_lote(envio, tamano_lote)
+                if not lote:
+                    break
+                enviados, fallidos = [], []
+                for pk, email in lote:
+                    mensaje = EmailMultiAlternatives(envio.asunto, envio.cuerpo_texto, remitente, [email])
+                    if envio.cuerpo_html:
+                        mensaje.attach_alternative(envio.cuerpo_html, "text/html")
+                    limitador.esperar()
+                    try:
+                        conexion.enviar(mensaje)
+                    except Exception as e:
+                        logger.warning("Envío masivo %s: falló %s: %s", envio.pk, email, e)
+                        fallidos.append((pk, e))
+                    else:
+                        enviados.append(pk)
+                _guardar_resultados(enviados, fallidos)
+            total_enviados += len(enviados)
+            total_fallidos += len(fallidos)
+    finally:
+        conexion.cerrar()
+
+    # Los lotes que otro proceso tiene tomados siguen pendientes hasta su
+    # commit: en ese caso es ese proceso el que cierra el envío
+    if not envio.destinatarios.filter(estado='pendiente').exists():
+        envio.estado = 'terminado'
+        envio.fecha_fin = timezone.now()
+        envio.save(update_fields=['estado', 'fecha_fin'])
+    return total_enviados, total_fallidos
+
+
+def reintentar_fallidos(envio):
+    """
+    Vuelve a dejar pendientes los destinatarios fallidos que no agotaron
+    CORREOS_MAX_INTENTOS, para que el próximo enviar_envio los intente.
+    """
+    reintentos = (
+        envio.destinatarios
+        .filter(estado='fallido', intentos__lt=getattr(settings, 'CORREOS_MAX_INTENTOS', 5))
+        .update(estado='pendiente')
+    )
+    if reintentos:
+        envio.estado = 'enviando'
+        envio.save(update_fields=['estado'])
+    return reintentos
+
+
+def envios_con_resumen():
+    """
+    Envíos con sus conteos de entrega, para el panel.
+    """
+    return EnvioMasivo.objects.select_related('creado_por').annotate(
+        n_enviados=Count('destinatarios', filter=Q(destinatarios__estado='enviado')),
+        n_fallidos=Count('destinatarios', filter=Q(destinatarios__estado='fallido')),
+        n_pendientes=Count('destinatarios', filter=Q(destinatarios__estado='pendiente')),
+    )
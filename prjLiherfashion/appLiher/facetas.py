@@ -0,0 +1,151 @@
+#índice de facetas (categoría, color, talla) para los filtros del catálogo
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .busqueda import buscar_productos
+from .models import FacetaCatalogo, Producto, VarianteProducto
+
+
+def reindexar_producto(producto_id):
+    """
+    Reconstruye las filas del índice de facetas de un solo producto.
+    Solo se indexan variantes activas, con stock y de productos activos.
+    """
+    with transaction.atomic():
+        FacetaCatalogo.objects.filter(producto_id=producto_id).delete()
+        combinaciones = (
+            VarianteProducto.objects
+            .filter(
+                producto_id=producto_id,
+                producto__estado='Activo',
+                activo=True,
+                stock__gt=0
+            )
+            .values_list('producto__categoria_id', 'color_id', 'talla_id')
+            .distinct()
+        )
+        FacetaCatalogo.objects.bulk_create([
+            FacetaCatalogo(
+                producto_id=producto_id,
+                categoria_id=categoria_id,
+                color_id=color_id,
+                talla_id=talla_id
+            )
+            for categoria_id, color_id, talla_id in combinaciones
+        ])
+
+
+def reconstruir_indice():
+    """
+    Reconstruye el índice completo (útil tras cargas masivas con update()).
+    """
+    with transaction.atomic():
+        FacetaCatalogo.objects.all().delete()
+        combinaciones = (
+            VarianteProducto.objects
+            .filter(producto__estado='Activo', activo=True, stock__gt=0)
+            .values_list('producto_id', 'producto__categoria_id', 'color_id', 'talla_id')
+            .distinct()
+        )
+        FacetaCatalogo.objects.bulk_create(
+            [
+                FacetaCatalogo(
+                    producto_id=producto_id,
+                    categoria_id=categoria_id,
+                    color_id=color_id,
+                    talla_id=talla_id
+                )
+                for producto_id, categoria_id, color_id, talla_id in combinaciones
+            ],
+            batch_size=1000
+        )
+
+
+def _tiene(campo, valor):
+    # El producto tiene alguna fila del índice con ese color o talla
+    return Exists(FacetaCatalogo.objects.filter(producto=OuterRef('producto'), **{campo: valor}))
+
+
+def _conteo(*condiciones):
+    filtro = Q()
+    for condicion in condiciones:
+        if condicion is not None:
+            filtro &= condicion
+    return Count('producto', distinct=True, filter=filtro or None)
+
+
+def obtener_facetas(categoria='', color='', talla='', busqueda=''):
+    """
+    Devuelve las opciones de filtro con el número de productos que quedarían
+    al elegir cada una, respetando los demás filtros activos y la búsqueda.
+    Cada faceta es un GROUP BY sobre el índice que cuenta en la base de
+    datos, aplicando solo los filtros de las otras dos.
+    """
+    filas = FacetaCatalogo.objects.all()
+    if busqueda:
+        filas = filas.filter(producto__in=buscar_productos(
+            Producto.objects.filter(estado='Activo'), busqueda
+        ).values('pk'))
+
+    por_categoria = Q(categoria__categoria=categoria) if categoria else None
+    por_color = Q(tiene_color=True) if color else None
+    por_talla = Q(tiene_talla=True) if talla else None
+    if color:
+        filas = filas.annotate(tiene_color=_tiene('color__color', color))
+    if talla:
+        filas = filas.annotate(tiene_talla=_tiene('talla__talla', talla))
+
+    conteo_categorias = {
+        nombre: total
+        for nombre, total in (
+            filas.filter(categoria__isnull=False)
+            .values('categoria__categoria')
+            .annotate(total=_conteo(por_color, por_talla))
+            .values_list('categoria__categoria', 'total')
+        )
+        if total
+    }
+    info_colores = {}
+    conteo_colores = {}
+    for nombre, codigo_hex, total in (
+        filas.values('color__color', 'color__codigo_hex')
+        .annotate(total=_conteo(por_categoria, por_talla))
+        .values_list('color__color', 'color__codigo_hex', 'total')
+    ):
+        info_colores[nombre] = codigo_hex
+        if total:
+            conteo_colores[nombre] = total
+    info_tallas = {}
+    conteo_tallas = {}
+    for nombre, orden, total in (
+        filas.values('talla__talla', 'talla__orden')
+        .annotate(total=_conteo(por_categoria, por_color))
+        .values_list('talla__talla', 'talla__orden', 'total')
+    ):
+        info_tallas[nombre] = orden
+        if total:
+            conteo_tallas[nombre] = total
+
+    # Siempre se muestra la opción seleccionada aunque quede sin resultados
+    if categoria:
+        conteo_categorias.setdefault(categoria, 0)
+    if color and color in info_colores:
+        conteo_colores.setdefault(color, 0)
+    if talla and talla in info_tallas:
+        conteo_tallas.setdefault(talla, 0)
+
+    return {
+        'categorias': [
+            {'categoria': nombre, 'count': total}
+            for nombre, total in sorted(conteo_categorias.items())
+        ],
+        'colores': [
+            {'color': nombre, 'codigo_hex': info_colores[nombre], 'count': total}
+            for nombre, total in sorted(conteo_colores.items())
+        ],
+        'tallas': [
+            {'talla': nombre, 'orden': info_tallas[nombre], 'count': total}
+            for nombre, total in sorted(conteo_tallas.items(), key=lambda t: (info_tallas[t[0]], t[0]))
+        ],
+    }
@@ -4,7 +4,7 @@ from django import forms
 from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
-from .models import DireccionEnvio, MetodoPago, PerfilUsuario, Usuarios, Producto, VarianteProducto, Categoria, Color, Talla
+from .models import DireccionEnvio, EnvioMasivo, MetodoPago, PerfilUsuario, Usuarios, Producto, VarianteProducto, Categoria, Color, Talla
 import re
 
 User = get_user_model()
@@ -24,7 +24,7 @@ class UsuarioRegistroForm(UserCreationForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email').lower().strip()
-        if Usuarios.objects.filter(email__iexact=email).exists():
+        if Usuarios.objects.filter(email=email).exists():
             raise forms.ValidationError('Ya existe una cuenta con ese correo.')
         return email
 
@@ -78,7 +78,7 @@ class LoginForm(forms.Form):
 class CustomPasswordResetForm(PasswordResetForm):
     def get_users(self, email):
         """Incluimos usuarios inactivos también"""
-        active_users = Usuarios._default_manager.filter(email__iexact=email)
+        active_users = Usuarios._default_manager.filter(email=Usuarios.objects.normalize_email(email))
         return (u for u in active_users if u.has_usable_password())
 
     def save(self, *args, **kwargs):
@@ -88,7 +88,7 @@ class CustomPasswordResetForm(PasswordResetForm):
         """
         result = super().save(*args, **kwargs)
         email = self.cleaned_data["email"]
-        users = Usuarios._default_manager.filter(email__iexact=email)
+        users = Usuarios._default_manager.filter(email=Usuarios.objects.normalize_email(email))
 
         for user in users:
             if not user.is_active and user.has_usable_password():
@@ -118,6 +118,23 @@ class UsuarioUpdateForm(forms.ModelForm):
         }
 
 
+class EnvioMasivoForm(forms.ModelForm):
+    class Meta:
+        model = EnvioMasivo
+        fields = ['segmento', 'asunto', 'cuerpo_texto', 'cuerpo_html']
+        widgets = {
+            'asunto': forms.TextInput(attrs={'placeholder': 'Asunto del correo'}),
+            'cuerpo_texto': forms.Textarea(attrs={'rows': 6, 'placeholder': 'Mensaje en texto plano'}),
+            'cuerpo_html': forms.Textarea(attrs={'rows': 6, 'placeholder': 'Mensaje en HTML (opcional)'}),
+        }
+        labels = {
+            'segmento': 'Destinatarios',
+            'asunto': 'Asunto',
+            'cuerpo_texto': 'Mensaje',
+            'cuerpo_html': 'Mensaje HTML',
+        }
+
+
 class ProductoForm(forms.ModelForm):
     class Meta:
         model = Producto
@@ -0,0 +1,130 @@
+#caché de fragmentos de plantilla de la tienda (tarjetas y filtros)
+
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+CLAVE_VERSION_FILTROS = 'fragmentos:version:filtros'
+CLAVE_VERSION_ATRIBUTOS = 'fragmentos:version:atributos'
+NOMBRES = ('tarjeta', 'filtros')
+
+
+def _clave_version_tarjeta(producto_id):
+    return f'fragmentos:version:tarjeta:{producto_id}'
+
+
+def _version(clave):
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, time.time(), None)
+        version = cache.get(clave, 0)
+    return version
+
+
+def _invalidar(*claves):
+    transaction.on_commit(lambda: cache.set_many({clave: time.time() for clave in claves}, None))
+
+
+def version_filtros():
+    """
+    Versión de los conteos de facetas: cambia con cualquier producto o
+    variante, y también con los atributos.
+    """
+    return _version(CLAVE_VERSION_FILTROS)
+
+
+def version_atributos():
+    """
+    Versión de categorías, colores y tallas, que se muestran en todas las
+    tarjetas.
+    """
+    return _version(CLAVE_VERSION_ATRIBUTOS)
+
+
+def invalidar_filtros():
+    _invalidar(CLAVE_VERSION_FILTROS)
+
+
+def invalidar_atributos():
+    _invalidar(CLAVE_VERSION_FILTROS, CLAVE_VERSION_ATRIBUTOS)
+
+
+def versiones_tarjetas(producto_ids):
+    claves = {producto_id: _clave_version_tarjeta(producto_id) for producto_id in producto_ids}
+    encontradas = cache.get_many(claves.values())
+    nuevas = {clave: time.time() for clave in claves.values() if clave not in encontradas}
+    if nuevas:
+        cache.set_many(nuevas, None)
+        encontradas.update(nuevas)
+    return {producto_id: encontradas[clave] for producto_id, clave in claves.items()}
+
+
+def invalidar_tarjeta(producto_id):
+    transaction.on_commit(
+        lambda: cache.set(_clave_version_tarjeta(producto_id), time.time(), None)
+    )
+
+
+def clave_fragmento(nombre, partes):
+    firma = hashlib.md5('|'.join(str(parte) for parte in partes).encode()).hexdigest()
+    return f'fragmento:{nombre}:{firma}'
+
+
+def claves_tarjetas(productos):
+    """
+    {idproducto: clave} de la tarjeta de cada producto, con una sola
+    lectura de caché para todas las versiones.
+    """
+    atributos = version_atributos()
+    versiones = versiones_tarjetas([producto.pk for producto in productos])
+    return {
+        producto_id: clave_fragmento('tarjeta', [producto_id, version, atributos])
+        for producto_id, version in versiones.items()
+    }
+
+
+def clave_filtros(*seleccion):
+    return clave_fragmento('filtros', [*seleccion, version_filtros(), version_atributos()])
+
+
+# ============================================================
+# CONTADORES DE ACIERTOS
+# ============================================================
+
+def registrar_uso(nombre, acierto):
+    clave = f'fragmentos:{nombre}:{"aciertos" if acierto else "fallos"}'
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 0, None)
+        cache.incr(clave)
+
+
+def estadisticas_fragmentos():
+    """
+    {nombre: {'aciertos', 'fallos', 'ratio'}} desde que se reiniciaron
+    los contadores (ver reiniciar_estadisticas).
+    """
+    valores = cache.get_many([
+        f'fragmentos:{nombre}:{tipo}' for nombre in NOMBRES for tipo in ('aciertos', 'fallos')
+    ])
+    estadisticas = {}
+    for nombre in NOMBRES:
+        aciertos = valores.get(f'fragmentos:{nombre}:aciertos', 0)
+        fallos = valores.get(f'fragmentos:{nombre}:fallos', 0)
+        total = aciertos + fallos
+        estadisticas[nombre] = {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'ratio': round(aciertos / total, 3) if total else None,
+        }
+    return estadisticas
+
+
+def reiniciar_estadisticas():
+    cache.delete_many([
+        f'fragmentos:{nombre}:{tipo}' for nombre in NOMBRES for tipo in ('aciertos', 'fallos')
+    ])
@@ -0,0 +1,115 @@
+#claves de idempotencia para las vistas POST que modifican carrito o pedidos
+
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+
+CABECERA = 'HTTP_IDEMPOTENCY_KEY'
+CAMPO = 'idempotency_key'
+# Cabeceras de la respuesta original que se repiten al reproducirla
+CABECERAS_GUARDADAS = ('Content-Type', 'Location')
+# Si el worker muere a mitad de la petición, la clave se libera sola
+BLOQUEO_SEGUNDOS = 30
+
+
+def _ttl():
+    return getattr(settings, 'IDEMPOTENCIA_TTL', 600)
+
+
+def _clave(request, valor):
+    """
+    La clave del cliente vale solo para su usuario (o su sesión, si es
+    invitado) y para la URL a la que la envió.
+    """
+    if request.user.is_authenticated:
+        dueno = f'u{request.user.pk}'
+    else:
+        dueno = f's{request.session.session_key}'
+    huella = hashlib.md5(f'{dueno}:{request.path}:{valor}'.encode()).hexdigest()
+    return f'idempotencia:{huella}'
+
+
+def _guardar(clave, respuesta):
+    if respuesta.streaming or respuesta.status_code >= 500:
+        return
+    cache.set(clave, {
+        'estado': respuesta.status_code,
+        'contenido': respuesta.content,
+        'cabeceras': {
+            nombre: respuesta[nombre]
+            for nombre in CABECERAS_GUARDADAS if respuesta.has_header(nombre)
+        },
+    }, _ttl())
+
+
+def _reproducir(guardada):
+    respuesta = HttpResponse(guardada['contenido'], status=guardada['estado'])
+    for nombre, valor in guardada['cabeceras'].items():
+        respuesta[nombre] = valor
+    respuesta['Idempotent-Replayed'] = 'true'
+    return respuesta
+
+
+def _esperar_resultado(clave):
+    """
+    Espera a que termine la petición que tiene tomada la clave (el primer
+    clic de un doble clic) y retorna su respuesta guardada, o None si no
+    llega a tiempo.
+    """
+    limite = time.monotonic() + getattr(settings, 'IDEMPOTENCIA_ESPERA_SEGUNDOS', 5)
+    while time.monotonic() < limite:
+        time.sleep(0.1)
+        guardada = cache.get(clave)
+        if guardada is not None:
+            return guardada
+        if cache.get(f'{clave}:en_curso') is None:
+            return None
+    return None
+
+
+def idempotente(vista):
+    """
+    Si el POST trae una clave de idempotencia (cabecera Idempotency-Key o
+    campo idempotency_key), la respuesta se guarda en la caché por
+    IDEMPOTENCIA_TTL segundos y los reenvíos con la misma clave la
+    reciben tal cual, sin volver a ejecutar la vista ni tocar el stock.
+    Un reenvío que llega mientras la primera petición sigue en curso la
+    espera. Sin clave, o sin sesión en el caso de invitados, la vista se
+    ejecuta como siempre.
+    """
+    @wraps(vista)
+    def envuelta(request, *args, **kwargs):
+        valor = request.META.get(CABECERA) or request.POST.get(CAMPO)
+        if (
+            request.method != 'POST' or not valor
+            or not (request.user.is_authenticated or request.session.session_key)
+        ):
+            return vista(request, *args, **kwargs)
+
+        clave = _clave(request, valor)
+        guardada = cache.get(clave)
+        if guardada is not None:
+            return _reproducir(guardada)
+
+        en_curso = f'{clave}:en_curso'
+        if not cache.add(en_curso, 1, BLOQUEO_SEGUNDOS):
+            guardada = _esperar_resultado(clave)
+            if guardada is not None:
+                return _reproducir(guardada)
+            return JsonResponse({
+                'success': False,
+                'message': 'La solicitud anterior aún se está procesando'
+            }, status=409)
+
+        try:
+            respuesta = vista(request, *args, **kwargs)
+            _guardar(clave, respuesta)
+        finally:
+            cache.delete(en_curso)
+        return respuesta
+    return envuelta
@@ -0,0 +1,66 @@
+#resumen de inventario precalculado por producto
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Producto, ResumenInventario, VarianteProducto
+
+
+def _totales(variantes):
+    return variantes.aggregate(
+        n_variantes=Count('pk'),
+        total_stock=Sum('stock', default=0),
+        variantes_agotadas=Count('pk', filter=Q(stock=0)),
+    )
+
+
+def actualizar_resumen(producto_id):
+    """
+    Recalcula la fila de resumen de un producto a partir de sus variantes.
+    """
+    totales = _totales(VarianteProducto.objects.filter(producto_id=producto_id))
+    with transaction.atomic():
+        actualizadas = ResumenInventario.objects.filter(producto_id=producto_id).update(**totales)
+        if not actualizadas and Producto.objects.filter(pk=producto_id).exists():
+            ResumenInventario.objects.create(producto_id=producto_id, **totales)
+
+
+def reconstruir_resumenes():
+    """
+    Reconstruye la tabla completa (útil tras cargas masivas con update()).
+    """
+    filas = (
+        Producto.objects
+        .annotate(
+            n_variantes=Count('variantes'),
+            total_stock=Sum('variantes__stock', default=0),
+            variantes_agotadas=Count('variantes', filter=Q(variantes__stock=0)),
+        )
+        .values_list('pk', 'n_variantes', 'total_stock', 'variantes_agotadas')
+    )
+    with transaction.atomic():
+        ResumenInventario.objects.all().delete()
+        ResumenInventario.objects.bulk_create(
+            [
+                ResumenInventario(
+                    producto_id=producto_id,
+                    n_variantes=n_variantes,
+                    total_stock=total_stock,
+                    variantes_agotadas=variantes_agotadas
+                )
+                for producto_id, n_variantes, total_stock, variantes_agotadas in filas
+            ],
+            batch_size=1000
+        )
+
+
+def estadisticas_inventario():
+    """
+    Totales de la cabecera del inventario en una sola consulta.
+    """
+    return ResumenInventario.objects.aggregate(
+        total_productos=Count('pk'),
+        total_variantes=Sum('n_variantes', default=0),
+        productos_activos=Count('pk', filter=Q(total_stock__gt=0)),
+        productos_inactivos=Count('pk', filter=Q(total_stock=0)),
+    )
@@ -0,0 +1,53 @@
+#límite de intentos con cubetas de fichas guardadas en la caché
+
+import hashlib
+import time
+
+from django.core.cache import cache
+
+
+class CubetaFichas:
+    """
+    Límite por clave de `capacidad` intentos seguidos, que se recupera a
+    razón de una ficha cada `recarga` segundos. Las fichas gastadas se
+    cuentan por ventanas de capacidad * recarga segundos con cache.add e
+    incr, que son atómicos en Redis (y en memoria local por proceso), así
+    los workers que comparten la caché no pierden intentos entre sí. El
+    gasto de la ventana anterior pesa según lo que queda de ella, lo que
+    aproxima la recarga continua sin permitir el doble de intentos en el
+    cambio de ventana.
+    """
+
+    def __init__(self, prefijo, capacidad, recarga):
+        self.prefijo = prefijo
+        self.capacidad = capacidad
+        self.recarga = recarga
+        self.ventana = max(int(capacidad * recarga), 1)
+
+    def _clave(self, valor, numero):
+        return f'limite:{self.prefijo}:{hashlib.md5(valor.encode()).hexdigest()}:{numero}'
+
+    def _gastadas(self, valor, ahora):
+        numero = int(ahora // self.ventana)
+        actual = self._clave(valor, numero)
+        anterior = self._clave(valor, numero - 1)
+        conteos = cache.get_many([actual, anterior])
+        resto = 1 - (ahora % self.ventana) / self.ventana
+        return conteos.get(actual, 0) + conteos.get(anterior, 0) * resto
+
+    def disponible(self, valor):
+        return self._gastadas(valor, time.time()) + 1 <= self.capacidad
+
+    def consumir(self, valor):
+        clave = self._clave(valor, int(time.time() // self.ventana))
+        # La ventana sigue contando mientras es la actual o la anterior
+        cache.add(clave, 0, 2 * self.ventana + 1)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # Expiró entre add e incr
+            cache.set(clave, 1, 2 * self.ventana + 1)
+
+    def reiniciar(self, valor):
+        numero = int(time.time() // self.ventana)
+        cache.delete_many([self._clave(valor, numero), self._clave(valor, numero - 1)])
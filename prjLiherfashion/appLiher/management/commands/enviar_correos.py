@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from appLiher.correos import enviar_pendientes
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los correos de la bandeja de salida por lotes, reutilizando una conexión SMTP "
+        "por lote. Con --continuo queda corriendo como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=50,
+            help="Número de correos a enviar por conexión."
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help="No termina: vuelve a revisar la bandeja cada --intervalo segundos."
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5,
+            help="Segundos de espera cuando la bandeja está vacía (con --continuo)."
+        )
+
+    def handle(self, *args, **options):
+        if options['continuo'] and not settings.CACHE_COMPARTIDA:
+            # Como proceso aparte con caché en memoria local, el worker no compartiría la caché con la web
+            raise CommandError("--continuo requiere una caché compartida: define REDIS_URL.")
+        total_enviados = total_fallidos = 0
+        try:
+            while True:
+                enviados, fallidos = enviar_pendientes(tamano_lote=options['lote'])
+                total_enviados += enviados
+                total_fallidos += fallidos
+                if enviados or fallidos:
+                    continue
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Correos enviados: {total_enviados} (fallidos: {total_fallidos})."
+        ))
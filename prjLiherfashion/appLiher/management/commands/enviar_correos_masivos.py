@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from appLiher.envios_masivos import crear_envio, enviar_envio, reintentar_fallidos
+from appLiher.models import EnvioMasivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Despacha los envíos masivos pendientes (creados desde el panel o con --segmento). "
+        "Ejecutar periódicamente con cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--segmento', choices=[clave for clave, _ in EnvioMasivo.SEGMENTOS],
+            help="Crea un envío nuevo para este segmento (requiere --asunto y --texto)."
+        )
+        parser.add_argument('--asunto', help="Asunto del envío nuevo.")
+        parser.add_argument('--texto', help="Cuerpo en texto plano del envío nuevo.")
+        parser.add_argument(
+            '--html', help="Archivo con el cuerpo HTML del envío nuevo (opcional)."
+        )
+        parser.add_argument(
+            '--por-segundo', type=float, default=None,
+            help="Máximo de correos por segundo (por defecto CORREOS_MASIVOS_POR_SEGUNDO)."
+        )
+        parser.add_argument(
+            '--reintentar', action='store_true',
+            help="Vuelve a intentar los destinatarios fallidos de los envíos terminados."
+        )
+
+    def handle(self, *args, **options):
+        if options['segmento']:
+            if not options['asunto'] or not options['texto']:
+                raise CommandError("--segmento requiere --asunto y --texto.")
+            html = ''
+            if options['html']:
+                with open(options['html'], encoding='utf-8') as archivo:
+                    html = archivo.read()
+            envio = crear_envio(options['asunto'], options['texto'], options['segmento'], html=html)
+            self.stdout.write(f"Envío {envio.pk} creado para el segmento {envio.get_segmento_display()}.")
+
+        if options['reintentar']:
+            for envio in EnvioMasivo.objects.filter(estado='terminado'):
+                reintentos = reintentar_fallidos(envio)
+                if reintentos:
+                    self.stdout.write(f"Envío {envio.pk}: {reintentos} destinatarios por reintentar.")
+
+        for envio in EnvioMasivo.objects.exclude(estado='terminado').order_by('fecha_creacion'):
+            enviados, fallidos = enviar_envio(envio, por_segundo=options['por_segundo'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Envío {envio.pk} ({envio.asunto}): {enviados} enviados, {fallidos} fallidos."
+            ))
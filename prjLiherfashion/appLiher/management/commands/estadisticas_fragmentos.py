@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from appLiher.fragmentos import estadisticas_fragmentos, reiniciar_estadisticas
+
+
+class Command(BaseCommand):
+    help = (
+        "Muestra los aciertos de la caché de fragmentos de la tienda (tarjetas y filtros). "
+        "Con caché en memoria local solo ve los contadores de su propio proceso; usar REDIS_URL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reiniciar', action='store_true',
+            help="Pone los contadores en cero después de mostrarlos."
+        )
+
+    def handle(self, *args, **options):
+        for nombre, datos in estadisticas_fragmentos().items():
+            ratio = f"{datos['ratio']:.1%}" if datos['ratio'] is not None else "sin datos"
+            self.stdout.write(
+                f"{nombre}: {datos['aciertos']} aciertos, {datos['fallos']} fallos ({ratio})"
+            )
+        if options['reiniciar']:
+            reiniciar_estadisticas()
+            self.stdout.write(self.style.SUCCESS("Contadores reiniciados."))
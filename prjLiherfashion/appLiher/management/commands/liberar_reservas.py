@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from appLiher.reservas import liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Devuelve al stock las reservas de carrito vencidas. Con --continuo queda "
+        "corriendo como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=500,
+            help="Número de reservas a liberar por transacción."
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help="No termina: repite el barrido cada --intervalo segundos."
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=60,
+            help="Segundos entre barridos (con --continuo)."
+        )
+
+    def handle(self, *args, **options):
+        if options['continuo'] and not settings.CACHE_COMPARTIDA:
+            # Como proceso aparte con caché en memoria local, las liberaciones de stock no llegarían a la caché de la web
+            raise CommandError("--continuo requiere una caché compartida: define REDIS_URL.")
+        total_reservas = total_unidades = 0
+        try:
+            while True:
+                reservas, unidades = liberar_reservas_vencidas(tamano_lote=options['lote'])
+                total_reservas += reservas
+                total_unidades += unidades
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(
+            f"Reservas liberadas: {total_reservas} ({total_unidades} unidades devueltas al stock)."
+        ))
@@ -0,0 +1,71 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from appLiher.backends import _cubetas, verificar_credenciales
+from appLiher.models import Usuarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo de un intento de acceso: contraseña correcta, incorrecta, "
+        "correo inexistente y rechazado por el límite de intentos (sin consulta ni "
+        "hash). El usuario de prueba se crea en una transacción que se deshace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intentos', type=int, default=20,
+            help="Intentos por caso (se reporta la mediana)."
+        )
+
+    def _medir(self, request, email, password, intentos):
+        tiempos = []
+        resultado = None
+        for _ in range(intentos):
+            inicio = time.perf_counter()
+            resultado, _ = verificar_credenciales(request, email, password)
+            tiempos.append(time.perf_counter() - inicio)
+        return statistics.median(tiempos) * 1000, resultado
+
+    def _reportar(self, caso, ms, resultado):
+        self.stdout.write(f"{caso}: {ms:.2f} ms por intento ({resultado})")
+
+    def handle(self, *args, **options):
+        request = RequestFactory().post('/acceso/')
+        intentos = options['intentos']
+        email = f'medicion-{uuid.uuid4().hex[:8]}@example.com'
+        desconocido = f'nadie-{uuid.uuid4().hex[:8]}@example.com'
+        password = uuid.uuid4().hex
+        por_email, _ = _cubetas()
+
+        with transaction.atomic():
+            Usuarios.objects.create_user(email=email, password=password, is_active=True)
+
+            self._reportar("Contraseña correcta", *self._medir(request, email, password, intentos))
+
+            # Un fallo a la vez, reiniciando la cubeta para medir siempre el hash
+            tiempos = []
+            for _ in range(intentos):
+                por_email.reiniciar(email)
+                tiempos.append(self._medir(request, email, 'incorrecta', 1))
+            self._reportar(
+                "Contraseña incorrecta", statistics.median(ms for ms, _ in tiempos), tiempos[-1][1]
+            )
+
+            por_email.reiniciar(desconocido)
+            self._reportar("Correo inexistente", *self._medir(request, desconocido, 'x', 1))
+
+            # Se agotan las fichas y se miden solo los intentos ya rechazados
+            por_email.reiniciar(email)
+            self._medir(request, email, 'incorrecta', por_email.capacidad)
+            self._reportar("Rechazado por el límite", *self._medir(request, email, 'incorrecta', intentos))
+
+            por_email.reiniciar(email)
+            por_email.reiniciar(desconocido)
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Usuario de medición descartado."))
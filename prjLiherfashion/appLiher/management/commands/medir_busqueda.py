@@ -0,0 +1,91 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from appLiher.busqueda import BusquedaPostgres, buscar_productos, obtener_backend
+from appLiher.models import Producto
+
+PRENDAS = ['Camisa', 'Pantalón', 'Vestido', 'Blusa', 'Chaqueta', 'Falda', 'Buzo', 'Short']
+ESTILOS = ['clásica', 'estampada', 'de lino', 'oversize', 'deportiva', 'de jean', 'tejida', 'floral']
+TERMINOS = ['camisa', 'pantalon', 'lino', 'vestido floral', 'chaq']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la búsqueda anterior (icontains sobre nombre, descripción y referencia) "
+        "con el backend de búsqueda actual sobre un catálogo sintético. Los productos se "
+        "crean dentro de una transacción que se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--productos', type=int, default=100000,
+            help="Número de productos sintéticos a crear."
+        )
+        parser.add_argument(
+            '--repeticiones', type=int, default=5,
+            help="Veces que se repite cada búsqueda (se reporta la mediana)."
+        )
+
+    def _medir(self, consulta, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            # Lo mismo que hace el Paginator de vista_productos: total y primera página
+            consulta.count()
+            list(consulta[:12])
+            tiempos.append(time.perf_counter() - inicio)
+        return statistics.median(tiempos) * 1000
+
+    def handle(self, *args, **options):
+        backend = obtener_backend()
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            Producto.objects.bulk_create(
+                [
+                    Producto(
+                        nombre=f'{PRENDAS[n % len(PRENDAS)]} {ESTILOS[n // len(PRENDAS) % len(ESTILOS)]} {n}',
+                        referencia=f'BM{n:07d}',
+                        descripcion=f'Prenda de prueba {n} para medir la búsqueda',
+                        precio=50000,
+                    )
+                    for n in range(options['productos'])
+                ],
+                batch_size=2000
+            )
+            if isinstance(backend, BusquedaPostgres):
+                Producto.objects.filter(referencia__startswith='BM').update(
+                    vector_busqueda=backend.vector()
+                )
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE producto')
+            else:
+                # El índice en memoria se reconstruye en la primera búsqueda
+                backend._indice = None
+            self.stdout.write(
+                f"{options['productos']} productos creados en {time.perf_counter() - inicio:.1f} s "
+                f"(backend: {type(backend).__name__})"
+            )
+
+            base = Producto.objects.filter(estado='Activo').order_by('-fecha_creacion')
+            for termino in TERMINOS:
+                anterior = base.filter(
+                    Q(nombre__icontains=termino)
+                    | Q(descripcion__icontains=termino)
+                    | Q(referencia__icontains=termino)
+                )
+                actual = buscar_productos(base, termino)
+                ms_anterior = self._medir(anterior, options['repeticiones'])
+                ms_actual = self._medir(actual, options['repeticiones'])
+                self.stdout.write(
+                    f"'{termino}': icontains {ms_anterior:.1f} ms, "
+                    f"backend {ms_actual:.1f} ms ({actual.count()} resultados)"
+                )
+            transaction.set_rollback(True)
+
+        if not isinstance(backend, BusquedaPostgres):
+            backend._indice = None
+        self.stdout.write(self.style.SUCCESS("Catálogo sintético descartado."))
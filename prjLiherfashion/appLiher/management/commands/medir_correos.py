@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from appLiher.correos import correo_activacion, correo_reset, encolar_correos
+from appLiher.models import Usuarios
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo por correo de componer los correos de activación y de "
+        "restablecimiento (token, enlace y las dos plantillas) y de encolarlos en "
+        "bloque. Los correos encolados se descartan al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--correos', type=int, default=500,
+            help="Número de correos a componer."
+        )
+        parser.add_argument(
+            '--host', default='localhost',
+            help="Host usado para construir los enlaces."
+        )
+
+    def _usuarios(self, cantidad):
+        # Sin guardar: el token solo necesita pk, email, contraseña y último acceso
+        return [
+            Usuarios(pk=n, email=f'medicion{n}@example.com', password='!')
+            for n in range(1, cantidad + 1)
+        ]
+
+    def handle(self, *args, **options):
+        request = RequestFactory(HTTP_HOST=options['host']).get('/')
+        usuarios = self._usuarios(options['correos'])
+
+        inicio = time.perf_counter()
+        correo_activacion(usuarios[0], request)
+        primero = time.perf_counter() - inicio
+        self.stdout.write(f"Primer correo (incluye compilar las plantillas si no estaban): {primero * 1000:.2f} ms")
+
+        for nombre, componer in (('activación', correo_activacion), ('restablecimiento', correo_reset)):
+            inicio = time.perf_counter()
+            correos = [componer(usuario, request) for usuario in usuarios]
+            total = time.perf_counter() - inicio
+            self.stdout.write(
+                f"{nombre}: {len(correos)} correos en {total * 1000:.1f} ms "
+                f"({total / len(correos) * 1000:.3f} ms por correo)"
+            )
+
+        with transaction.atomic():
+            inicio = time.perf_counter()
+            encolar_correos(correos)
+            total = time.perf_counter() - inicio
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f"Encolado en bloque: {total * 1000:.1f} ms ({total / len(correos) * 1000:.3f} ms por correo)"
+        )
+        self.stdout.write(self.style.SUCCESS("Correos de medición descartados."))
@@ -0,0 +1,89 @@
+from contextlib import nullcontext
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from appLiher.carritos import CLAVE_CONTADOR
+from appLiher.models import Color, Producto, Talla, VarianteProducto
+
+
+def guardar_contador_anterior(request, cantidad):
+    # Como era antes: escribe el contador aunque no haya cambiado
+    request.session[CLAVE_CONTADOR] = cantidad
+
+
+ESCENARIOS = (
+    ('Antes (motor db, contador siempre escrito)', 'django.contrib.sessions.backends.db', True),
+    ('Solo el motor appLiher.sesiones', 'appLiher.sesiones', True),
+    ('Ahora (appLiher.sesiones y contador sin cambios)', 'appLiher.sesiones', False),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Cuenta las escrituras a la tabla de sesiones por petición del carrito de un "
+        "invitado: como era antes (motor por defecto de Django y el contador escrito en "
+        "cada petición), solo con appLiher.sesiones y con los dos cambios. "
+        "Los datos de prueba se crean en una transacción que se deshace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeticiones', type=int, default=10,
+            help="Veces que se repite la actualización del carrito a la misma cantidad."
+        )
+
+    def _escrituras(self, consultas):
+        return sum(
+            1 for consulta in consultas
+            if 'django_session' in consulta['sql']
+            and consulta['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE'))
+        )
+
+    def _variante(self):
+        color, _ = Color.objects.get_or_create(color='Medición')
+        talla, _ = Talla.objects.get_or_create(talla='Medición')
+        producto = Producto.objects.create(nombre='Medición', referencia='MEDSES', precio=1000)
+        return VarianteProducto.objects.create(producto=producto, color=color, talla=talla, stock=100)
+
+    def _peticiones(self, variante, repeticiones):
+        """
+        Recorrido de un invitado: agrega una variante, repite la misma
+        cantidad (doble clic, reintentos), cambia la cantidad y ve el carrito.
+        """
+        cliente = Client(HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        cliente.post(f'/carrito/agregar/{variante.pk}/', {'cantidad': 1})
+        item_id = variante.itemcarrito_set.order_by('-pk').values_list('pk', flat=True).first()
+        pasos = [('Actualizar a la misma cantidad', f'/carrito/actualizar/{item_id}/', {'cantidad': 1})] * repeticiones
+        pasos.append(('Cambiar la cantidad', f'/carrito/actualizar/{item_id}/', {'cantidad': 2}))
+        resultados = {}
+        for nombre, url, datos in pasos:
+            with CaptureQueriesContext(connection) as consultas:
+                cliente.post(url, datos)
+            escrituras, peticiones = resultados.get(nombre, (0, 0))
+            resultados[nombre] = (escrituras + self._escrituras(consultas), peticiones + 1)
+        with CaptureQueriesContext(connection) as consultas:
+            cliente.get('/carrito/')
+        resultados['Ver el carrito'] = (self._escrituras(consultas), 1)
+        return resultados
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            variante = self._variante()
+            for titulo, motor, contador_anterior in ESCENARIOS:
+                contador = (
+                    mock.patch('appLiher.views.guardar_contador', guardar_contador_anterior)
+                    if contador_anterior else nullcontext()
+                )
+                with override_settings(SESSION_ENGINE=motor), contador:
+                    resultados = self._peticiones(variante, options['repeticiones'])
+                self.stdout.write(titulo)
+                for nombre, (escrituras, peticiones) in resultados.items():
+                    self.stdout.write(
+                        f"  {nombre}: {escrituras / peticiones:.2f} escrituras de sesión por petición"
+                    )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS("Datos de medición descartados."))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from appLiher.carritos import purgar_carritos_abandonados
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra por lotes los carritos sin completar y sin actividad (ejecutar periódicamente "
+        "con cron). Se puede interrumpir y volver a ejecutar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help="Días sin actividad para considerar abandonado un carrito "
+                 "(por defecto CARRITO_ABANDONADO_DIAS)."
+        )
+        parser.add_argument(
+            '--incluir-usuarios', action='store_true',
+            help="Incluye también los carritos de usuarios registrados, no solo los de invitados."
+        )
+        parser.add_argument(
+            '--lote', type=int, default=500,
+            help="Número de carritos a borrar por transacción."
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help="Solo cuenta lo que se borraría, sin borrar nada."
+        )
+
+    def handle(self, *args, **options):
+        metricas = purgar_carritos_abandonados(
+            dias=options['dias'],
+            incluir_usuarios=options['incluir_usuarios'],
+            tamano_lote=options['lote'],
+            simular=options['simular'],
+        )
+        if options['simular']:
+            self.stdout.write(
+                f"Se borrarían {metricas['carritos']} carritos con {metricas['items']} ítems."
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Carritos borrados: {metricas['carritos']} ({metricas['items']} ítems, "
+            f"{metricas['unidades_liberadas']} unidades devueltas al stock) "
+            f"en {metricas['lotes']} lotes, {metricas['segundos']} s."
+        ))
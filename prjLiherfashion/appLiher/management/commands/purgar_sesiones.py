@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appLiher.sesiones import SessionStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las sesiones vencidas por lotes (ejecutar periódicamente con cron). "
+        "A diferencia de clearsessions no borra todo en una sola sentencia."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=1000,
+            help="Número de sesiones a borrar por sentencia."
+        )
+
+    def handle(self, *args, **options):
+        modelo = SessionStore.get_model_class()
+        ahora = timezone.now()
+        total = 0
+        while True:
+            claves = list(
+                modelo.objects
+                .filter(expire_date__lt=ahora)
+                .values_list('session_key', flat=True)[:options['lote']]
+            )
+            if not claves:
+                break
+            total += modelo.objects.filter(session_key__in=claves).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Sesiones vencidas borradas: {total}."))
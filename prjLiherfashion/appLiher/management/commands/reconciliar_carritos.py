@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from appLiher.carritos import reconciliar_totales
+
+
+class Command(BaseCommand):
+    help = "Recalcula los totales guardados en Carrito a partir de sus ítems."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=500,
+            help="Número de carritos a revisar por transacción."
+        )
+
+    def handle(self, *args, **options):
+        corregidos = reconciliar_totales(tamano_lote=options['lote'])
+        if corregidos:
+            self.stdout.write(self.style.WARNING(
+                f"Se corrigieron {len(corregidos)} carrito(s): {', '.join(map(str, corregidos))}"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("Todos los totales de carrito están al día."))
@@ -0,0 +1,68 @@
+#métricas del panel de administración
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, DecimalField, F, Max, Min, Q, Sum
+
+from .models import Producto, Usuarios
+
+
+CLAVE_METRICAS = 'panel_admin:metricas'
+
+
+def _calcular_metricas():
+    """
+    Calcula todas las métricas con una pasada de agregación condicional
+    por tabla (productos con sus variantes, y usuarios).
+    """
+    productos = Producto.objects.annotate(
+        n_variantes=Count('variantes'),
+        total_stock=Sum('variantes__stock')
+    ).aggregate(
+        total_productos=Count('pk'),
+        productos_activos=Count('pk', filter=Q(estado='Activo')),
+        productos_inactivos=Count('pk', filter=Q(estado='Inactivo')),
+        total_variantes=Sum('n_variantes'),
+        productos_con_variantes=Count('pk', filter=Q(n_variantes__gt=0)),
+        productos_sin_variantes=Count('pk', filter=Q(n_variantes=0)),
+        productos_con_stock=Count('pk', filter=Q(total_stock__gt=0)),
+        productos_sin_stock=Count('pk', filter=Q(total_stock__lte=0)),
+        precio_promedio=Avg('precio'),
+        precio_max=Max('precio'),
+        precio_min=Min('precio'),
+        valor_inventario=Sum(
+            F('precio') * F('total_stock'),
+            output_field=DecimalField(max_digits=14, decimal_places=2)
+        ),
+    )
+
+    usuarios = Usuarios.objects.aggregate(
+        total_usuarios=Count('pk'),
+        usuarios_activos=Count('pk', filter=Q(is_active=True)),
+        usuarios_inactivos=Count('pk', filter=Q(is_active=False)),
+    )
+
+    metricas = {**productos, **usuarios}
+    for campo in ('total_variantes', 'precio_promedio', 'precio_max', 'precio_min', 'valor_inventario'):
+        metricas[campo] = metricas[campo] or 0
+    metricas['precio_promedio'] = round(metricas['precio_promedio'], 2)
+    metricas['valor_inventario'] = round(metricas['valor_inventario'], 2)
+    return metricas
+
+
+def obtener_metricas():
+    """
+    Retorna las métricas del panel desde la caché, recalculándolas si
+    expiraron o fueron invalidadas.
+    """
+    metricas = cache.get(CLAVE_METRICAS)
+    if metricas is None:
+        metricas = _calcular_metricas()
+        cache.set(CLAVE_METRICAS, metricas, getattr(settings, 'METRICAS_PANEL_TTL', 60))
+    return metricas
+
+
+def invalidar_metricas():
+    # Tras el commit, para que nadie vuelva a guardar los valores anteriores
+    transaction.on_commit(lambda: cache.delete(CLAVE_METRICAS))
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_facetas(apps, schema_editor):
+    FacetaCatalogo = apps.get_model('appLiher', 'FacetaCatalogo')
+    VarianteProducto = apps.get_model('appLiher', 'VarianteProducto')
+    combinaciones = (
+        VarianteProducto.objects
+        .filter(producto__estado='Activo', activo=True, stock__gt=0)
+        .values_list('producto_id', 'producto__categoria_id', 'color_id', 'talla_id')
+        .distinct()
+    )
+    FacetaCatalogo.objects.bulk_create(
+        [
+            FacetaCatalogo(
+                producto_id=producto_id,
+                categoria_id=categoria_id,
+                color_id=color_id,
+                talla_id=talla_id
+            )
+            for producto_id, categoria_id, color_id, talla_id in combinaciones
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetaCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='appLiher.categoria')),
+                ('color', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='appLiher.color')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facetas', to='appLiher.producto')),
+                ('talla', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='appLiher.talla')),
+            ],
+            options={
+                'db_table': 'faceta_catalogo',
+                'unique_together': {('producto', 'color', 'talla')},
+            },
+        ),
+        migrations.RunPython(poblar_facetas, migrations.RunPython.noop),
+    ]
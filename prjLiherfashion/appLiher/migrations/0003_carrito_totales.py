@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:23
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, F, Sum
+
+
+def calcular_totales(apps, schema_editor):
+    Carrito = apps.get_model('appLiher', 'Carrito')
+    ItemCarrito = apps.get_model('appLiher', 'ItemCarrito')
+    totales = (
+        ItemCarrito.objects
+        .values('carrito')
+        .annotate(
+            items=Sum('cantidad'),
+            total=Sum(
+                F('cantidad') * F('precio_unitario'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            )
+        )
+    )
+    for fila in totales.iterator():
+        Carrito.objects.filter(pk=fila['carrito']).update(
+            cantidad_items=fila['items'], subtotal=fila['total']
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0002_faceta_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='cantidad_items',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='carrito',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
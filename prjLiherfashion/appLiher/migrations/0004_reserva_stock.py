@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0003_carrito_totales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='varianteproducto',
+            name='stock_reservado',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('carrito', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='appLiher.carrito')),
+                ('variante', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='appLiher.varianteproducto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'db_table': 'reserva_stock',
+                'unique_together': {('carrito', 'variante')},
+            },
+        ),
+    ]
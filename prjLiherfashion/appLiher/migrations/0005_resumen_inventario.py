@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def poblar_resumenes(apps, schema_editor):
+    Producto = apps.get_model('appLiher', 'Producto')
+    ResumenInventario = apps.get_model('appLiher', 'ResumenInventario')
+    filas = (
+        Producto.objects
+        .annotate(
+            n_variantes=Count('variantes'),
+            total_stock=Sum('variantes__stock', default=0),
+            variantes_agotadas=Count('variantes', filter=Q(variantes__stock=0)),
+        )
+        .values_list('pk', 'n_variantes', 'total_stock', 'variantes_agotadas')
+    )
+    ResumenInventario.objects.bulk_create(
+        [
+            ResumenInventario(
+                producto_id=producto_id,
+                n_variantes=n_variantes,
+                total_stock=total_stock,
+                variantes_agotadas=variantes_agotadas
+            )
+            for producto_id, n_variantes, total_stock, variantes_agotadas in filas
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0004_reserva_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenInventario',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen', serialize=False, to='appLiher.producto')),
+                ('n_variantes', models.PositiveIntegerField(default=0)),
+                ('total_stock', models.PositiveIntegerField(default=0)),
+                ('variantes_agotadas', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'resumen_inventario',
+                'indexes': [models.Index(fields=['total_stock'], name='resumen_inv_total_s_d60d93_idx'), models.Index(fields=['n_variantes'], name='resumen_inv_n_varia_bd522a_idx'), models.Index(fields=['variantes_agotadas'], name='resumen_inv_variant_b1453d_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:41
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+CREAR_BUSQUEDA = """
+CREATE EXTENSION IF NOT EXISTS unaccent;
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+        CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+        ALTER TEXT SEARCH CONFIGURATION es_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+    END IF;
+END
+$$;
+CREATE INDEX IF NOT EXISTS producto_vector_busqueda_gin
+    ON producto USING gin (vector_busqueda);
+UPDATE producto SET vector_busqueda =
+    setweight(to_tsvector('es_unaccent', coalesce(nombre, '')), 'A') ||
+    setweight(to_tsvector('es_unaccent', coalesce(referencia, '')), 'A') ||
+    setweight(to_tsvector('es_unaccent', coalesce(descripcion, '')), 'B');
+"""
+
+ELIMINAR_BUSQUEDA = """
+DROP INDEX IF EXISTS producto_vector_busqueda_gin;
+DROP TEXT SEARCH CONFIGURATION IF EXISTS es_unaccent;
+"""
+
+
+def crear_busqueda(apps, schema_editor):
+    # El índice GIN y la configuración de texto solo existen en PostgreSQL;
+    # en SQLite se usa el índice en memoria de appLiher.busqueda
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREAR_BUSQUEDA)
+
+
+def eliminar_busqueda(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(ELIMINAR_BUSQUEDA)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0005_resumen_inventario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='vector_busqueda',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(crear_busqueda, eliminar_busqueda),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:52
+
+from django.db import migrations
+
+
+CREAR_TRIGRAMAS = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS producto_nombre_trgm
+    ON producto USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS producto_referencia_trgm
+    ON producto USING gin (referencia gin_trgm_ops);
+"""
+
+ELIMINAR_TRIGRAMAS = """
+DROP INDEX IF EXISTS producto_nombre_trgm;
+DROP INDEX IF EXISTS producto_referencia_trgm;
+"""
+
+
+def crear_trigramas(apps, schema_editor):
+    # Solo PostgreSQL; en SQLite el autocompletado usa el índice en memoria
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREAR_TRIGRAMAS)
+
+
+def eliminar_trigramas(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(ELIMINAR_TRIGRAMAS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0006_busqueda_productos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_trigramas, eliminar_trigramas),
+    ]
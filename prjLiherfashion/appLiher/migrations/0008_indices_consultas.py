@@ -0,0 +1,41 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0007_autocompletar_trigramas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(condition=models.Q(('completado', False)), fields=['usuario'], name='carrito_abierto_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['cliente', '-fecha'], name='pedidos_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peticionproducto',
+            index=models.Index(fields=['-fecha_peticion'], name='peticion_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='peticionproducto',
+            index=models.Index(condition=models.Q(('atendida', False)), fields=['-fecha_peticion'], name='peticion_pendiente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['estado', '-fecha_creacion'], name='producto_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='varianteproducto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['producto', 'stock'], name='variante_activa_stock_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0009_correos_pendientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioMasivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('cuerpo_texto', models.TextField()),
+                ('cuerpo_html', models.TextField(blank=True)),
+                ('segmento', models.CharField(choices=[('todos', 'Todos los usuarios activos'), ('clientes', 'Clientes'), ('clientes_con_pedidos', 'Clientes con pedidos'), ('clientes_sin_pedidos', 'Clientes sin pedidos'), ('administradores', 'Administradores')], max_length=30)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviando', 'Enviando'), ('terminado', 'Terminado')], default='pendiente', max_length=10)),
+                ('total_destinatarios', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('creado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='envios_masivos', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Envío Masivo',
+                'verbose_name_plural': 'Envíos Masivos',
+                'db_table': 'envios_masivos',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DestinatarioEnvio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_envio', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('envio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='destinatarios', to='appLiher.enviomasivo')),
+            ],
+            options={
+                'verbose_name': 'Destinatario de Envío',
+                'verbose_name_plural': 'Destinatarios de Envíos',
+                'db_table': 'envios_masivos_destinatarios',
+                'indexes': [models.Index(fields=['envio', 'estado'], name='destinatario_envio_estado_idx')],
+                'unique_together': {('envio', 'email')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:20
+
+import logging
+
+from django.db import migrations
+from django.db.models.functions import Lower, Trim
+
+logger = logging.getLogger(__name__)
+
+
+def emails_a_minusculas(apps, schema_editor):
+    """
+    El acceso ahora busca por email exacto en minúsculas. Las cuentas que
+    chocarían con otra al pasar a minúsculas se dejan como están y se
+    reportan como advertencia en el log para resolverlas a mano.
+    """
+    Usuarios = apps.get_model('appLiher', 'Usuarios')
+    Pedidos = apps.get_model('appLiher', 'Pedidos')
+    vistos = set()
+    choques = []
+    # Trim además de Lower: también las que ya están en minúsculas pero con espacios
+    pendientes = Usuarios.objects.exclude(email=Trim(Lower('email'))).values_list('pk', 'email')
+    for pk, email in pendientes.iterator():
+        nuevo = email.strip().lower()
+        if nuevo in vistos or Usuarios.objects.filter(email=nuevo).exists():
+            choques.append(f"{email!r} (ya existe {nuevo!r})")
+            continue
+        vistos.add(nuevo)
+        Usuarios.objects.filter(pk=pk).update(email=nuevo)
+        Pedidos.objects.filter(cliente=email).update(cliente=nuevo)
+    if choques:
+        logger.warning(
+            "%d emails no se normalizaron porque chocan con otra cuenta: %s",
+            len(choques), ', '.join(choques)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0010_envios_masivos'),
+    ]
+
+    operations = [
+        migrations.RunPython(emails_a_minusculas, migrations.RunPython.noop),
+    ]
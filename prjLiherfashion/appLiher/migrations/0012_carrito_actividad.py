@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0011_emails_minusculas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carrito',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='carrito',
+            index=models.Index(condition=models.Q(('completado', False)), fields=['fecha_actualizacion'], name='carrito_abierto_actividad_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appLiher', '0012_carrito_actividad'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pedidos',
+            name='pedidos_cliente_fecha_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='producto',
+            name='producto_estado_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='pedidos',
+            index=models.Index(fields=['cliente', '-fecha', '-idpedido'], name='pedidos_cliente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['estado', '-fecha_creacion', '-idproducto'], name='producto_estado_fecha_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -95,6 +96,12 @@ class DjangoSession(models.Model):
 
 class UsuariosManager(BaseUserManager):
 
+    @classmethod
+    def normalize_email(cls, email):
+        # Todo en minúsculas: el acceso busca por igualdad exacta y así usa
+        # el índice único de email.
+        return (email or '').strip().lower()
+
     def create_user(self, email, password=None, **extra_fields):
         if not email:
             raise ValueError('El usuario debe tener un correo electrónico')
@@ -133,6 +140,10 @@ class Usuarios(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        self.email = UsuariosManager.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
 
 class PerfilUsuario(models.Model):
     TIPO_DOCUMENTO_CHOICES = [
@@ -277,9 +288,17 @@ class Producto(models.Model):
         ('Inactivo', 'Inactivo'),
     ], default='Activo')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Mantenido por appLiher.busqueda (índice GIN en PostgreSQL)
+    vector_busqueda = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = 'producto'
+        indexes = [
+            # Catálogo: productos activos, más recientes primero; con el id
+            # como desempate cubre todo el orden del cursor del listado
+            models.Index(fields=['estado', '-fecha_creacion', '-idproducto'], name='producto_estado_fecha_idx'),
+            models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
@@ -300,16 +319,78 @@ class VarianteProducto(models.Model):
         max_length=255
     )
     stock = models.PositiveIntegerField(default=0)
+    # Unidades apartadas por carritos (ver appLiher.reservas)
+    stock_reservado = models.PositiveIntegerField(default=0)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     activo = models.BooleanField(default=True)
 
     class Meta:
         db_table = 'variante_producto'
         unique_together = ('producto', 'talla', 'color')
+        indexes = [
+            # Variantes visibles en la tienda y filas del índice de facetas
+            models.Index(
+                fields=['producto', 'stock'],
+                condition=models.Q(activo=True),
+                name='variante_activa_stock_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.producto.nombre} - {self.talla} - {self.color}"
 
+    @property
+    def stock_disponible(self):
+        return max(self.stock - self.stock_reservado, 0)
+
+
+class FacetaCatalogo(models.Model):
+    """
+    Índice precalculado de filtros del catálogo: una fila por cada
+    combinación (producto, color, talla) activa y con stock.
+    """
+    producto = models.ForeignKey(
+        Producto, on_delete=models.CASCADE,
+        related_name='facetas'
+    )
+    categoria = models.ForeignKey(
+        'Categoria', on_delete=models.SET_NULL,
+        null=True, blank=True
+    )
+    color = models.ForeignKey('Color', on_delete=models.CASCADE)
+    talla = models.ForeignKey('Talla', on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'faceta_catalogo'
+        unique_together = ('producto', 'color', 'talla')
+
+    def __str__(self):
+        return f"{self.producto_id} - {self.color_id} - {self.talla_id}"
+
+
+class ResumenInventario(models.Model):
+    """
+    Totales de inventario precalculados por producto (ver appLiher.inventario).
+    """
+    producto = models.OneToOneField(
+        Producto, on_delete=models.CASCADE,
+        primary_key=True, related_name='resumen'
+    )
+    n_variantes = models.PositiveIntegerField(default=0)
+    total_stock = models.PositiveIntegerField(default=0)
+    variantes_agotadas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'resumen_inventario'
+        indexes = [
+            models.Index(fields=['total_stock']),
+            models.Index(fields=['n_variantes']),
+            models.Index(fields=['variantes_agotadas']),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} - {self.total_stock}"
+
 
 # ============================================================
 # CARRITO DE COMPRAS
@@ -322,22 +403,43 @@ class Carrito(models.Model):
         verbose_name='Usuario del Carrito'
     )
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Última modificación de ítems; la usa el comando purgar_carritos
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     completado = models.BooleanField(default=False)
+    # Totales desnormalizados, mantenidos desde appLiher.carritos
+    cantidad_items = models.PositiveIntegerField(default=0)
+    subtotal = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.00')
+    )
 
     class Meta:
         managed = True
         db_table = 'carrito'
+        indexes = [
+            # Carrito abierto de cada usuario (obtener_o_crear_carrito)
+            models.Index(
+                fields=['usuario'],
+                condition=models.Q(completado=False),
+                name='carrito_abierto_usuario_idx'
+            ),
+            # Carritos abiertos sin actividad (purgar_carritos)
+            models.Index(
+                fields=['fecha_actualizacion'],
+                condition=models.Q(completado=False),
+                name='carrito_abierto_actividad_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Carrito de {self.usuario.email if self.usuario else 'invitado'} - ID: {self.id}"
 
     @property
     def total_precio_carrito(self):
-        return sum(item.total_precio for item in self.items_carrito.all())
+        return self.subtotal
 
     @property
     def total_items_carrito(self):
-        return sum(item.cantidad for item in self.items_carrito.all())
+        return self.cantidad_items
 
 
 class ItemCarrito(models.Model):
@@ -368,6 +470,31 @@ class ItemCarrito(models.Model):
         return self.cantidad * self.precio_unitario
 
 
+class ReservaStock(models.Model):
+    """
+    Unidades de una variante apartadas para un carrito hasta `expira`.
+    """
+    carrito = models.ForeignKey(
+        Carrito, on_delete=models.CASCADE,
+        related_name='reservas'
+    )
+    variante = models.ForeignKey(
+        VarianteProducto, on_delete=models.CASCADE,
+        related_name='reservas'
+    )
+    cantidad = models.PositiveIntegerField(default=0)
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'reserva_stock'
+        unique_together = ('carrito', 'variante')
+        verbose_name = 'Reserva de Stock'
+        verbose_name_plural = 'Reservas de Stock'
+
+    def __str__(self):
+        return f"{self.cantidad} x {self.variante_id} (carrito {self.carrito_id})"
+
+
 # ============================================================
 # PEDIDOS Y ENVÍOS
 # ============================================================
@@ -384,6 +511,11 @@ class Pedidos(models.Model):
     class Meta:
         managed = True
         db_table = 'pedidos'
+        indexes = [
+            # Historial de pedidos del cliente (mis_pedidos), con el mismo
+            # orden (fecha, id) que su paginación por cursor
+            models.Index(fields=['cliente', '-fecha', '-idpedido'], name='pedidos_cliente_fecha_idx'),
+        ]
 
 
 class PedidoItem(models.Model):
@@ -619,8 +751,136 @@ class PeticionProducto(models.Model):
     class Meta:
         managed = True
         db_table = 'peticiones_producto'
+        indexes = [
+            models.Index(fields=['-fecha_peticion'], name='peticion_fecha_idx'),
+            models.Index(
+                fields=['-fecha_peticion'],
+                condition=models.Q(atendida=False),
+                name='peticion_pendiente_fecha_idx'
+            ),
+        ]
         verbose_name = 'Petición de Producto'
         verbose_name_plural = 'Peticiones de Productos'
 
     def __str__(self):
-        return f"{self.usuario.email} - {self.producto.producto.nombre} - Cant: {self.cantidad_solicitada}"
\ No newline at end of file
+        return f"{self.usuario.email} - {self.producto.producto.nombre} - Cant: {self.cantidad_solicitada}"
+
+# ============================================================
+# CORREOS
+# ============================================================
+
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida: las vistas solo encolan y el comando enviar_correos
+    los despacha por lotes.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField(blank=True)
+    cuerpo_html = models.TextField(blank=True)
+    remitente = models.CharField(max_length=254, blank=True)
+    destinatarios = models.JSONField(default=list)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'correos_pendientes'
+        indexes = [
+            models.Index(
+                fields=['proximo_intento'],
+                condition=models.Q(estado='pendiente'),
+                name='correo_pendiente_idx'
+            ),
+        ]
+        verbose_name = 'Correo Pendiente'
+        verbose_name_plural = 'Correos Pendientes'
+
+    def __str__(self):
+        return f"{self.asunto} -> {', '.join(self.destinatarios)} ({self.estado})"
+
+
+class EnvioMasivo(models.Model):
+    """
+    Correo a un segmento de usuarios. El panel solo lo crea; el comando
+    enviar_correos_masivos arma la lista de destinatarios y lo despacha.
+    """
+    SEGMENTOS = [
+        ('todos', 'Todos los usuarios activos'),
+        ('clientes', 'Clientes'),
+        ('clientes_con_pedidos', 'Clientes con pedidos'),
+        ('clientes_sin_pedidos', 'Clientes sin pedidos'),
+        ('administradores', 'Administradores'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('terminado', 'Terminado'),
+    ]
+
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField()
+    cuerpo_html = models.TextField(blank=True)
+    segmento = models.CharField(max_length=30, choices=SEGMENTOS)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
+    creado_por = models.ForeignKey(
+        Usuarios, on_delete=models.SET_NULL,
+        null=True, blank=True, related_name='envios_masivos'
+    )
+    total_destinatarios = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'envios_masivos'
+        ordering = ['-fecha_creacion']
+        verbose_name = 'Envío Masivo'
+        verbose_name_plural = 'Envíos Masivos'
+
+    def __str__(self):
+        return f"{self.asunto} ({self.get_segmento_display()})"
+
+
+class DestinatarioEnvio(models.Model):
+    """
+    Estado de entrega de un envío masivo para cada destinatario.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    envio = models.ForeignKey(
+        EnvioMasivo, on_delete=models.CASCADE,
+        related_name='destinatarios'
+    )
+    usuario = models.ForeignKey(
+        Usuarios, on_delete=models.SET_NULL,
+        null=True, blank=True
+    )
+    email = models.EmailField()
+    estado = models.CharField(max_length=10, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'envios_masivos_destinatarios'
+        unique_together = ('envio', 'email')
+        indexes = [
+            models.Index(fields=['envio', 'estado'], name='destinatario_envio_estado_idx'),
+        ]
+        verbose_name = 'Destinatario de Envío'
+        verbose_name_plural = 'Destinatarios de Envíos'
+
+    def __str__(self):
+        return f"{self.email} ({self.estado})"
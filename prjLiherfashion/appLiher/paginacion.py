@@ -0,0 +1,137 @@
+#paginación por cursor (keyset) para listados grandes
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+
+SAL_CURSOR = 'appLiher.paginacion'
+
+
+class PaginaCursor:
+    """
+    Página de resultados con los cursores para ir a la anterior y a la
+    siguiente. Se usa en las plantillas igual que una Page de Paginator
+    (has_previous, has_next, has_other_pages, iteración).
+    """
+
+    def __init__(self, object_list, cursor_anterior=None, cursor_siguiente=None, total_aproximado=None):
+        self.object_list = object_list
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+        self.total_aproximado = total_aproximado
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+def _campos(orden):
+    return [(campo.lstrip('-'), campo.startswith('-')) for campo in orden]
+
+
+def _codificar(direccion, objeto, orden):
+    valores = []
+    for nombre, _ in _campos(orden):
+        valor = getattr(objeto, nombre)
+        valores.append(valor.isoformat() if hasattr(valor, 'isoformat') else valor)
+    return signing.dumps({'d': direccion, 'v': valores}, salt=SAL_CURSOR, compress=True)
+
+
+def _decodificar(cursor, modelo, orden):
+    """
+    Retorna (dirección, valores) o (None, None) si el cursor no es válido.
+    """
+    try:
+        datos = signing.loads(cursor, salt=SAL_CURSOR)
+        valores = [
+            modelo._meta.get_field(nombre).to_python(valor)
+            for (nombre, _), valor in zip(_campos(orden), datos['v'], strict=True)
+        ]
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None, None
+    if datos.get('d') not in ('sig', 'ant'):
+        return None, None
+    return datos['d'], valores
+
+
+def _filtro_keyset(orden, valores, hacia_atras):
+    """
+    Condición "fila posterior a `valores`" según el orden (o anterior si
+    hacia_atras), sin OFFSET: (a < x) OR (a = x AND b < y) ...
+    """
+    campos = _campos(orden)
+    condicion = Q()
+    for i, (nombre, descendente) in enumerate(campos):
+        operador = 'lt' if descendente != hacia_atras else 'gt'
+        parcial = Q(**{f'{nombre}__{operador}': valores[i]})
+        for (anterior, _), valor in zip(campos[:i], valores[:i]):
+            parcial &= Q(**{anterior: valor})
+        condicion |= parcial
+    return condicion
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith('-') else '-' + campo for campo in orden]
+
+
+def total_aproximado(queryset, clave):
+    """
+    COUNT(*) guardado en caché por un rato: suficiente para mostrar
+    "~N resultados" sin contar en cada página.
+    """
+    return cache.get_or_set(
+        f'paginacion:total:{clave}',
+        queryset.count,
+        getattr(settings, 'PAGINACION_TOTAL_TTL', 300)
+    )
+
+
+def paginar_por_cursor(queryset, orden, cursor=None, tamano=12, clave_total=None):
+    """
+    Pagina `queryset` por `orden` (que debe terminar en un campo único,
+    p. ej. ['-fecha', '-idpedido']). Cada página cuesta lo mismo sin
+    importar qué tan adentro esté, porque se filtra desde el cursor en
+    vez de usar OFFSET.
+    """
+    base = queryset
+    direccion, valores = (None, None)
+    if cursor:
+        direccion, valores = _decodificar(cursor, queryset.model, orden)
+
+    if direccion == 'ant':
+        filas = list(
+            queryset
+            .filter(_filtro_keyset(orden, valores, hacia_atras=True))
+            .order_by(*_invertir(orden))[:tamano + 1]
+        )
+        hay_anteriores = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        anterior = _codificar('ant', filas[0], orden) if hay_anteriores else None
+        siguiente = _codificar('sig', filas[-1], orden) if filas else None
+    else:
+        if direccion == 'sig':
+            queryset = queryset.filter(_filtro_keyset(orden, valores, hacia_atras=False))
+        filas = list(queryset.order_by(*orden)[:tamano + 1])
+        hay_siguientes = len(filas) > tamano
+        filas = filas[:tamano]
+        anterior = _codificar('ant', filas[0], orden) if direccion == 'sig' and filas else None
+        siguiente = _codificar('sig', filas[-1], orden) if hay_siguientes else None
+
+    total = total_aproximado(base, clave_total) if clave_total else None
+    return PaginaCursor(filas, anterior, siguiente, total)
@@ -0,0 +1,162 @@
+#creación de pedidos a partir del carrito (checkout)
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .derivados import agrupar_actualizaciones, solicitar_actualizacion
+from .metricas import invalidar_metricas
+from .models import (
+    Carrito,
+    ItemCarrito,
+    PedidoItem,
+    PedidoSeguimiento,
+    Pedidos,
+    Producto,
+    ReservaStock,
+    VarianteProducto,
+)
+
+
+# Mismo IVA que muestra la vista del carrito
+IVA = Decimal('0.19')
+
+
+def total_con_iva(subtotal):
+    return (subtotal * (1 + IVA)).quantize(Decimal('0.01'))
+
+
+def confirmar_pedido(carrito, usuario, metodo_pago):
+    """
+    Convierte el carrito abierto en un pedido dentro de una sola
+    transacción: descuenta el stock (consumiendo las reservas del propio
+    carrito), inserta los ítems del pedido de una vez, marca el carrito
+    como completado, registra el primer seguimiento y actualiza una vez por
+    producto las facetas, el resumen de inventario, el stock en caché y
+    las versiones del detalle y de los fragmentos.
+    Lanza ValueError si el carrito ya no está abierto, está vacío o falta
+    stock para alguna variante; en ese caso no se modifica nada.
+    """
+    with transaction.atomic():
+        # Marcar el carrito primero bloquea su fila: un segundo envío del
+        # mismo carrito espera aquí y, al confirmarse este, no encuentra
+        # nada que completar.
+        ahora = timezone.now()
+        if not Carrito.objects.filter(pk=carrito.pk, completado=False).update(
+            completado=True, fecha_actualizacion=ahora
+        ):
+            raise ValueError('El carrito ya fue procesado')
+
+        items = list(ItemCarrito.objects.filter(carrito_id=carrito.pk).order_by('producto_id'))
+        if not items:
+            raise ValueError('El carrito está vacío')
+
+        # Reservas, productos y variantes se bloquean en ese orden y cada
+        # grupo por id, igual que en appLiher.reservas y en la edición de
+        # productos, para no interbloquearse con el barrido de reservas ni
+        # con otros checkouts. El bloqueo del producto además serializa la
+        # reindexación de sus facetas entre checkouts de variantes distintas.
+        reservado_propio = {}
+        for variante_id, cantidad in (
+            ReservaStock.objects
+            .select_for_update()
+            .filter(carrito_id=carrito.pk)
+            .order_by('variante_id')
+            .values_list('variante_id', 'cantidad')
+        ):
+            reservado_propio[variante_id] = reservado_propio.get(variante_id, 0) + cantidad
+
+        variante_ids = [item.producto_id for item in items]
+        productos_bloqueados = {
+            pk: (nombre, estado)
+            for pk, nombre, estado in (
+                Producto.objects
+                .select_for_update()
+                .filter(pk__in=VarianteProducto.objects.filter(pk__in=variante_ids).values('producto_id'))
+                .order_by('pk')
+                .values_list('pk', 'nombre', 'estado')
+            )
+        }
+        variantes = {
+            pk: (producto_id, activo)
+            for pk, producto_id, activo in (
+                VarianteProducto.objects
+                .select_for_update()
+                .filter(pk__in=variante_ids)
+                .order_by('pk')
+                .values_list('pk', 'producto_id', 'activo')
+            )
+        }
+        # Con las filas ya bloqueadas: nadie puede desactivarlas hasta el commit
+        for variante_id in variante_ids:
+            if variante_id not in variantes:
+                raise ValueError('Un producto del carrito ya no está disponible')
+            producto_id, activo = variantes[variante_id]
+            nombre, estado = productos_bloqueados[producto_id]
+            if not activo or estado != 'Activo':
+                raise ValueError(f'{nombre} ya no está disponible')
+        productos = {pk: producto_id for pk, (producto_id, _) in variantes.items()}
+
+        # Los update() no emiten señales: cada producto tocado se actualiza
+        # al salir del bloque, dentro de la misma transacción
+        with agrupar_actualizaciones():
+            for item in items:
+                propio = reservado_propio.get(item.producto_id, 0)
+                # UPDATE condicional: solo descuenta si lo que no está reservado
+                # por otros carritos alcanza para la cantidad pedida
+                if not VarianteProducto.objects.filter(
+                    pk=item.producto_id,
+                    stock__gte=F('stock_reservado') - propio + item.cantidad
+                ).update(
+                    stock=F('stock') - item.cantidad,
+                    stock_reservado=Greatest(F('stock_reservado') - propio, 0)
+                ):
+                    variante = (
+                        VarianteProducto.objects
+                        .select_related('producto')
+                        .filter(pk=item.producto_id)
+                        .first()
+                    )
+                    if variante is None:
+                        raise ValueError('Un producto del carrito ya no está disponible')
+                    disponible = max(variante.stock_disponible + propio, 0)
+                    raise ValueError(
+                        f'No hay suficiente stock de {variante.producto.nombre}. '
+                        f'Stock disponible: {disponible}'
+                    )
+                solicitar_actualizacion(productos[item.producto_id])
+        ReservaStock.objects.filter(carrito_id=carrito.pk).delete()
+
+        subtotal = sum((item.cantidad * item.precio_unitario for item in items), Decimal('0.00'))
+        pedido = Pedidos.objects.create(
+            cliente=usuario.email,
+            fecha=ahora,
+            estado_pedido='pendiente',
+            metodo_pago=metodo_pago,
+            total=total_con_iva(subtotal),
+            estado_pago='pendiente'
+        )
+        # bulk_create no llama a PedidoItem.save(): el subtotal va calculado
+        PedidoItem.objects.bulk_create([
+            PedidoItem(
+                pedido=pedido,
+                producto_id=productos[item.producto_id],
+                variante_id=item.producto_id,
+                cantidad=item.cantidad,
+                precio_unitario=item.precio_unitario,
+                subtotal=item.cantidad * item.precio_unitario
+            )
+            for item in items
+        ])
+        PedidoSeguimiento.objects.create(
+            pedido=pedido, estado='pendiente', comentario='Pedido creado'
+        )
+
+        # El stock también entra en las métricas
+        invalidar_metricas()
+
+    carrito.completado = True
+    return pedido
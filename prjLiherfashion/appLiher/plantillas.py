@@ -0,0 +1,51 @@
+#precompilación de plantillas al arrancar cada worker
+
+import logging
+import time
+from pathlib import Path
+
+from django.template import TemplateSyntaxError, engines
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_PLANTILLAS = Path(__file__).resolve().parent / 'templates'
+
+
+def nombres_plantillas(directorio=DIRECTORIO_PLANTILLAS):
+    return sorted(
+        ruta.relative_to(directorio).as_posix()
+        for ruta in directorio.rglob('*.html')
+    )
+
+
+def precompilar_plantillas():
+    """
+    Compila todas las plantillas de appLiher/templates para que queden en
+    el loader en caché del worker; así la primera petición a cada página
+    tras un despliegue no paga la compilación. Reporta el tiempo total y
+    las plantillas más lentas.
+    """
+    motor = engines['django']
+    tiempos = []
+    errores = []
+    inicio = time.perf_counter()
+    for nombre in nombres_plantillas():
+        antes = time.perf_counter()
+        try:
+            motor.get_template(nombre)
+        except TemplateSyntaxError as e:
+            errores.append(nombre)
+            logger.error("Plantilla %s no compila: %s", nombre, e)
+            continue
+        tiempos.append((time.perf_counter() - antes, nombre))
+    total = time.perf_counter() - inicio
+
+    lentas = ', '.join(
+        f"{nombre} ({segundos * 1000:.1f} ms)"
+        for segundos, nombre in sorted(tiempos, reverse=True)[:3]
+    )
+    logger.info(
+        "%d plantillas precompiladas en %.1f ms%s",
+        len(tiempos), total * 1000, f"; más lentas: {lentas}" if lentas else ""
+    )
+    return len(tiempos), errores, total
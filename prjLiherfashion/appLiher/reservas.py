@@ -0,0 +1,185 @@
+#reservas temporales de stock para los ítems del carrito
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .detalle_productos import invalidar_detalle_variantes
+from .models import ReservaStock, VarianteProducto
+from .stock import escribir_stock
+
+
+_estado = threading.local()
+
+
+def duracion_reserva():
+    return timedelta(minutes=getattr(settings, 'RESERVA_STOCK_MINUTOS', 30))
+
+
+def _apartar(variante_id, cantidad):
+    """
+    Aparta unidades con un UPDATE condicional: solo afecta la fila si
+    stock >= reservado + cantidad, así dos peticiones concurrentes nunca
+    pueden apartar más de lo que existe.
+    """
+    return VarianteProducto.objects.filter(
+        pk=variante_id,
+        stock__gte=F('stock_reservado') + cantidad
+    ).update(stock_reservado=F('stock_reservado') + cantidad)
+
+
+def _devolver(variante_id, cantidad):
+    VarianteProducto.objects.filter(pk=variante_id).update(
+        stock_reservado=Greatest(F('stock_reservado') - cantidad, 0)
+    )
+
+
+def fijar_reserva(carrito_id, variante_id, cantidad):
+    """
+    Deja reservadas exactamente `cantidad` unidades de la variante para el
+    carrito y renueva su vencimiento. Con cantidad 0 libera la reserva.
+    Lanza ValueError si no hay stock disponible suficiente.
+    """
+    with transaction.atomic():
+        reserva = (
+            ReservaStock.objects
+            .select_for_update()
+            .filter(carrito_id=carrito_id, variante_id=variante_id)
+            .first()
+        )
+        diferencia = cantidad - (reserva.cantidad if reserva else 0)
+
+        if diferencia > 0 and not _apartar(variante_id, diferencia) and not (
+            _recuperar_vencidas(variante_id, carrito_id) and _apartar(variante_id, diferencia)
+        ):
+            variante = VarianteProducto.objects.only('stock', 'stock_reservado').get(pk=variante_id)
+            disponible = variante.stock_disponible + (reserva.cantidad if reserva else 0)
+            raise ValueError(f'No hay suficiente stock. Stock disponible: {disponible}')
+        if diferencia < 0:
+            _devolver(variante_id, -diferencia)
+        if diferencia:
+            escribir_stock([variante_id])
+            invalidar_detalle_variantes([variante_id])
+
+        if cantidad == 0:
+            if reserva:
+                reserva.delete()
+            return None
+
+        expira = timezone.now() + duracion_reserva()
+        if reserva:
+            reserva.cantidad = cantidad
+            reserva.expira = expira
+            reserva.save(update_fields=['cantidad', 'expira'])
+        else:
+            reserva = ReservaStock.objects.create(
+                carrito_id=carrito_id,
+                variante_id=variante_id,
+                cantidad=cantidad,
+                expira=expira
+            )
+        return reserva
+
+
+def _liberar(reservas):
+    """
+    Devuelve al stock las unidades de las reservas dadas y las elimina.
+    Las variantes se actualizan en orden de id para evitar interbloqueos.
+    """
+    por_variante = defaultdict(int)
+    for reserva in reservas:
+        por_variante[reserva.variante_id] += reserva.cantidad
+    for variante_id in sorted(por_variante):
+        _devolver(variante_id, por_variante[variante_id])
+    escribir_stock(list(por_variante))
+    invalidar_detalle_variantes(list(por_variante))
+    ReservaStock.objects.filter(pk__in=[reserva.pk for reserva in reservas]).delete()
+    return sum(por_variante.values())
+
+
+def _recuperar_vencidas(variante_id, carrito_id):
+    """
+    Libera en el momento las reservas vencidas de otros carritos sobre la
+    variante, para no rechazar un pedido de stock que solo sigue apartado
+    porque el barrido aún no pasó. Retorna las unidades devueltas.
+    """
+    vencidas = list(
+        ReservaStock.objects
+        .select_for_update(skip_locked=True)
+        .filter(variante_id=variante_id, expira__lte=timezone.now())
+        .exclude(carrito_id=carrito_id)
+    )
+    return _liberar(vencidas) if vencidas else 0
+
+
+def liberar_reservas_carrito(carrito_id):
+    """
+    Libera todas las reservas de un carrito (al vaciarlo o eliminarlo).
+    """
+    return liberar_reservas_carritos([carrito_id])
+
+
+def liberar_reservas_carritos(carrito_ids):
+    """
+    Libera de una vez las reservas de varios carritos.
+    Retorna las unidades devueltas al stock.
+    """
+    with transaction.atomic():
+        reservas = list(
+            ReservaStock.objects
+            .select_for_update()
+            .filter(carrito_id__in=carrito_ids)
+            .order_by('variante_id')
+        )
+        if not reservas:
+            return 0
+        return _liberar(reservas)
+
+
+def liberar_reservas_vencidas(tamano_lote=500):
+    """
+    Barrido de reservas vencidas por lotes. Las filas bloqueadas por otra
+    transacción se saltan y quedan para la siguiente pasada.
+    Retorna (reservas liberadas, unidades devueltas).
+    """
+    reservas_liberadas = 0
+    unidades = 0
+    while True:
+        with transaction.atomic():
+            lote = list(
+                ReservaStock.objects
+                .select_for_update(skip_locked=True)
+                .filter(expira__lte=timezone.now())
+                .order_by('variante_id', 'pk')[:tamano_lote]
+            )
+            if not lote:
+                break
+            unidades += _liberar(lote)
+            reservas_liberadas += len(lote)
+    return reservas_liberadas, unidades
+
+
+@contextmanager
+def reservas_liberadas():
+    """
+    Para borrados masivos de carritos cuyas reservas ya se liberaron en
+    bloque (liberar_reservas_carritos): dentro del bloque la señal de
+    borrado no vuelve a consultarlas carrito por carrito.
+    """
+    anterior = getattr(_estado, 'liberadas', False)
+    _estado.liberadas = True
+    try:
+        yield
+    finally:
+        _estado.liberadas = anterior
+
+
+def liberacion_pendiente():
+    return not getattr(_estado, 'liberadas', False)
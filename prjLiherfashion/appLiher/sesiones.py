@@ -0,0 +1,36 @@
+#motor de sesiones que solo escribe cuando los datos cambian
+
+import hashlib
+
+from django.conf import settings
+
+if getattr(settings, 'SESIONES_EN_CACHE', False):
+    # Lectura desde la caché compartida (Redis) y escritura en ambas
+    from django.contrib.sessions.backends.cached_db import SessionStore as SessionStoreBase
+else:
+    # Con caché en memoria local cada worker tendría su propia copia de la
+    # sesión y leería datos viejos: se queda en la base de datos.
+    from django.contrib.sessions.backends.db import SessionStore as SessionStoreBase
+
+
+class SessionStore(SessionStoreBase):
+    """
+    Igual que el motor de Django, pero si la petición marcó la sesión como
+    modificada sin cambiar nada (p. ej. volver a guardar el mismo
+    contador del carrito) no se escribe.
+    """
+
+    def _firma(self, datos):
+        return hashlib.md5(self.serializer().dumps(datos)).hexdigest()
+
+    def load(self):
+        datos = super().load()
+        self._firma_cargada = self._firma(datos)
+        return datos
+
+    def save(self, must_create=False):
+        firma = self._firma(self._get_session(no_load=must_create))
+        if not must_create and self.session_key and firma == getattr(self, '_firma_cargada', None):
+            return
+        super().save(must_create=must_create)
+        self._firma_cargada = firma
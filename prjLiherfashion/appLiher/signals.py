@@ -0,0 +1,132 @@
+#señales para mantener sincronizadas las estructuras derivadas del catálogo
+
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .autocompletar import invalidar_autocompletar
+from .busqueda import CAMPOS_BUSQUEDA, actualizar_producto, eliminar_producto
+from .carritos import fusionar_carrito_invitado, invalidar_contador
+from .derivados import desmarcar_eliminacion, marcar_eliminacion, solicitar_actualizacion
+from .detalle_productos import invalidar_detalle
+from .fragmentos import invalidar_atributos
+from .metricas import invalidar_metricas
+from .models import Carrito, Categoria, Color, Producto, Talla, Usuarios, VarianteProducto
+from .reservas import liberacion_pendiente, liberar_reservas_carrito
+from .stock import invalidar_stock
+
+
+# ============================================================
+# ÍNDICE DE FACETAS Y RESUMEN DE INVENTARIO
+# ============================================================
+
+@receiver(post_save, sender=Producto)
+def producto_guardado(sender, instance, **kwargs):
+    solicitar_actualizacion(instance.pk)
+
+
+@receiver(pre_delete, sender=Producto)
+def producto_por_eliminar(sender, instance, **kwargs):
+    # Las variantes borradas en cascada no deben recrear filas derivadas
+    marcar_eliminacion(instance.pk)
+
+
+@receiver(post_delete, sender=Producto)
+def producto_eliminado(sender, instance, **kwargs):
+    desmarcar_eliminacion(instance.pk)
+    invalidar_detalle(instance.pk)
+
+
+@receiver(post_save, sender=VarianteProducto)
+@receiver(post_delete, sender=VarianteProducto)
+def variante_modificada(sender, instance, **kwargs):
+    solicitar_actualizacion(instance.producto_id)
+
+
+@receiver(post_delete, sender=VarianteProducto)
+def variante_eliminada_stock(sender, instance, **kwargs):
+    invalidar_stock([instance.pk])
+
+
+# ============================================================
+# BÚSQUEDA DE PRODUCTOS
+# ============================================================
+
+@receiver(post_save, sender=Producto)
+def producto_guardado_busqueda(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not CAMPOS_BUSQUEDA & set(update_fields):
+        return
+    actualizar_producto(instance.pk)
+
+
+@receiver(post_delete, sender=Producto)
+def producto_eliminado_busqueda(sender, instance, **kwargs):
+    eliminar_producto(instance.pk)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def producto_modificado_autocompletar(sender, update_fields=None, **kwargs):
+    # La versión también marca como viejo el índice de búsqueda en memoria
+    if update_fields and not (CAMPOS_BUSQUEDA | {'estado'}) & set(update_fields):
+        return
+    invalidar_autocompletar()
+
+
+# ============================================================
+# FRAGMENTOS DE LA TIENDA
+# ============================================================
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_save, sender=Talla)
+@receiver(post_delete, sender=Talla)
+def atributos_catalogo_modificados(sender, **kwargs):
+    # Cambian los filtros y las tarjetas (nombre de categoría, colores)
+    invalidar_atributos()
+
+
+# ============================================================
+# CARRITO AL INICIAR SESIÓN
+# ============================================================
+
+@receiver(user_logged_in)
+def usuario_inicio_sesion(sender, request, user, **kwargs):
+    if request is None or not hasattr(request, 'session'):
+        return
+    # Lo que el visitante agregó como invitado pasa a su carrito
+    carrito_invitado_id = request.session.pop('carrito_id', None)
+    if carrito_invitado_id:
+        fusionar_carrito_invitado(carrito_invitado_id, user)
+    # El contador guardado pertenecía al carrito anónimo
+    invalidar_contador(request)
+
+
+# ============================================================
+# RESERVAS DE STOCK
+# ============================================================
+
+@receiver(pre_delete, sender=Carrito)
+def carrito_eliminado(sender, instance, **kwargs):
+    # Devolver al stock lo apartado antes de que la cascada borre las reservas
+    if liberacion_pendiente():
+        liberar_reservas_carrito(instance.pk)
+
+
+# ============================================================
+# MÉTRICAS DEL PANEL
+# ============================================================
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=VarianteProducto)
+@receiver(post_delete, sender=VarianteProducto)
+@receiver(post_save, sender=Usuarios)
+@receiver(post_delete, sender=Usuarios)
+def catalogo_o_usuarios_modificados(sender, update_fields=None, **kwargs):
+    # Cada inicio de sesión guarda last_login; eso no cambia las métricas
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidar_metricas()
@@ -0,0 +1,93 @@
+#caché de lectura del stock por variante
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import VarianteProducto
+
+
+def _clave(variante_id):
+    return f'stock:{variante_id}'
+
+
+def _ttl():
+    return getattr(settings, 'STOCK_CACHE_TTL', 300)
+
+
+def _guardar(filas):
+    """
+    Programa la escritura en caché de filas (id, stock, reservado) para
+    después del commit, así nunca se publica un valor que se deshizo.
+    """
+    valores = {_clave(pk): (stock, reservado) for pk, stock, reservado in filas}
+    if valores:
+        transaction.on_commit(lambda: cache.set_many(valores, _ttl()))
+
+
+def leer_stock(variante_ids):
+    """
+    Retorna {id: (stock, reservado)} leyendo primero de la caché y con una
+    sola consulta para las variantes que falten. Las variantes que no
+    existen no aparecen en el resultado.
+    """
+    variante_ids = list(variante_ids)
+    encontrados = cache.get_many([_clave(pk) for pk in variante_ids])
+    resultado = {}
+    faltantes = []
+    for pk in variante_ids:
+        valor = encontrados.get(_clave(pk))
+        if valor is None:
+            faltantes.append(pk)
+        else:
+            resultado[pk] = valor
+    if faltantes:
+        filas = list(
+            VarianteProducto.objects
+            .filter(pk__in=faltantes)
+            .values_list('pk', 'stock', 'stock_reservado')
+        )
+        cache.set_many({_clave(pk): (stock, reservado) for pk, stock, reservado in filas}, _ttl())
+        resultado.update({pk: (stock, reservado) for pk, stock, reservado in filas})
+    return resultado
+
+
+def stock_disponible(variante_id):
+    """
+    Stock sin reservar según la caché, o None si la variante no existe.
+    Es solo orientativa: cuenta como apartadas las reservas vencidas que el
+    barrido aún no liberó y puede quedar desactualizada hasta
+    STOCK_CACHE_TTL, así que no sirve para rechazar un pedido; eso lo
+    decide la reserva con UPDATE condicional (appLiher.reservas).
+    """
+    valor = leer_stock([variante_id]).get(variante_id)
+    if valor is None:
+        return None
+    stock, reservado = valor
+    return max(stock - reservado, 0)
+
+
+def escribir_stock(variante_ids):
+    """
+    Escritura a través de la caché tras modificar el stock o lo reservado
+    de estas variantes: relee las filas en la transacción en curso y las
+    publica al confirmar.
+    """
+    _guardar(
+        VarianteProducto.objects
+        .filter(pk__in=list(variante_ids))
+        .values_list('pk', 'stock', 'stock_reservado')
+    )
+
+
+def escribir_stock_producto(producto_id):
+    _guardar(
+        VarianteProducto.objects
+        .filter(producto_id=producto_id)
+        .values_list('pk', 'stock', 'stock_reservado')
+    )
+
+
+def invalidar_stock(variante_ids):
+    claves = [_clave(pk) for pk in variante_ids]
+    transaction.on_commit(lambda: cache.delete_many(claves))
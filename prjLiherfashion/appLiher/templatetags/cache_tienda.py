@@ -0,0 +1,46 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+
+from appLiher.fragmentos import registrar_uso
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    def __init__(self, nodelist, clave, nombre):
+        self.nodelist = nodelist
+        self.clave = clave
+        self.nombre = nombre
+
+    def render(self, context):
+        clave = self.clave.resolve(context)
+        nombre = self.nombre.resolve(context)
+        # La vista pudo haber leído ya los fragmentos con get_many
+        precargados = context.get('fragmentos_precargados') or {}
+        contenido = precargados.get(clave)
+        if contenido is None:
+            contenido = cache.get(clave)
+        if contenido is None:
+            contenido = self.nodelist.render(context)
+            cache.set(clave, contenido, getattr(settings, 'FRAGMENTOS_TTL', 3600))
+            registrar_uso(nombre, False)
+        else:
+            registrar_uso(nombre, True)
+        return contenido
+
+
+@register.tag
+def fragmento(parser, token):
+    """
+    {% fragmento clave "nombre" %} ... {% endfragmento %}
+
+    Como {% cache %}, pero con la clave calculada en appLiher.fragmentos
+    (versionada e invalidada por señales) y contando aciertos por nombre.
+    """
+    partes = token.split_contents()
+    if len(partes) != 3:
+        raise template.TemplateSyntaxError("Uso: {% fragmento clave \"nombre\" %}")
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(nodelist, parser.compile_filter(partes[1]), parser.compile_filter(partes[2]))
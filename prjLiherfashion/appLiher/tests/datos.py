@@ -0,0 +1,22 @@
+#datos de prueba compartidos por los tests de appLiher
+
+import itertools
+from decimal import Decimal
+
+from appLiher.models import Categoria, Color, Producto, Talla, VarianteProducto
+
+_secuencia = itertools.count(1)
+
+
+def crear_variante(stock, precio=Decimal('10.00')):
+    """
+    Producto activo con una sola variante y el stock indicado.
+    """
+    n = next(_secuencia)
+    categoria, _ = Categoria.objects.get_or_create(categoria='Pruebas')
+    color, _ = Color.objects.get_or_create(color='Negro', defaults={'codigo_hex': '#000000'})
+    talla, _ = Talla.objects.get_or_create(talla='M', defaults={'orden': 2})
+    producto = Producto.objects.create(
+        nombre=f'Producto {n}', referencia=f'P{n}', categoria=categoria, precio=precio
+    )
+    return VarianteProducto.objects.create(producto=producto, color=color, talla=talla, stock=stock)
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from appLiher.backends import ip_cliente, verificar_credenciales
+from appLiher.limites import CubetaFichas
+from appLiher.models import Usuarios
+
+
+class CubetaFichasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_agota_y_reinicia(self):
+        cubeta = CubetaFichas('prueba', 3, 60)
+        for _ in range(3):
+            self.assertTrue(cubeta.disponible('a'))
+            cubeta.consumir('a')
+        self.assertFalse(cubeta.disponible('a'))
+        self.assertTrue(cubeta.disponible('b'))
+        cubeta.reiniciar('a')
+        self.assertTrue(cubeta.disponible('a'))
+
+    def test_no_pierde_intentos_concurrentes(self):
+        cubeta = CubetaFichas('prueba', 1000, 60)
+        hilos = [
+            threading.Thread(target=lambda: [cubeta.consumir('a') for _ in range(50)])
+            for _ in range(8)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        numero = int(time.time() // cubeta.ventana)
+        self.assertEqual(cache.get(cubeta._clave('a', numero)), 400)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class AccesoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuarios.objects.create_user(email='cliente@x.com', password='Qm9#vLpTz!Rw')
+        self.factory = RequestFactory()
+
+    @override_settings(ACCESO_INTENTOS_EMAIL=2)
+    def test_limita_por_correo_antes_del_hash(self):
+        request = self.factory.post('/')
+        self.assertEqual(verificar_credenciales(request, 'cliente@x.com', 'mala')[0], 'incorrecto')
+        self.assertEqual(verificar_credenciales(request, 'cliente@x.com', 'mala')[0], 'incorrecto')
+        self.assertEqual(verificar_credenciales(request, 'Cliente@X.com', 'Qm9#vLpTz!Rw')[0], 'limitado')
+
+    @override_settings(ACCESO_INTENTOS_EMAIL=100, ACCESO_INTENTOS_IP=0)
+    def test_sin_limite_por_ip_una_misma_direccion_no_bloquea_a_todos(self):
+        # Detrás de un proxy todos los clientes comparten REMOTE_ADDR
+        request = self.factory.post('/', REMOTE_ADDR='10.0.0.1')
+        for n in range(30):
+            verificar_credenciales(request, f'otro{n}@x.com', 'mala')
+        self.assertEqual(verificar_credenciales(request, 'cliente@x.com', 'Qm9#vLpTz!Rw')[0], 'ok')
+
+    @override_settings(ACCESO_INTENTOS_EMAIL=100, ACCESO_INTENTOS_IP=2,
+                       ACCESO_CABECERA_IP='HTTP_X_FORWARDED_FOR', ACCESO_PROXIES_CONFIABLES=1)
+    def test_limite_por_ip_usa_la_cabecera_del_proxy(self):
+        atacante = self.factory.post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.5')
+        cliente = self.factory.post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='198.51.100.7')
+        for n in range(2):
+            verificar_credenciales(atacante, f'otro{n}@x.com', 'mala')
+        self.assertEqual(verificar_credenciales(atacante, 'cliente@x.com', 'Qm9#vLpTz!Rw')[0], 'limitado')
+        self.assertEqual(verificar_credenciales(cliente, 'cliente@x.com', 'Qm9#vLpTz!Rw')[0], 'ok')
+
+    @override_settings(ACCESO_CABECERA_IP='HTTP_X_FORWARDED_FOR', ACCESO_PROXIES_CONFIABLES=1)
+    def test_ip_cliente_ignora_las_entradas_que_inventa_el_cliente(self):
+        request = self.factory.post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.5')
+        self.assertEqual(ip_cliente(request), '203.0.113.5')
@@ -0,0 +1,41 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from appLiher.autocompletar import _subir_version
+from appLiher.busqueda import BusquedaIndiceInvertido
+from appLiher.models import Producto
+
+from .datos import crear_variante
+
+
+class BusquedaIndiceInvertidoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backend = BusquedaIndiceInvertido()
+
+    def buscar(self, texto):
+        return list(self.backend.buscar(Producto.objects.all(), texto).order_by('-rango', '-pk'))
+
+    @override_settings(BUSQUEDA_MAX_RESULTADOS=3)
+    def test_solo_los_mas_relevantes_llegan_a_la_consulta(self):
+        productos = [crear_variante(stock=1).producto for _ in range(5)]
+        Producto.objects.filter(pk=productos[0].pk).update(descripcion='Producto producto')
+        self.backend._indice = None
+
+        encontrados = self.buscar('producto')
+
+        self.assertEqual(len(encontrados), 3)
+        # El más relevante primero y, a igual relevancia, los más nuevos
+        self.assertEqual(
+            [producto.pk for producto in encontrados],
+            [productos[0].pk, productos[4].pk, productos[3].pk]
+        )
+
+    def test_se_reconstruye_cuando_otro_proceso_cambia_el_catalogo(self):
+        producto = crear_variante(stock=1).producto
+        self.assertEqual(self.buscar('blusa'), [])
+        # Edición hecha en otro worker: sin señales en este proceso, solo la versión
+        Producto.objects.filter(pk=producto.pk).update(nombre='Blusa de lino')
+        _subir_version()
+        self.assertEqual(self.buscar('blusa'), [producto])
@@ -0,0 +1,32 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from appLiher.facetas import obtener_facetas
+from appLiher.models import Color, VarianteProducto
+
+from .datos import crear_variante
+
+
+class FiltrosCatalogoTests(TestCase):
+
+    def test_el_listado_coincide_con_el_conteo_de_la_faceta(self):
+        rojo = Color.objects.create(color='Rojo', codigo_hex='#ff0000')
+        con_stock = crear_variante(stock=2)
+        VarianteProducto.objects.create(
+            producto=con_stock.producto, color=rojo, talla=con_stock.talla, stock=1
+        )
+        agotada = crear_variante(stock=2)
+        VarianteProducto.objects.create(
+            producto=agotada.producto, color=rojo, talla=agotada.talla, stock=0
+        )
+        inactiva = crear_variante(stock=2)
+        VarianteProducto.objects.create(
+            producto=inactiva.producto, color=rojo, talla=inactiva.talla, stock=3, activo=False
+        )
+
+        respuesta = self.client.get(reverse('vista_productos'), {'color': 'Rojo'})
+
+        listados = {producto.pk for producto in respuesta.context['productos']}
+        self.assertEqual(listados, {con_stock.producto_id})
+        conteo = {color['color']: color['count'] for color in obtener_facetas()['colores']}
+        self.assertEqual(conteo['Rojo'], len(listados))
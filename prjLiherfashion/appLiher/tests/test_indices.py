@@ -0,0 +1,134 @@
+import unittest
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from appLiher.busqueda import buscar_productos
+from appLiher.paginacion import _filtro_keyset
+from appLiher.models import (
+    Carrito,
+    Categoria,
+    Color,
+    Pedidos,
+    PeticionProducto,
+    Producto,
+    Talla,
+    Usuarios,
+    VarianteProducto,
+)
+
+
+class IndicesConsultasTests(TestCase):
+    """
+    Las consultas principales de las vistas usan los índices de las
+    migraciones 0008 y 0013 sobre un conjunto de datos sembrado y con
+    estadísticas, con el planificador libre de elegir el scan secuencial:
+    hay filas suficientes para que el índice gane por costo.
+    """
+
+    PRODUCTOS = 3000
+    USUARIOS = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(categoria='Camisas')
+        colores = Color.objects.bulk_create([Color(color=f'Color {n}') for n in range(4)])
+        tallas = Talla.objects.bulk_create([Talla(talla=f'T{n}', orden=n) for n in range(4)])
+        Producto.objects.bulk_create([
+            Producto(
+                nombre=f'Camisa {n}', referencia=f'R{n}', categoria=categoria,
+                precio=Decimal('10.00'), estado='Activo' if n % 5 else 'Inactivo'
+            )
+            for n in range(cls.PRODUCTOS)
+        ])
+        productos = list(Producto.objects.all())
+        VarianteProducto.objects.bulk_create([
+            VarianteProducto(
+                producto=producto, color=colores[n % 4], talla=tallas[n // 4],
+                stock=n, activo=bool(n % 3)
+            )
+            for producto in productos for n in range(16)
+        ])
+        Usuarios.objects.bulk_create([
+            Usuarios(email=f'cliente{n}@x.com')
+            for n in range(cls.USUARIOS)
+        ])
+        usuarios = list(Usuarios.objects.all())
+        Carrito.objects.bulk_create([
+            Carrito(usuario=usuario, completado=n > 0)
+            for usuario in usuarios for n in range(8)
+        ])
+        ahora = timezone.now()
+        Pedidos.objects.bulk_create([
+            Pedidos(
+                cliente=usuario.email, fecha=ahora - timedelta(days=n),
+                estado_pedido='pendiente', metodo_pago='visa',
+                total=Decimal('10.00'), estado_pago='pendiente'
+            )
+            for usuario in usuarios for n in range(20)
+        ])
+        variantes = list(VarianteProducto.objects.all()[:3000])
+        PeticionProducto.objects.bulk_create([
+            PeticionProducto(usuario=usuarios[n % cls.USUARIOS], producto=variante, atendida=n % 10 > 0)
+            for n, variante in enumerate(variantes)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.usuario = usuarios[0]
+        cls.producto = productos[1]
+
+    def assertUsaIndice(self, consulta, indice):
+        plan = consulta.explain()
+        self.assertIn(indice, plan, f"No se usa {indice}:\n{plan}")
+        return plan
+
+    def assertSinOrdenar(self, plan):
+        # El índice ya entrega el orden: ni Sort (PostgreSQL) ni árbol temporal (SQLite)
+        self.assertNotIn('Sort', plan, plan)
+        self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_listado_de_productos(self):
+        orden = ['-fecha_creacion', '-idproducto']
+        listado = Producto.objects.filter(estado='Activo').order_by(*orden)
+        self.assertSinOrdenar(self.assertUsaIndice(listado[:12], 'producto_estado_fecha_idx'))
+
+        # Página siguiente del cursor: el predicado también sale del índice
+        ultimo = listado[11]
+        siguiente = listado.filter(
+            _filtro_keyset(orden, [ultimo.fecha_creacion, ultimo.pk], hacia_atras=False)
+        )[:12]
+        self.assertSinOrdenar(self.assertUsaIndice(siguiente, 'producto_estado_fecha_idx'))
+
+    def test_variantes_activas_del_producto(self):
+        self.assertUsaIndice(
+            VarianteProducto.objects.filter(producto=self.producto, activo=True, stock__gt=0),
+            'variante_activa_stock_idx'
+        )
+
+    def test_carrito_abierto_del_usuario(self):
+        self.assertUsaIndice(
+            Carrito.objects.filter(usuario=self.usuario, completado=False),
+            'carrito_abierto_usuario_idx'
+        )
+
+    def test_pedidos_del_cliente(self):
+        self.assertSinOrdenar(self.assertUsaIndice(
+            Pedidos.objects.filter(cliente=self.usuario.email).order_by('-fecha', '-idpedido')[:10],
+            'pedidos_cliente_fecha_idx'
+        ))
+
+    def test_peticiones_pendientes(self):
+        self.assertUsaIndice(
+            PeticionProducto.objects.filter(atendida=False).order_by('-fecha_peticion'),
+            'peticion_pendiente_fecha_idx'
+        )
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', "El índice GIN solo existe en PostgreSQL")
+    def test_busqueda_de_productos(self):
+        self.assertUsaIndice(
+            buscar_productos(Producto.objects.filter(estado='Activo'), 'camisa'),
+            'producto_vector_busqueda_gin'
+        )
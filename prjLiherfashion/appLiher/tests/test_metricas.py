@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+
+from appLiher.metricas import CLAVE_METRICAS, invalidar_metricas, obtener_metricas
+from appLiher.models import Talla
+from appLiher.variantes import crear_variantes
+
+from .datos import crear_variante
+
+
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_invalida_despues_del_commit(self):
+        obtener_metricas()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                invalidar_metricas()
+                # Un lector antes del commit no debe poder cachear de nuevo
+                self.assertIsNotNone(cache.get(CLAVE_METRICAS))
+        self.assertIsNone(cache.get(CLAVE_METRICAS))
+
+    def test_las_escrituras_en_bloque_invalidan_las_metricas(self):
+        variante = crear_variante(stock=2)
+        talla = Talla.objects.create(talla='L', orden=3)
+        antes = obtener_metricas()['total_variantes']
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_variantes(variante.producto, [{'talla': talla.pk, 'color': variante.color_id, 'stock': 4}])
+        self.assertEqual(obtener_metricas()['total_variantes'], antes + 1)
@@ -0,0 +1,179 @@
+import sys
+import threading
+import time
+import unittest
+
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from appLiher.models import (
+    Carrito,
+    FacetaCatalogo,
+    ItemCarrito,
+    MetodoPago,
+    PedidoItem,
+    Pedidos,
+    ResumenInventario,
+    Talla,
+    Usuarios,
+    VarianteProducto,
+)
+from appLiher.pedidos import confirmar_pedido
+from appLiher.reservas import fijar_reserva
+
+from .datos import crear_variante
+
+
+def llenar_carrito(usuario, *lineas):
+    carrito = Carrito.objects.create(usuario=usuario)
+    for variante, cantidad in lineas:
+        ItemCarrito.objects.create(
+            carrito=carrito, producto=variante, cantidad=cantidad,
+            precio_unitario=variante.producto.precio
+        )
+    return carrito
+
+
+class ConfirmarPedidoTests(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuarios.objects.create(email='cliente@x.com')
+
+    def test_crea_el_pedido_y_actualiza_los_derivados(self):
+        agotada = crear_variante(stock=2)
+        otra = crear_variante(stock=5)
+        carrito = llenar_carrito(self.usuario, (agotada, 2), (otra, 1))
+        fijar_reserva(carrito.pk, agotada.pk, 2)
+        self.assertTrue(FacetaCatalogo.objects.filter(producto=agotada.producto).exists())
+
+        pedido = confirmar_pedido(carrito, self.usuario, 'Visa')
+
+        self.assertEqual(pedido.items.count(), 2)
+        self.assertEqual(pedido.seguimientos.get().estado, 'pendiente')
+        self.assertTrue(Carrito.objects.get(pk=carrito.pk).completado)
+        agotada.refresh_from_db()
+        self.assertEqual((agotada.stock, agotada.stock_reservado), (0, 0))
+        resumen = ResumenInventario.objects.get(producto=agotada.producto)
+        self.assertEqual((resumen.total_stock, resumen.variantes_agotadas), (0, 1))
+        self.assertFalse(FacetaCatalogo.objects.filter(producto=agotada.producto).exists())
+        self.assertEqual(ResumenInventario.objects.get(producto=otra.producto).total_stock, 4)
+        self.assertTrue(FacetaCatalogo.objects.filter(producto=otra.producto).exists())
+
+    def test_sin_stock_no_modifica_nada(self):
+        variante = crear_variante(stock=1)
+        carrito = llenar_carrito(self.usuario, (variante, 2))
+        with self.assertRaises(ValueError):
+            confirmar_pedido(carrito, self.usuario, 'Visa')
+        variante.refresh_from_db()
+        self.assertEqual(variante.stock, 1)
+        self.assertFalse(Carrito.objects.get(pk=carrito.pk).completado)
+        self.assertFalse(Pedidos.objects.exists())
+
+    def test_no_vende_productos_o_variantes_desactivados(self):
+        variante = crear_variante(stock=5)
+        inactiva = crear_variante(stock=5)
+        VarianteProducto.objects.filter(pk=inactiva.pk).update(activo=False)
+        desactivado = crear_variante(stock=5)
+        desactivado.producto.estado = 'Inactivo'
+        desactivado.producto.save()
+        for retirada in (inactiva, desactivado):
+            carrito = llenar_carrito(self.usuario, (variante, 1), (retirada, 1))
+            with self.assertRaisesMessage(ValueError, 'ya no está disponible'):
+                confirmar_pedido(carrito, self.usuario, 'Visa')
+            self.assertFalse(Carrito.objects.get(pk=carrito.pk).completado)
+        variante.refresh_from_db()
+        self.assertEqual(variante.stock, 5)
+        self.assertFalse(Pedidos.objects.exists())
+
+    def test_no_confirma_dos_veces_el_mismo_carrito(self):
+        variante = crear_variante(stock=5)
+        carrito = llenar_carrito(self.usuario, (variante, 1))
+        confirmar_pedido(carrito, self.usuario, 'Visa')
+        with self.assertRaises(ValueError):
+            confirmar_pedido(carrito, self.usuario, 'Visa')
+        self.assertEqual(Pedidos.objects.count(), 1)
+
+    def test_finalizar_compra_lleva_a_mis_pedidos(self):
+        variante = crear_variante(stock=5)
+        llenar_carrito(self.usuario, (variante, 1))
+        metodo = MetodoPago.objects.create(
+            usuario=self.usuario, tipo_tarjeta='visa', ultimos_digitos='4242',
+            nombre_titular='Cliente', fecha_vencimiento='12/2030'
+        )
+        self.client.force_login(self.usuario)
+        respuesta = self.client.post(reverse('finalizar_compra'), {'payment_method': metodo.pk}, follow=True)
+        self.assertRedirects(respuesta, reverse('mis_pedidos'))
+        self.assertEqual(Pedidos.objects.filter(cliente=self.usuario.email).count(), 1)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Requiere bloqueos de fila de PostgreSQL")
+class CheckoutConcurrenteTests(TransactionTestCase):
+    """
+    Prueba de carga: muchos checkouts a la vez con variantes compartidas
+    (dos del mismo producto). Ninguno se interbloquea, nunca se vende más
+    de lo que hay y el stock baja exactamente lo que suman los pedidos.
+    """
+
+    HILOS = 24
+    STOCK = 10
+
+    def test_checkouts_concurrentes_con_variantes_compartidas(self):
+        primera = crear_variante(stock=self.STOCK)
+        segunda = VarianteProducto.objects.create(
+            producto=primera.producto, color=primera.color,
+            talla=Talla.objects.create(talla='L', orden=3), stock=self.STOCK
+        )
+        tercera = crear_variante(stock=self.STOCK)
+        variantes = [primera, segunda, tercera]
+        carritos = []
+        for n in range(self.HILOS):
+            usuario = Usuarios.objects.create(email=f'cliente{n}@x.com')
+            # Cada carrito lleva dos variantes, en un orden distinto según el hilo
+            carritos.append(llenar_carrito(
+                usuario, (variantes[n % 3], 1), (variantes[(n + 1) % 3], 1)
+            ))
+
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        errores = []
+
+        def comprar(carrito):
+            try:
+                barrera.wait()
+                confirmar_pedido(carrito, carrito.usuario, 'Visa')
+                resultados.append(True)
+            except ValueError:
+                resultados.append(False)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=comprar, args=(carrito,)) for carrito in carritos]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+        print(
+            f"\n{self.HILOS} checkouts en {duracion:.2f} s "
+            f"({self.HILOS / duracion:.1f} por segundo, {resultados.count(True)} confirmados)",
+            file=sys.stderr
+        )
+
+        self.assertEqual(errores, [])
+        self.assertEqual(Pedidos.objects.count(), resultados.count(True))
+        for variante in variantes:
+            variante.refresh_from_db()
+            vendidas = PedidoItem.objects.filter(variante=variante).aggregate(
+                total=Sum('cantidad', default=0)
+            )['total']
+            self.assertGreaterEqual(variante.stock, 0)
+            self.assertEqual(variante.stock, self.STOCK - vendidas)
+        self.assertEqual(
+            ResumenInventario.objects.get(producto=primera.producto).total_stock,
+            primera.stock + segunda.stock
+        )
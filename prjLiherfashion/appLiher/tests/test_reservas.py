@@ -0,0 +1,126 @@
+import threading
+import unittest
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from appLiher.carritos import agregar_item
+from appLiher.models import Carrito, ItemCarrito, ReservaStock
+from appLiher.reservas import fijar_reserva, liberar_reservas_vencidas
+
+from .datos import crear_variante
+
+
+class ReservasTests(TestCase):
+
+    def test_no_aparta_mas_que_el_stock(self):
+        variante = crear_variante(stock=3)
+        fijar_reserva(Carrito.objects.create().pk, variante.pk, 2)
+        with self.assertRaises(ValueError):
+            fijar_reserva(Carrito.objects.create().pk, variante.pk, 2)
+        variante.refresh_from_db()
+        self.assertEqual(variante.stock_reservado, 2)
+
+    def test_barrido_libera_las_vencidas(self):
+        variante = crear_variante(stock=3)
+        reserva = fijar_reserva(Carrito.objects.create().pk, variante.pk, 3)
+        ReservaStock.objects.filter(pk=reserva.pk).update(expira=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(liberar_reservas_vencidas(), (1, 3))
+        variante.refresh_from_db()
+        self.assertEqual(variante.stock_reservado, 0)
+
+    def test_recupera_vencidas_sin_esperar_al_barrido(self):
+        variante = crear_variante(stock=3)
+        vieja = fijar_reserva(Carrito.objects.create().pk, variante.pk, 3)
+        ReservaStock.objects.filter(pk=vieja.pk).update(expira=timezone.now() - timedelta(minutes=1))
+
+        fijar_reserva(Carrito.objects.create().pk, variante.pk, 2)
+        variante.refresh_from_db()
+        self.assertEqual(variante.stock_reservado, 2)
+        self.assertFalse(ReservaStock.objects.filter(pk=vieja.pk).exists())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Requiere bloqueos de fila de PostgreSQL")
+class ReservasConcurrentesTests(TransactionTestCase):
+    """
+    Muchos hilos piden la misma variante a la vez: nunca se aparta más
+    de lo que hay en stock, ni se duplican ítems o reservas de un carrito.
+    """
+
+    HILOS = 30
+    STOCK = 7
+
+    def test_no_sobrevende_bajo_concurrencia(self):
+        variante = crear_variante(stock=self.STOCK)
+        carritos = [Carrito.objects.create().pk for _ in range(self.HILOS)]
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+
+        def pedir(carrito_id):
+            try:
+                barrera.wait()
+                fijar_reserva(carrito_id, variante.pk, 1)
+                resultados.append(True)
+            except ValueError:
+                resultados.append(False)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=pedir, args=(carrito_id,)) for carrito_id in carritos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        variante.refresh_from_db()
+        self.assertEqual(resultados.count(True), self.STOCK)
+        self.assertEqual(variante.stock_reservado, self.STOCK)
+        self.assertEqual(ReservaStock.objects.filter(variante=variante).count(), self.STOCK)
+
+    def test_agregados_simultaneos_al_mismo_carrito_suman_un_solo_item(self):
+        variante = crear_variante(stock=self.HILOS)
+        carrito = Carrito.objects.create()
+        barrera = threading.Barrier(self.HILOS)
+        errores = []
+
+        def agregar():
+            try:
+                barrera.wait()
+                agregar_item(carrito, variante, 1)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=agregar) for _ in range(self.HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(ItemCarrito.objects.get(carrito=carrito).cantidad, self.HILOS)
+        self.assertEqual(ReservaStock.objects.get(carrito=carrito).cantidad, self.HILOS)
+
+
+class AgregarAlCarritoTests(TestCase):
+
+    def test_la_cache_desactualizada_no_rechaza_stock_libre(self):
+        variante = crear_variante(stock=3)
+        vieja = fijar_reserva(Carrito.objects.create().pk, variante.pk, 3)
+        ReservaStock.objects.filter(pk=vieja.pk).update(expira=timezone.now() - timedelta(minutes=1))
+        # La caché aún ve las 3 unidades apartadas por la reserva vencida
+        cache.set(f'stock:{variante.pk}', (3, 3))
+
+        respuesta = self.client.post(
+            reverse('agregar_al_carrito', args=[variante.pk]), {'cantidad': 2},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+
+        self.assertTrue(respuesta.json()['success'])
+        variante.refresh_from_db()
+        self.assertEqual(variante.stock_reservado, 2)
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.pagina_principal, name='pagina_principal'),
     path('productos/', views.vista_productos, name='vista_productos'),
     path('productos/<int:idproducto>/', views.detalle_producto, name='detalle_producto'),
+    path('productos/autocompletar/', views.autocompletar_productos, name='autocompletar_productos'),
 
 
     #AUTENTICACIÓN Y REGISTRO
@@ -46,6 +47,7 @@ urlpatterns = [
     #CHECKOUT Y PAGOS
     path('envio/', views.envio, name='envio'),
     path('pago/', views.pago, name='pago'),
+    path('pago/finalizar/', views.finalizar_compra, name='finalizar_compra'),
     path('identificacion/', views.identificacion, name='identificacion'),
 
 
@@ -107,6 +109,7 @@ urlpatterns = [
     path('usuarios/ver/<int:user_id>/', views.ver_usuario, name='ver_usuario'),
     path('usuarios/obtener/<int:id>/', views.obtener_usuario, name='obtener_usuario'),
     path('usuarios/toggle/<int:id>/', views.toggle_usuario_activo, name='toggle_usuario_activo'),
+    path('usuarios/correos-masivos/', views.correos_masivos, name='correos_masivos'),
 
 
     #GESTIÓN DE PEDIDOS (ADMIN)
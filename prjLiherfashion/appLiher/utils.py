@@ -1,9 +1,9 @@
 #funciones auxiliares
 
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.urls import reverse
-from django.conf import settings
+
+from .correos import encolar_correo
 
 def enviar_correo_usuario_existente(user, request):
     password_reset_url = request.build_absolute_uri(reverse('account_reset_password'))
@@ -12,11 +12,4 @@ def enviar_correo_usuario_existente(user, request):
         'autenticacion/email/usuario_existente.html',
         {'user': user, 'password_reset_url': password_reset_url}
     )
-    correo = EmailMultiAlternatives(
-        asunto,
-        '',  # texto plano opcional
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-    )
-    correo.attach_alternative(mensaje_html, "text/html")
-    correo.send()
+    encolar_correo(asunto, '', [user.email], html=mensaje_html)
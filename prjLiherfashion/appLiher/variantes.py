@@ -0,0 +1,222 @@
+#creación y edición de variantes de producto por lotes
+
+from django.db import transaction
+
+from .carritos import descontar_variantes
+from .derivados import agrupar_actualizaciones, solicitar_actualizacion
+from .metricas import invalidar_metricas
+from .models import Color, Talla, VarianteProducto
+
+
+def _a_entero(valor, por_defecto=None):
+    if valor in (None, ''):
+        return por_defecto
+    return int(valor)
+
+
+def crear_variantes(producto, filas):
+    """
+    Crea las variantes de `filas` (dicts con talla, color, stock e imagen
+    opcional) con un número fijo de consultas: tallas y colores se resuelven
+    con in_bulk, los duplicados se detectan con una sola consulta y las
+    filas válidas se insertan con bulk_create dentro de una transacción.
+    Retorna (variantes creadas, lista de errores).
+    """
+    errores = []
+    validas = []
+    for numero, fila in enumerate(filas, start=1):
+        try:
+            talla_id = _a_entero(fila.get('talla'))
+            color_id = _a_entero(fila.get('color'))
+        except (TypeError, ValueError):
+            errores.append(f"Variante {numero}: Talla o color no válido")
+            continue
+        try:
+            stock = _a_entero(fila.get('stock'), 0)
+            if stock < 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            errores.append(f"Variante {numero}: Stock inválido")
+            continue
+        validas.append((numero, talla_id, color_id, stock, fila.get('imagen')))
+
+    tallas = Talla.objects.in_bulk({talla_id for _, talla_id, _, _, _ in validas})
+    colores = Color.objects.in_bulk({color_id for _, _, color_id, _, _ in validas})
+    existentes = set(
+        VarianteProducto.objects
+        .filter(producto=producto)
+        .values_list('talla_id', 'color_id')
+    )
+
+    nuevas = []
+    for numero, talla_id, color_id, stock, imagen in validas:
+        talla = tallas.get(talla_id)
+        color = colores.get(color_id)
+        if talla is None or color is None:
+            errores.append(f"Variante {numero}: Talla o color no válido")
+            continue
+        if (talla_id, color_id) in existentes:
+            errores.append(f"La variante {talla.talla} - {color.color} ya existe")
+            continue
+        existentes.add((talla_id, color_id))
+        variante = VarianteProducto(
+            producto=producto,
+            talla=talla,
+            color=color,
+            stock=stock
+        )
+        if imagen:
+            variante.imagen = imagen
+        nuevas.append(variante)
+
+    if nuevas:
+        with transaction.atomic():
+            VarianteProducto.objects.bulk_create(nuevas)
+            # bulk_create no emite post_save: se actualiza el producto una vez
+            solicitar_actualizacion(producto.pk)
+            invalidar_metricas()
+
+    return nuevas, errores
+
+
+def _agrupar_campos(datos, prefijo):
+    """
+    Convierte claves tipo prefijo[clave][campo] en {clave: {campo: valor}}.
+    """
+    grupos = {}
+    for key, value in datos.items():
+        if key.startswith(prefijo + '['):
+            parts = key.split('[')
+            if len(parts) >= 3:
+                clave = parts[1].replace(']', '')
+                campo = parts[2].replace(']', '')
+                grupos.setdefault(clave, {})[campo] = value
+    return grupos
+
+
+def calcular_cambios_variantes(producto, datos, procesar_imagen):
+    """
+    Calcula, sin escribir nada, el conjunto de cambios que pide el
+    formulario de edición: variantes a eliminar, variantes con stock o
+    imagen modificados y variantes nuevas. `procesar_imagen` convierte las
+    imágenes en base64 (ver views.procesar_imagen_base64).
+    """
+    existentes = {
+        variante.idvariante: variante
+        for variante in producto.variantes.select_related('talla', 'color')
+    }
+    cambios = {
+        'eliminar': [],
+        'actualizar_stock': [],
+        'actualizar_imagen': [],
+        'nuevas': [],
+        'errores': [],
+    }
+
+    for variante_id in datos.getlist('variantes_eliminadas[]'):
+        try:
+            variante = existentes.get(int(variante_id))
+        except ValueError:
+            variante = None
+        if variante is None:
+            cambios['errores'].append(f"Variante con ID {variante_id} no encontrada para eliminar.")
+            continue
+        cambios['eliminar'].append(variante)
+    ids_eliminar = {variante.idvariante for variante in cambios['eliminar']}
+
+    for variante_id, campos in _agrupar_campos(datos, 'variantes_editadas').items():
+        try:
+            variante = existentes.get(int(variante_id))
+        except ValueError:
+            variante = None
+        if variante is None:
+            cambios['errores'].append(f"Variante con ID {variante_id} no encontrada.")
+            continue
+        if variante.idvariante in ids_eliminar:
+            continue
+
+        stock_modificado = False
+        if 'stock' in campos:
+            try:
+                stock = int(campos['stock'])
+                if stock < 0:
+                    raise ValueError
+                stock_modificado = stock != variante.stock
+                variante.stock = stock
+            except ValueError:
+                cambios['errores'].append(f"Stock inválido para variante {variante_id}")
+
+        imagen = None
+        if campos.get('imagen'):
+            try:
+                imagen = procesar_imagen(campos['imagen'], f"variante_{variante_id}")
+            except ValueError as e:
+                cambios['errores'].append(f"Error en imagen de variante {variante_id}: {str(e)}")
+
+        if imagen:
+            variante.imagen = imagen
+            cambios['actualizar_imagen'].append(variante)
+        elif stock_modificado:
+            cambios['actualizar_stock'].append(variante)
+
+    for index, campos in _agrupar_campos(datos, 'variantes_nuevas').items():
+        if not (campos.get('talla') and campos.get('color')):
+            continue
+        imagen = None
+        if campos.get('imagen'):
+            try:
+                imagen = procesar_imagen(campos['imagen'], "variante_nueva")
+            except ValueError as e:
+                cambios['errores'].append(f"Error en imagen de nueva variante: {str(e)}")
+        cambios['nuevas'].append({
+            'talla': campos['talla'],
+            'color': campos['color'],
+            'stock': campos.get('stock', '0'),
+            'imagen': imagen,
+        })
+
+    return cambios
+
+
+def aplicar_cambios_variantes(producto, cambios):
+    """
+    Aplica el conjunto de cambios en una transacción: un delete() para las
+    eliminadas, bulk_update para los cambios de stock y bulk_create para
+    las nuevas. Las imágenes se guardan fila a fila porque bulk_update no
+    sube archivos. Retorna un reporte con lo que cambió.
+    """
+    reporte = {
+        'eliminadas': [],
+        'actualizadas': [],
+        'creadas': [],
+        'errores': list(cambios['errores']),
+    }
+
+    with transaction.atomic(), agrupar_actualizaciones():
+        if cambios['eliminar']:
+            ids = [variante.idvariante for variante in cambios['eliminar']]
+            descontar_variantes(ids)
+            VarianteProducto.objects.filter(producto=producto, idvariante__in=ids).delete()
+            reporte['eliminadas'] = [
+                f"{variante.talla.talla} - {variante.color.color}"
+                for variante in cambios['eliminar']
+            ]
+
+        if cambios['actualizar_stock']:
+            VarianteProducto.objects.bulk_update(cambios['actualizar_stock'], ['stock'])
+            solicitar_actualizacion(producto.pk)
+            invalidar_metricas()
+        for variante in cambios['actualizar_imagen']:
+            variante.save(update_fields=['stock', 'imagen'])
+        reporte['actualizadas'] = [
+            f"{variante.talla.talla} - {variante.color.color}"
+            for variante in cambios['actualizar_stock'] + cambios['actualizar_imagen']
+        ]
+
+        creadas, errores = crear_variantes(producto, cambios['nuevas'])
+        reporte['creadas'] = [
+            f"{variante.talla.talla} - {variante.color.color}" for variante in creadas
+        ]
+        reporte['errores'].extend(errores)
+
+    return reporte
@@ -10,39 +10,65 @@ from decimal import Decimal, InvalidOperation
 # ==========================================================
 #                   IMPORTS DJANGO
 # ==========================================================
-from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth import authenticate, login, logout, views as auth_views
+from django.contrib.auth import login, logout, views as auth_views
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordResetForm
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
-from django.core.mail import EmailMultiAlternatives
 from django.db import transaction
-from django.db.models import F, Sum, Count, Q
-from django.http import HttpResponseBadRequest, JsonResponse
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.encoding import force_str
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, urlsafe_base64_decode
 from django.views.decorators.csrf import csrf_protect, csrf_exempt
 from django.views.decorators.http import require_POST
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Prefetch
+from django.db.models import Exists, OuterRef, Prefetch, prefetch_related_objects
 from django.core.paginator import Paginator
-from django.db.models import Avg, Sum, Count, Max, Min
 
 # ==========================================================
 #                   IMPORTACIONES LOCALES
 # ==========================================================
+from .autocompletar import sugerencias
+from .backends import BACKEND_EMAIL, normalizar_email, verificar_credenciales
+from .busqueda import buscar_productos
+from .carritos import (
+    actualizar_cantidad_item,
+    agregar_item,
+    eliminar_item,
+    guardar_contador,
+    recargar_totales,
+    vaciar_carrito,
+)
+from .correos import ASUNTO_REENVIO_ACTIVACION, enviar_activacion, enviar_reset
 from .decorators import admin_required, permiso_requerido
+from .derivados import agrupar_actualizaciones
+from .detalle_productos import obtener_detalle
+from .envios_masivos import envios_con_resumen
+from .facetas import obtener_facetas
+from .fragmentos import clave_filtros, claves_tarjetas
+from .idempotencia import idempotente
+from .inventario import estadisticas_inventario
+from .metricas import obtener_metricas
+from .paginacion import paginar_por_cursor
+from .pedidos import confirmar_pedido, total_con_iva
+from .variantes import (
+    aplicar_cambios_variantes,
+    calcular_cambios_variantes,
+    crear_variantes,
+)
 from .forms import (
     CustomPasswordResetForm,
     DireccionEnvioForm,
+    EnvioMasivoForm,
     MetodoPagoForm,
     PerfilUsuarioForm,
     UsuarioRegistroForm,
@@ -63,6 +89,7 @@ from .models import (
     ItemCarrito,
     Permiso,
     PeticionProducto,
+    ResumenInventario,
     Talla,
     Usuarios,
 )
@@ -89,38 +116,15 @@ def obtener_o_crear_carrito(request):
             except Carrito.DoesNotExist:
                 carrito = Carrito.objects.create()
                 request.session['carrito_id'] = carrito.id
+                guardar_contador(request, 0)
         else:
             carrito = Carrito.objects.create()
             request.session['carrito_id'] = carrito.id
+            guardar_contador(request, 0)
     
     return carrito
 
 
-def carrito_context(request):
-    """
-    Context processor para mostrar el contador del carrito en todas las páginas.
-    """
-    carrito_count = 0
-    if request.user.is_authenticated:
-        try:
-            carrito = Carrito.objects.get(usuario=request.user, completado=False)
-            carrito_count = carrito.total_items_carrito
-        except Carrito.DoesNotExist:
-            pass
-    else:
-        carrito_id = request.session.get('carrito_id')
-        if carrito_id:
-            try:
-                carrito = Carrito.objects.get(id=carrito_id, completado=False)
-                carrito_count = carrito.total_items_carrito
-            except Carrito.DoesNotExist:
-                pass
-    
-    return {
-        'carrito_count': carrito_count
-    }
-
-
 def parse_precio(precio_str):
     """
     Convierte un string de precio a Decimal manejando formatos con puntos
@@ -171,24 +175,6 @@ def procesar_imagen_base64(imagen_base64, prefix="variante"):
         raise ValueError(f"Error al procesar imagen: {str(e)}")
 
 
-def enviar_correo_reset(user, request):
-    uid = urlsafe_base64_encode(force_bytes(user.pk))
-    token = default_token_generator.make_token(user)
-    reset_url = request.build_absolute_uri(
-        reverse('nueva_contrasena', kwargs={'uidb64': uid, 'token': token})
-    )
-
-    subject = "Restablece tu contraseña en Liher Fashion"
-    text_content = f"Hola {user.email}, usa este enlace para restablecer tu contraseña: {reset_url}"
-    html_content = render_to_string(
-        "usuarios/contrasena/correo_reset.html",
-        {"user": user, "reset_url": reset_url}
-    )
-    email = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [user.email])
-    email.attach_alternative(html_content, "text/html")
-    email.send()
-
-
 # ==========================================================
 #                   VISTAS PÚBLICAS
 # ==========================================================
@@ -211,59 +197,67 @@ def vista_productos(request):
     # Base queryset de productos activos
     productos = Producto.objects.filter(
         estado='Activo'
-    ).prefetch_related(
-        Prefetch('variantes', 
-                queryset=VarianteProducto.objects.filter(activo=True)
-                .select_related('talla', 'color')
-                .order_by('talla__orden', 'color__color'))
     ).select_related('categoria').order_by('-fecha_creacion')
 
     # Aplicar filtros
     if categoria_filtrar:
         productos = productos.filter(categoria__categoria=categoria_filtrar)
 
+    # Exists en vez de join: el join con variantes duplicaba productos.
+    # Solo variantes activas y con stock, igual que el índice de facetas,
+    # para que el listado coincida con los conteos de los filtros.
+    variantes_disponibles = VarianteProducto.objects.filter(
+        producto=OuterRef('pk'), activo=True, stock__gt=0
+    )
     if color_filtrar:
-        productos = productos.filter(variantes__color__color=color_filtrar)
+        productos = productos.filter(Exists(variantes_disponibles.filter(color__color=color_filtrar)))
 
     if talla_filtrar:
-        productos = productos.filter(variantes__talla__talla=talla_filtrar)
+        productos = productos.filter(Exists(variantes_disponibles.filter(talla__talla=talla_filtrar)))
+
+    # Filtros disponibles desde el índice de facetas (solo productos con stock).
+    # Es perezoso: si el fragmento de filtros está en caché no se consulta.
+    facetas = SimpleLazyObject(
+        lambda: obtener_facetas(categoria_filtrar, color_filtrar, talla_filtrar, busqueda)
+    )
 
+    # Paginación: por relevancia al buscar (resultados acotados), por cursor
+    # sobre (fecha_creacion, idproducto) en el listado normal
     if busqueda:
-        productos = productos.filter(
-            Q(nombre__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda) |
-            Q(referencia__icontains=busqueda)
+        productos = buscar_productos(productos, busqueda)
+        paginator = Paginator(productos, 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    else:
+        page_obj = paginar_por_cursor(
+            productos,
+            ['-fecha_creacion', '-idproducto'],
+            cursor=request.GET.get('cursor'),
+            tamano=12,
+            clave_total=f'productos:{categoria_filtrar}:{color_filtrar}:{talla_filtrar}'
         )
 
-    # Obtener filtros disponibles (solo para productos que tienen stock)
-    categorias = Categoria.objects.filter(
-        producto__estado='Activo',
-        producto__variantes__activo=True,
-        producto__variantes__stock__gt=0
-    ).distinct().order_by('categoria')
-    
-    colores = Color.objects.filter(
-        varianteproducto__activo=True,
-        varianteproducto__producto__estado='Activo',
-        varianteproducto__stock__gt=0
-    ).distinct().order_by('color')
-    
-    tallas = Talla.objects.filter(
-        varianteproducto__activo=True,
-        varianteproducto__producto__estado='Activo',
-        varianteproducto__stock__gt=0
-    ).distinct().order_by('orden', 'talla')
-
-    # Paginación
-    paginator = Paginator(productos, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Tarjetas en caché por versión de producto; solo las que faltan
+    # necesitan sus variantes
+    productos_pagina = list(page_obj)
+    claves = claves_tarjetas(productos_pagina)
+    precargados = cache.get_many(claves.values())
+    for producto in productos_pagina:
+        producto.clave_tarjeta = claves[producto.pk]
+    prefetch_related_objects(
+        [producto for producto in productos_pagina if producto.clave_tarjeta not in precargados],
+        Prefetch('variantes',
+                queryset=VarianteProducto.objects.filter(activo=True)
+                .select_related('talla', 'color')
+                .order_by('talla__orden', 'color__color'))
+    )
 
     context = {
         'productos': page_obj,
-        'categorias': categorias,
-        'colores': colores,
-        'tallas': tallas,
+        'fragmentos_precargados': precargados,
+        'clave_filtros': clave_filtros(categoria_filtrar, color_filtrar, talla_filtrar, busqueda),
+        'categorias': SimpleLazyObject(lambda: facetas['categorias']),
+        'colores': SimpleLazyObject(lambda: facetas['colores']),
+        'tallas': SimpleLazyObject(lambda: facetas['tallas']),
         'selected_categoria': categoria_filtrar,
         'selected_color': color_filtrar,
         'selected_talla': talla_filtrar,
@@ -275,38 +269,35 @@ def vista_productos(request):
 
 def detalle_producto(request, idproducto):
     """API endpoint para obtener detalle del producto con variantes"""
-    producto = get_object_or_404(Producto, pk=idproducto)
-    
-    # Serializar variantes
-    variantes_data = []
-    for variante in producto.variantes.select_related('talla', 'color').filter(activo=True):
-        variantes_data.append({
-            'id': variante.idvariante,
-            'talla': {
-                'id': variante.talla.id,
-                'talla': variante.talla.talla
-            },
-            'color': {
-                'id': variante.color.id,
-                'color': variante.color.color,
-                'codigo_hex': variante.color.codigo_hex
-            },
-            'stock': variante.stock,
-            'imagen': variante.imagen.url if variante.imagen else producto.imagen.url if producto.imagen else None
-        })
-    
-    data = {
-        'idproducto': producto.idproducto,
-        'nombre': producto.nombre,
-        'referencia': producto.referencia,
-        'precio': str(producto.precio),
-        'descripcion': producto.descripcion or '',
-        'imagen': producto.imagen.url if producto.imagen else None,
-        'categoria': str(producto.categoria) if producto.categoria else None,
-        'variantes': variantes_data
-    }
-    
-    return JsonResponse(data)
+    detalle = obtener_detalle(idproducto)
+    if detalle is None:
+        raise Http404("Producto no encontrado")
+
+    response = HttpResponse(detalle['contenido'], content_type='application/json')
+    response['ETag'] = detalle['etag']
+    response['Last-Modified'] = http_date(detalle['modificado'])
+    # El navegador o la CDN siempre revalidan; si nada cambió reciben un 304
+    patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+    return get_conditional_response(
+        request,
+        etag=detalle['etag'],
+        last_modified=detalle['modificado'],
+        response=response
+    )
+
+
+def autocompletar_productos(request):
+    """API endpoint de sugerencias del buscador por nombre o referencia"""
+    try:
+        limite = min(max(int(request.GET.get('limite', 8)), 1), 20)
+    except ValueError:
+        limite = 8
+
+    response = JsonResponse({
+        'resultados': sugerencias(request.GET.get('q', ''), limite)
+    })
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
 
 # ==========================================================
@@ -316,56 +307,32 @@ def detalle_producto(request, idproducto):
 @csrf_protect
 def acceso(request):
     if request.method == "POST":
-        email = request.POST.get("email")
+        email = normalizar_email(request.POST.get("email"))
         password = request.POST.get("password")
-        try:
-            user_obj = Usuarios.objects.get(email=email)
-        except Usuarios.DoesNotExist:
-            user_obj = None
-        if user_obj is not None:
-            if not user_obj.is_active:
-                # Usuario existe pero no está activado → enviar correo automáticamente
-                try:
-                    uid = urlsafe_base64_encode(force_bytes(user_obj.pk))
-                    token = default_token_generator.make_token(user_obj)
-                    activar_url = request.build_absolute_uri(
-                        reverse('activar_cuenta', kwargs={'uidb64': uid, 'token': token})
-                    )
-                    subject = 'Activa tu cuenta en Liher Fashion'
-                    text_content = render_to_string(
-                        'usuarios/autenticacion/activacion_email.txt',
-                        {'user': user_obj, 'activar_url': activar_url}
-                    )
-                    html_content = render_to_string(
-                        'usuarios/autenticacion/activacion_email.html',
-                        {'user': user_obj, 'activar_url': activar_url}
-                    )
-                    email_obj = EmailMultiAlternatives(
-                        subject, text_content, settings.DEFAULT_FROM_EMAIL, [user_obj.email]
-                    )
-                    email_obj.attach_alternative(html_content, "text/html")
-                    email_obj.send()
-                    messages.warning(request, "Tu cuenta no ha sido activada. Revisa tu correo. Se ha enviado un enlace de activación.")
-                except Exception as e:
-                    messages.error(request, "No se pudo enviar el correo de activación. Intenta reenviarlo manualmente.")
-                return redirect('registro_revisar_email', email=email)
-            # Usuario activo → verificamos contraseña
-            user = authenticate(request, email=email, password=password)
-            if user is not None:
-                login(request, user)  # Inicia sesión
-                # Redirección según rol
-                if user.is_superuser or user.is_staff:
-                    messages.success(request, f"Bienvenido administrador {user.email}")
-                    return redirect("panel_admin")
-                else:
-                    messages.success(request, f"Bienvenido {user.email}")
-                    return redirect("pagina_principal")
+        # Una sola consulta y como mucho un hash (ver backends.verificar_credenciales)
+        resultado, user = verificar_credenciales(request, email, password)
+        if resultado == 'inactivo':
+            # Usuario existe pero no está activado → enviar correo automáticamente
+            try:
+                enviar_activacion(user, request)
+                messages.warning(request, "Tu cuenta no ha sido activada. Revisa tu correo. Se ha enviado un enlace de activación.")
+            except Exception as e:
+                messages.error(request, "No se pudo enviar el correo de activación. Intenta reenviarlo manualmente.")
+            return redirect('registro_revisar_email', email=email)
+        if resultado == 'ok':
+            login(request, user, backend=BACKEND_EMAIL)  # Inicia sesión
+            # Redirección según rol
+            if user.is_superuser or user.is_staff:
+                messages.success(request, f"Bienvenido administrador {user.email}")
+                return redirect("panel_admin")
             else:
-                messages.error(request, "Correo o contraseña incorrectos.")
-                return render(request, "usuarios/autenticacion/acceso.html")
+                messages.success(request, f"Bienvenido {user.email}")
+                return redirect("pagina_principal")
+        if resultado == 'limitado':
+            messages.error(request, "Demasiados intentos fallidos. Espera un momento e inténtalo de nuevo.")
         else:
             messages.error(request, "Correo o contraseña incorrectos.")
-            return render(request, "usuarios/autenticacion/acceso.html")
+        return render(request, "usuarios/autenticacion/acceso.html")
     return render(request, "usuarios/autenticacion/acceso.html")
 
 
@@ -385,12 +352,13 @@ def login_ajax(request):
         return JsonResponse({"success": False, "message": "Datos inválidos."})
     if not email or not password:
         return JsonResponse({"success": False, "message": "Correo y contraseña son obligatorios."})
-    user = authenticate(request, email=email, password=password)
-    if user is not None:
-        login(request, user)
+    resultado, user = verificar_credenciales(request, email, password)
+    if resultado == 'ok':
+        login(request, user, backend=BACKEND_EMAIL)
         return JsonResponse({"success": True})
-    else:
-        return JsonResponse({"success": False, "message": "Correo o contraseña incorrectos."})
+    if resultado == 'limitado':
+        return JsonResponse({"success": False, "message": "Demasiados intentos fallidos. Espera un momento e inténtalo de nuevo."})
+    return JsonResponse({"success": False, "message": "Correo o contraseña incorrectos."})
 
 
 @csrf_exempt
@@ -451,20 +419,8 @@ def registro_ajax(request):
                 setattr(permisos, p, True)
         permisos.save()
 
-    # Generar enlace de activación
-    uid = urlsafe_base64_encode(force_bytes(user.pk))
-    token = default_token_generator.make_token(user)
-    activar_url = request.build_absolute_uri(
-        reverse('activar_cuenta', kwargs={'uidb64': uid, 'token': token})
-    )
-
     try:
-        subject = 'Activa tu cuenta en Liher Fashion'
-        text_content = render_to_string('usuarios/autenticacion/activacion_email.txt', {'user': user, 'activar_url': activar_url})
-        html_content = render_to_string('usuarios/autenticacion/activacion_email.html', {'user': user, 'activar_url': activar_url})
-        email_obj = EmailMultiAlternatives(subject, text_content, None, [user.email])
-        email_obj.attach_alternative(html_content, "text/html")
-        email_obj.send()
+        enviar_activacion(user, request)
     except Exception as e:
         print(f"Error enviando correo: {e}")
         return JsonResponse({"success": False, "message": "Error enviando correo de activación."}, status=500)
@@ -500,18 +456,7 @@ def registro_usuario(request):
             user = form.save(commit=False)
             user.is_active = False
             user.save()
-            
-            uid = urlsafe_base64_encode(force_bytes(user.pk))
-            token = default_token_generator.make_token(user)
-            activar_url = request.build_absolute_uri(
-                reverse('activar_cuenta', kwargs={'uidb64': uid, 'token': token})
-            )
-            subject = 'Activa tu cuenta en Liher Fashion'
-            text_content = render_to_string('usuarios/autenticacion/activacion_email.txt', {'user': user, 'activar_url': activar_url})
-            html_content = render_to_string('usuarios/autenticacion/activacion_email.html', {'user': user, 'activar_url': activar_url})
-            email = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [user.email])
-            email.attach_alternative(html_content, "text/html")
-            email.send()
+            enviar_activacion(user, request)
             return render(request, 'usuarios/autenticacion/registro_revisar_email.html', {'email': user.email})
     else:
         form = UsuarioRegistroForm()
@@ -537,15 +482,7 @@ def registro_revisar_email(request, email):
 def reenviar_activacion(request, email):
     try:
         usuario = Usuarios.objects.get(email=email, is_active=False)  
-        uid = urlsafe_base64_encode(force_bytes(usuario.pk))
-        token = default_token_generator.make_token(usuario)
-        activar_url = request.build_absolute_uri(reverse('activar_cuenta', kwargs={'uidb64': uid, 'token': token}))
-        subject = 'Reenvío: Activa tu cuenta en Liher Fashion'
-        text_content = render_to_string('usuarios/autenticacion/activacion_email.txt', {'user': usuario, 'activar_url': activar_url})
-        html_content = render_to_string('usuarios/autenticacion/activacion_email.html', {'user': usuario, 'activar_url': activar_url})
-        email_obj = EmailMultiAlternatives(subject, text_content, settings.DEFAULT_FROM_EMAIL, [usuario.email])
-        email_obj.attach_alternative(html_content, "text/html")
-        email_obj.send()
+        enviar_activacion(usuario, request, asunto=ASUNTO_REENVIO_ACTIVACION)
         messages.success(request, "El correo de activación ha sido reenviado.")
     except Usuarios.DoesNotExist:  
         messages.error(request, "No encontramos un usuario pendiente de activar con ese correo.")
@@ -561,7 +498,7 @@ def activar_cuenta(request, uidb64, token):
     if user is not None and default_token_generator.check_token(user, token):
         user.is_active = True
         user.save()
-        login(request, user, backend='django.contrib.auth.backends.ModelBackend')
+        login(request, user, backend=BACKEND_EMAIL)
         messages.success(request, f'Bienvenido, {user.first_name or user.email}!')
         if user.is_staff:
             return redirect('panel_admin')  
@@ -572,8 +509,8 @@ def activar_cuenta(request, uidb64, token):
 
 
 def validar_email_ajax(request):
-    email = request.GET.get('email', '').strip()
-    exists = Usuarios.objects.filter(email__iexact=email).exists()
+    email = normalizar_email(request.GET.get('email', ''))
+    exists = Usuarios.objects.filter(email=email).exists()
     return JsonResponse({'exists': exists})
 
 
@@ -588,9 +525,9 @@ class CustomPasswordResetView(auth_views.PasswordResetView):
     success_url = reverse_lazy("correo_enviado")
     form_class = CustomPasswordResetForm 
     def form_valid(self, form):
-        email = form.cleaned_data.get("email")
+        email = normalizar_email(form.cleaned_data.get("email"))
         user = Usuarios.objects.get(email=email)
-        enviar_correo_reset(user, self.request)
+        enviar_reset(user, self.request)
         self.request.session["reset_email"] = email
         return redirect(self.success_url)
 
@@ -614,12 +551,8 @@ def reenviar_reset(request):
         return redirect("restablecer_contrasena")
     form = PasswordResetForm(request.POST)
     if form.is_valid():
-        form.save(
-            request=request,
-            email_template_name="usuarios/contrasena/correo_reset.html",
-            subject_template_name="usuarios/contrasena/asunto_reset.txt",
-            use_https=request.is_secure(),
-    )
+        for user in form.get_users(form.cleaned_data["email"]):
+            enviar_reset(user, request)
         messages.success(request, "El correo de restablecimiento se ha reenviado exitosamente.")
     else:
         messages.error(request, "No se pudo reenviar el correo. Verifica la dirección.")
@@ -667,7 +600,7 @@ def carrito(request):
         'producto__color'
     )
     
-    subtotal = sum(item.total_precio for item in items_carrito)
+    subtotal = carrito.subtotal
     iva = subtotal * Decimal('0.19')  # 19% IVA
     total = subtotal + iva
     
@@ -681,118 +614,48 @@ def carrito(request):
     return render(request, 'tienda/carrito/carrito.html', contexto)
 
 
-def agregar_al_carrito(request, variante_id):
-    """
-    Vista para agregar un producto al carrito.
-    """
-    if request.method == 'POST':
-        cantidad = int(request.POST.get('cantidad', 1))
-        variante = get_object_or_404(VarianteProducto, idvariante=variante_id)
-        
-        # Verificar stock
-        if variante.stock < cantidad:
-            messages.error(request, f'No hay suficiente stock. Stock disponible: {variante.stock}')
-            return redirect('vista_productos')
-        
-        carrito = obtener_o_crear_carrito(request)
-        
-        # Verificar si el item ya está en el carrito
-        item, creado = ItemCarrito.objects.get_or_create(
-            carrito=carrito,
-            producto=variante,
-            defaults={
-                'cantidad': cantidad,
-                'precio_unitario': variante.producto.precio
-            }
-        )
-        
-        if not creado:
-            # Si ya existe, actualizar cantidad
-            nueva_cantidad = item.cantidad + cantidad
-            if nueva_cantidad > variante.stock:
-                messages.error(request, f'No puedes agregar más de {variante.stock} unidades')
-                return redirect('carrito')
-            
-            item.cantidad = nueva_cantidad
-            item.save()
-            messages.success(request, f'Cantidad actualizada: {item.producto.producto.nombre}')
-        else:
-            messages.success(request, f'Producto agregado al carrito: {variante.producto.nombre}')
-        
-        # Actualizar contador en sesión
-        if request.user.is_authenticated:
-            request.session['carrito_items'] = carrito.total_items_carrito
-        else:
-            request.session['carrito_items'] = carrito.total_items_carrito
-        
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-            return JsonResponse({
-                'success': True,
-                'carrito_count': carrito.total_items_carrito,
-                'message': 'Producto agregado al carrito'
-            })
-        
-        return redirect('carrito')
-    
-    return redirect('vista_productos')
-
-
 @require_POST
+@idempotente
 def agregar_al_carrito(request, variante_id):
     """
     Vista para agregar un producto al carrito.
     """
     try:
         cantidad = int(request.POST.get('cantidad', 1))
-        variante = get_object_or_404(VarianteProducto, idvariante=variante_id)
+
+        variante = get_object_or_404(
+            VarianteProducto.objects.select_related('producto'), idvariante=variante_id
+        )
         
-        # Verificar stock
-        if variante.stock < cantidad:
+        carrito = obtener_o_crear_carrito(request)
+        
+        # Agregar el item o sumar a la cantidad existente (reserva el stock).
+        # No se rechaza antes con el stock en caché: puede contar reservas
+        # vencidas o llevar minutos desactualizado; decide el UPDATE condicional.
+        try:
+            item, creado = agregar_item(carrito, variante, cantidad)
+        except ValueError as e:
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({
                     'success': False, 
-                    'message': f'No hay suficiente stock. Stock disponible: {variante.stock}'
+                    'message': str(e)
                 })
-            messages.error(request, f'No hay suficiente stock. Stock disponible: {variante.stock}')
-            return redirect('vista_productos')
-        
-        carrito = obtener_o_crear_carrito(request)
-        
-        # Verificar si el item ya está en el carrito
-        item, creado = ItemCarrito.objects.get_or_create(
-            carrito=carrito,
-            producto=variante,
-            defaults={
-                'cantidad': cantidad,
-                'precio_unitario': variante.producto.precio
-            }
-        )
-        
+            messages.error(request, str(e))
+            return redirect('carrito')
+
         if not creado:
-            # Si ya existe, actualizar cantidad
-            nueva_cantidad = item.cantidad + cantidad
-            if nueva_cantidad > variante.stock:
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({
-                        'success': False, 
-                        'message': f'No puedes agregar más de {variante.stock} unidades'
-                    })
-                messages.error(request, f'No puedes agregar más de {variante.stock} unidades')
-                return redirect('carrito')
-            
-            item.cantidad = nueva_cantidad
-            item.save()
-            mensaje = f'Cantidad actualizada: {item.producto.producto.nombre}'
+            mensaje = f'Cantidad actualizada: {variante.producto.nombre}'
         else:
             mensaje = f'Producto agregado al carrito: {variante.producto.nombre}'
         
         # Actualizar contador en sesión
-        request.session['carrito_items'] = carrito.total_items_carrito
+        recargar_totales(carrito)
+        guardar_contador(request, carrito.cantidad_items)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
-                'carrito_count': carrito.total_items_carrito,
+                'carrito_count': carrito.cantidad_items,
                 'message': mensaje
             })
         
@@ -810,6 +673,7 @@ def agregar_al_carrito(request, variante_id):
 
 
 @require_POST
+@idempotente
 def actualizar_carrito(request, item_id):
     """
     Vista para actualizar la cantidad de un item en el carrito.
@@ -819,42 +683,40 @@ def actualizar_carrito(request, item_id):
         item = get_object_or_404(ItemCarrito, id=item_id)
         
         # Verificar que el item pertenece al carrito del usuario
-        carrito_usuario = obtener_o_crear_carrito(request)
-        if item.carrito != carrito_usuario:
+        carrito = obtener_o_crear_carrito(request)
+        if item.carrito_id != carrito.id:
             return JsonResponse({
                 'success': False,
                 'message': 'No tienes permiso para modificar este item'
             })
         
-        # Verificar stock
-        if cantidad > item.producto.stock:
-            return JsonResponse({
-                'success': False,
-                'message': f'No hay suficiente stock. Stock disponible: {item.producto.stock}'
-            })
-        
         if cantidad > 0:
-            item.cantidad = cantidad
-            item.save()
+            # La reserva de stock valida la disponibilidad en la base de datos
+            try:
+                actualizar_cantidad_item(item, cantidad)
+            except ValueError as e:
+                return JsonResponse({
+                    'success': False,
+                    'message': str(e)
+                })
             mensaje = 'Cantidad actualizada'
         else:
-            item.delete()
+            eliminar_item(item)
             mensaje = 'Producto eliminado del carrito'
         
-        # Recalcular totales
-        carrito = obtener_o_crear_carrito(request)
-        items_carrito = ItemCarrito.objects.filter(carrito=carrito)
-        subtotal = sum(item.total_precio for item in items_carrito)
+        # Leer totales desnormalizados
+        recargar_totales(carrito)
+        subtotal = carrito.subtotal
         iva = subtotal * Decimal('0.19')
         total = subtotal + iva
         
         # Actualizar contador en sesión
-        request.session['carrito_items'] = carrito.total_items_carrito
+        guardar_contador(request, carrito.cantidad_items)
         
         return JsonResponse({
             'success': True,
             'message': mensaje,
-            'carrito_count': carrito.total_items_carrito,
+            'carrito_count': carrito.cantidad_items,
             'subtotal': float(subtotal),
             'iva': float(iva),
             'total': float(total),
@@ -874,34 +736,35 @@ def eliminar_del_carrito(request, item_id):
     Vista para eliminar un item del carrito.
     """
     try:
-        item = get_object_or_404(ItemCarrito, id=item_id)
+        item = get_object_or_404(
+            ItemCarrito.objects.select_related('producto__producto'), id=item_id
+        )
         
         # Verificar que el item pertenece al carrito del usuario
-        carrito_usuario = obtener_o_crear_carrito(request)
-        if item.carrito != carrito_usuario:
+        carrito = obtener_o_crear_carrito(request)
+        if item.carrito_id != carrito.id:
             return JsonResponse({
                 'success': False,
                 'message': 'No tienes permiso para eliminar este item'
             })
         
         nombre_producto = item.producto.producto.nombre
-        item.delete()
+        eliminar_item(item)
         
-        # Recalcular totales
-        carrito = obtener_o_crear_carrito(request)
-        items_carrito = ItemCarrito.objects.filter(carrito=carrito)
-        subtotal = sum(item.total_precio for item in items_carrito)
+        # Leer totales desnormalizados
+        recargar_totales(carrito)
+        subtotal = carrito.subtotal
         iva = subtotal * Decimal('0.19')
         total = subtotal + iva
         
         # Actualizar contador en sesión
-        request.session['carrito_items'] = carrito.total_items_carrito
+        guardar_contador(request, carrito.cantidad_items)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
                 'success': True,
                 'message': f'Producto eliminado: {nombre_producto}',
-                'carrito_count': carrito.total_items_carrito,
+                'carrito_count': carrito.cantidad_items,
                 'subtotal': float(subtotal),
                 'iva': float(iva),
                 'total': float(total)
@@ -927,11 +790,10 @@ def limpiar_carrito(request):
     """
     try:
         carrito = obtener_o_crear_carrito(request)
-        items_count = carrito.items_carrito.count()
-        carrito.items_carrito.all().delete()
+        items_count = vaciar_carrito(carrito)
         
         # Actualizar contador en sesión
-        request.session['carrito_items'] = 0
+        guardar_contador(request, 0)
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -1135,12 +997,15 @@ def establecer_metodo_pago_principal(request, pk):
 @login_required
 def mis_pedidos(request):
     """Vista para listar pedidos del usuario"""
-    pedidos_list = Pedidos.objects.filter(cliente=request.user.email).order_by('-fecha')
+    pedidos_list = Pedidos.objects.filter(cliente=request.user.email)
     
-    # Paginación
-    paginator = Paginator(pedidos_list, 10)  # 10 pedidos por página
-    page_number = request.GET.get('page')
-    pedidos = paginator.get_page(page_number)
+    # Paginación por cursor sobre (fecha, idpedido), 10 pedidos por página
+    pedidos = paginar_por_cursor(
+        pedidos_list,
+        ['-fecha', '-idpedido'],
+        cursor=request.GET.get('cursor'),
+        tamano=10
+    )
     
     return render(request, 'usuarios/cuenta/mis_pedidos.html', {
         'pedidos': pedidos
@@ -1180,7 +1045,53 @@ def envio(request):
 
 
 def pago(request):
-    return render(request, 'tienda/carrito/pago.html')
+    contexto = {}
+    if request.user.is_authenticated:
+        carrito = Carrito.objects.filter(usuario=request.user, completado=False).first()
+        subtotal = carrito.subtotal if carrito else Decimal('0.00')
+        contexto = {
+            'payment_methods': [
+                {'id': metodo.pk, 'name': str(metodo), 'icon': 'fas fa-credit-card', 'color': ''}
+                for metodo in MetodoPago.objects.filter(usuario=request.user)
+            ],
+            'subtotal': subtotal,
+            'discount': 0,
+            'shipping_cost': 0,
+            'total': total_con_iva(subtotal),
+            # Un doble envío del formulario reutiliza la misma clave
+            'idempotency_key': uuid.uuid4().hex,
+        }
+    return render(request, 'tienda/carrito/pago.html', contexto)
+
+
+@login_required
+@require_POST
+@idempotente
+def finalizar_compra(request):
+    """
+    Convierte el carrito abierto del usuario en un pedido.
+    """
+    metodo = MetodoPago.objects.filter(
+        pk=request.POST.get('payment_method') or None, usuario=request.user
+    ).first()
+    if metodo is None:
+        messages.error(request, 'Elige un método de pago')
+        return redirect('pago')
+
+    carrito = Carrito.objects.filter(usuario=request.user, completado=False).first()
+    if carrito is None:
+        messages.error(request, 'Tu carrito está vacío')
+        return redirect('carrito')
+
+    try:
+        pedido = confirmar_pedido(carrito, request.user, str(metodo))
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect('carrito')
+
+    guardar_contador(request, 0)
+    messages.success(request, f'Pedido #{pedido.idpedido} creado')
+    return redirect('mis_pedidos')
 
 
 def identificacion(request):
@@ -1205,69 +1116,10 @@ def panel_admin(request):
             "devoluciones": request.user.permisos.devoluciones,
             "peticiones": request.user.permisos.peticiones,
         })
-    productos = (
-        Producto.objects
-        .annotate(
-            n_variantes=Count("variantes"),
-            total_stock=Sum("variantes__stock")
-        )
-    )
-
-    total_productos = productos.count()
-    productos_activos = productos.filter(estado="Activo").count()
-    productos_inactivos = productos.filter(estado="Inactivo").count()
-
-    total_variantes = VarianteProducto.objects.count()
-
-    productos_con_variantes = productos.filter(n_variantes__gt=0).count()
-    productos_sin_variantes = productos.filter(n_variantes=0).count()
-
-    productos_con_stock = productos.filter(total_stock__gt=0).count()
-    productos_sin_stock = productos.filter(total_stock__lte=0).count()
-
-
-    precio_promedio = productos.aggregate(avg=Avg("precio"))["avg"] or 0
-    precio_max = productos.aggregate(m=Max("precio"))["m"] or 0
-    precio_min = productos.aggregate(m=Min("precio"))["m"] or 0
-
-    valor_inventario = productos.aggregate(
-        total=Sum(F("precio") * F("total_stock"))
-    )["total"] or 0
-
-
-    usuarios = Usuarios.objects.all()
-    total_usuarios = usuarios.count()
-    usuarios_activos = usuarios.filter(is_active=True).count()
-    usuarios_inactivos = usuarios.filter(is_active=False).count()
-
-
+    # Métricas en caché (una pasada de agregación por tabla al recalcular)
     context = {
         "permisos_json": json.dumps(permisos),
-
-        # Productos
-        "total_productos": total_productos,
-        "productos_activos": productos_activos,
-        "productos_inactivos": productos_inactivos,
-
-        # Variantes
-        "total_variantes": total_variantes,
-        "productos_con_variantes": productos_con_variantes,
-        "productos_sin_variantes": productos_sin_variantes,
-
-        # Stock
-        "productos_con_stock": productos_con_stock,
-        "productos_sin_stock": productos_sin_stock,
-
-        # Precios
-        "precio_promedio": round(precio_promedio, 2),
-        "precio_max": precio_max,
-        "precio_min": precio_min,
-        "valor_inventario": round(valor_inventario, 2),
-
-        # Usuarios
-        "total_usuarios": total_usuarios,
-        "usuarios_activos": usuarios_activos,
-        "usuarios_inactivos": usuarios_inactivos,
+        **obtener_metricas(),
     }
 
     return render(request, "admin/panel_admin.html", context)
@@ -1319,26 +1171,40 @@ def configuracion_inventario(request):
     return render(request, 'admin/inventario/configuracion_inventario.html')
 
 
+# Columnas por las que se puede ordenar el listado de inventario
+ORDEN_INVENTARIO = {
+    'nombre': 'producto__nombre',
+    'referencia': 'producto__referencia',
+    'precio': 'producto__precio',
+    'stock': 'total_stock',
+    'variantes': 'n_variantes',
+    'agotadas': 'variantes_agotadas',
+}
+
+
 @login_required
 @permiso_requerido('inventario')
 def listar_productos_inventario(request):
-    productos = Producto.objects.annotate(
-        n_variantes=Count('variantes', distinct=True),
-        total_stock=Sum('variantes__stock')
-    ).order_by('nombre')
-
-    total_productos = productos.count()
-    total_variantes = VarianteProducto.objects.count()
-    productos_activos = productos.filter(total_stock__gt=0).count()
-    productos_inactivos = total_productos - productos_activos
+    orden = request.GET.get('orden', 'nombre')
+    campo = ORDEN_INVENTARIO.get(orden.lstrip('-'))
+    if campo is None:
+        orden, campo = 'nombre', ORDEN_INVENTARIO['nombre']
+    if orden.startswith('-'):
+        campo = '-' + campo
+
+    resumenes = (
+        ResumenInventario.objects
+        .select_related('producto__categoria')
+        .order_by(campo, 'producto_id')
+    )
+    paginator = Paginator(resumenes, 25)
+    page_obj = paginator.get_page(request.GET.get('page'))
 
     context = {
-        'productos': productos,
-        'total_productos': total_productos,
-        'total_variantes': total_variantes,
-        'productos_activos': productos_activos,
-        'productos_inactivos': productos_inactivos,
+        'resumenes': page_obj,
+        'orden': orden,
         'active': 'inventario',
+        **estadisticas_inventario(),
     }
 
     return render(request, 'admin/inventario/vista_inventario.html', context)
@@ -1420,78 +1286,46 @@ def agregar_producto(request):
                 messages.error(request, "La imagen no debe superar los 5MB.")
                 return render(request, 'admin/inventario/agregar_producto.html', context)
 
-        # Crear producto
+        # Leer variantes dinámicas del formulario
+        filas_variantes = []
+        index = 0
+        while f"variantes[{index}][talla]" in request.POST:
+            filas_variantes.append({
+                'talla': request.POST.get(f"variantes[{index}][talla]"),
+                'color': request.POST.get(f"variantes[{index}][color]"),
+                'stock': request.POST.get(f"variantes[{index}][stock]", '0'),
+            })
+            index += 1
+
+        # Crear producto y variantes en una sola transacción
         try:
-            producto = Producto.objects.create(
-                nombre=nombre,
-                referencia=referencia,
-                categoria=categoria,
-                descripcion=descripcion,
-                imagen=imagen,
-                estado=estado,
-                precio=precio_decimal
-            )
+            with transaction.atomic():
+                producto = Producto.objects.create(
+                    nombre=nombre,
+                    referencia=referencia,
+                    categoria=categoria,
+                    descripcion=descripcion,
+                    imagen=imagen,
+                    estado=estado,
+                    precio=precio_decimal
+                )
+                variantes_guardadas, variantes_errors = crear_variantes(producto, filas_variantes)
+                if not variantes_guardadas:
+                    # Sin variantes válidas no se conserva el producto
+                    transaction.set_rollback(True)
         except Exception as e:
             messages.error(request, f"Error al crear el producto: {str(e)}")
             return render(request, 'admin/inventario/agregar_producto.html', context)
 
-        # Guardar variantes dinámicas
-        index = 0
-        variantes_guardadas = 0
-        variantes_errors = []
-        
-        while True:
-            talla_id = request.POST.get(f"variantes[{index}][talla]")
-            color_id = request.POST.get(f"variantes[{index}][color]")
-            stock = request.POST.get(f"variantes[{index}][stock]", '0')
-            
-            if talla_id is None:
-                break
-                
-            try:
-                talla_obj = Talla.objects.get(pk=talla_id)
-                color_obj = Color.objects.get(pk=color_id)
-                
-                # Verificar si ya existe esta combinación
-                if VarianteProducto.objects.filter(
-                    producto=producto, 
-                    talla=talla_obj, 
-                    color=color_obj
-                ).exists():
-                    variantes_errors.append(f"La variante {talla_obj.talla} - {color_obj.color} ya existe")
-                    index += 1
-                    continue
-                
-                VarianteProducto.objects.create(
-                    producto=producto,
-                    talla=talla_obj,
-                    color=color_obj,
-                    stock=int(stock) if stock else 0,
-                )
-                variantes_guardadas += 1
-                
-            except (Talla.DoesNotExist, Color.DoesNotExist) as e:
-                variantes_errors.append(f"Variante {index+1}: Talla o color no válido")
-            except ValueError as e:
-                variantes_errors.append(f"Variante {index+1}: Stock inválido")
-            except Exception as e:
-                variantes_errors.append(f"Variante {index+1}: {str(e)}")
-            
-            index += 1
-
         # Mostrar errores de variantes
         for error in variantes_errors:
             messages.warning(request, error)
 
-        if variantes_guardadas > 0:
-            messages.success(request, f"Producto agregado correctamente con {variantes_guardadas} variante(s).")
+        if variantes_guardadas:
+            messages.success(request, f"Producto agregado correctamente con {len(variantes_guardadas)} variante(s).")
             return redirect('listar_productos_inventario')
         else:
             messages.error(request, "No se pudieron guardar las variantes del producto.")
-            try:
-                producto.delete()
-            except Exception as e:
-                messages.error(request, f"Error al eliminar producto sin variantes: {str(e)}")
             return render(request, 'admin/inventario/agregar_producto.html', context)
 
     return render(request, 'admin/inventario/agregar_producto.html', context)
@@ -1572,125 +1406,30 @@ def editar_producto(request, idproducto):
                 
                 producto.imagen = imagen
 
-            producto.save()
-            
-            # ===== PROCESAR VARIANTES ELIMINADAS =====
-            variantes_eliminadas = request.POST.getlist('variantes_eliminadas[]')
-            for variante_id in variantes_eliminadas:
-                try:
-                    variante = VarianteProducto.objects.get(idvariante=variante_id, producto=producto)
-                    nombre_variante = f"{variante.talla.talla} - {variante.color.color}"
-                    variante.delete()
-                    messages.info(request, f"Variante eliminada: {nombre_variante}")
-                except VarianteProducto.DoesNotExist:
-                    messages.warning(request, f"Variante con ID {variante_id} no encontrada para eliminar.")
-                except Exception as e:
-                    messages.warning(request, f"Error al eliminar variante {variante_id}: {str(e)}")
-
-            # ===== PROCESAR VARIANTES EDITADAS =====
-            variantes_editadas = {}
-            for key, value in request.POST.items():
-                if key.startswith('variantes_editadas['):
-                    parts = key.split('[')
-                    if len(parts) >= 3:
-                        variante_id = parts[1].replace(']', '')
-                        campo = parts[2].replace(']', '')
-                        
-                        if variante_id not in variantes_editadas:
-                            variantes_editadas[variante_id] = {}
-                        variantes_editadas[variante_id][campo] = value
-
-            for variante_id, datos in variantes_editadas.items():
-                try:
-                    variante = VarianteProducto.objects.get(idvariante=variante_id, producto=producto)
-                    
-                    if 'stock' in datos:
-                        try:
-                            variante.stock = int(datos['stock'])
-                        except ValueError:
-                            messages.warning(request, f"Stock inválido para variante {variante_id}")
-                    
-                    # Manejar imagen base64 si existe
-                    if 'imagen' in datos and datos['imagen']:
-                        try:
-                            image_data = procesar_imagen_base64(datos['imagen'], f"variante_{variante_id}")
-                            if image_data:
-                                variante.imagen = image_data
-                        except ValueError as e:
-                            messages.warning(request, f"Error en imagen de variante {variante_id}: {str(e)}")
-                    
-                    variante.save()
-                    
-                except VarianteProducto.DoesNotExist:
-                    messages.warning(request, f"Variante con ID {variante_id} no encontrada.")
-                except Exception as e:
-                    messages.warning(request, f"Error al actualizar variante {variante_id}: {str(e)}")
-
-            # ===== PROCESAR NUEVAS VARIANTES =====
-            variantes_nuevas = {}
-            for key, value in request.POST.items():
-                if key.startswith('variantes_nuevas['):
-                    parts = key.split('[')
-                    if len(parts) >= 3:
-                        index = parts[1].replace(']', '')
-                        campo = parts[2].replace(']', '')
-                        
-                        if index not in variantes_nuevas:
-                            variantes_nuevas[index] = {}
-                        variantes_nuevas[index][campo] = value
-
-            for index, datos in variantes_nuevas.items():
-                talla_id = datos.get('talla')
-                color_id = datos.get('color')
-                stock = datos.get('stock', '0')
-                imagen_base64 = datos.get('imagen', '')
-                
-                if talla_id and color_id:
-                    try:
-                        talla_obj = Talla.objects.get(id=talla_id)
-                        color_obj = Color.objects.get(id=color_id)
-                        
-                        # Verificar si ya existe esta variante
-                        existe = VarianteProducto.objects.filter(
-                            producto=producto,
-                            talla=talla_obj,
-                            color=color_obj
-                        ).exists()
-                        
-                        if not existe:
-                            variante_nueva = VarianteProducto(
-                                producto=producto,
-                                talla=talla_obj,
-                                color=color_obj,
-                                stock=int(stock) if stock else 0
-                            )
-                            
-                            # Manejar imagen base64 si existe
-                            if imagen_base64:
-                                try:
-                                    image_data = procesar_imagen_base64(imagen_base64, "variante_nueva")
-                                    if image_data:
-                                        variante_nueva.imagen = image_data
-                                except ValueError as e:
-                                    messages.warning(request, f"Error en imagen de nueva variante: {str(e)}")
-                            
-                            variante_nueva.save()
-                            messages.info(request, f"Nueva variante agregada: {talla_obj.talla} - {color_obj.color}")
-                        else:
-                            messages.warning(request, f"La variante {talla_obj.talla} - {color_obj.color} ya existe.")
-                            
-                    except Talla.DoesNotExist:
-                        messages.error(request, f"Talla con ID {talla_id} no encontrada.")
-                    except Color.DoesNotExist:
-                        messages.error(request, f"Color con ID {color_id} no encontrado.")
-                    except Exception as e:
-                        messages.error(request, f"Error al crear nueva variante: {str(e)}")
-
-            # Validar que el producto tenga al menos una variante después de las operaciones
-            if not VarianteProducto.objects.filter(producto=producto).exists():
-                messages.error(request, "El producto debe tener al menos una variante.")
-            else:
-                messages.success(request, "Producto y variantes actualizados correctamente.")
+            # ===== CALCULAR Y APLICAR CAMBIOS DE VARIANTES =====
+            cambios = calcular_cambios_variantes(producto, request.POST, procesar_imagen_base64)
+            # El guardado del producto y los cambios de variantes reconstruyen
+            # sus datos derivados una sola vez, al cerrar el bloque
+            with transaction.atomic(), agrupar_actualizaciones():
+                producto.save()
+                reporte = aplicar_cambios_variantes(producto, cambios)
+
+                # Validar que el producto tenga al menos una variante después de las operaciones
+                sin_variantes = not VarianteProducto.objects.filter(producto=producto).exists()
+                if sin_variantes:
+                    transaction.set_rollback(True)
+
+            if sin_variantes:
+                messages.error(request, "El producto debe tener al menos una variante. No se guardaron los cambios.")
+                return redirect("editar_producto", idproducto=idproducto)
+
+            for nombre_variante in reporte['eliminadas']:
+                messages.info(request, f"Variante eliminada: {nombre_variante}")
+            for nombre_variante in reporte['creadas']:
+                messages.info(request, f"Nueva variante agregada: {nombre_variante}")
+            for error in reporte['errores']:
+                messages.warning(request, error)
+            messages.success(request, "Producto y variantes actualizados correctamente.")
                 
             return redirect("editar_producto", idproducto=idproducto)
             
@@ -1721,39 +1460,20 @@ def guardar_variantes(request, idproducto):
         if not colores:
             return JsonResponse({"error": "Debes seleccionar al menos un color"}, status=400)
 
-        talla_obj = Talla.objects.get(id=talla)
-        variantes_creadas = 0
-        errors = []
+        if not Talla.objects.filter(id=talla).exists():
+            raise Talla.DoesNotExist
 
-        for i, color_id in enumerate(colores):
-            try:
-                color_obj = Color.objects.get(id=color_id)
-                stock_val = int(stocks[i]) if i < len(stocks) and stocks[i] else 0
-                
-                # Verificar si ya existe
-                if VarianteProducto.objects.filter(
-                    producto=producto,
-                    talla=talla_obj,
-                    color=color_obj
-                ).exists():
-                    errors.append(f"La variante {talla_obj.talla} - {color_obj.color} ya existe")
-                    continue
-
-                VarianteProducto.objects.create(
-                    producto=producto,
-                    talla=talla_obj,
-                    color=color_obj,
-                    stock=stock_val,
-                    imagen=imagenes[i] if i < len(imagenes) else None
-                )
-                variantes_creadas += 1
-                
-            except Color.DoesNotExist:
-                errors.append(f"Color con ID {color_id} no encontrado")
-            except ValueError:
-                errors.append(f"Stock inválido para color {color_id}")
-            except Exception as e:
-                errors.append(f"Error al crear variante: {str(e)}")
+        filas = [
+            {
+                'talla': talla,
+                'color': color_id,
+                'stock': stocks[i] if i < len(stocks) else '0',
+                'imagen': imagenes[i] if i < len(imagenes) else None,
+            }
+            for i, color_id in enumerate(colores)
+        ]
+        creadas, errors = crear_variantes(producto, filas)
+        variantes_creadas = len(creadas)
 
         if errors:
             return JsonResponse({
@@ -2021,6 +1741,29 @@ def obtener_usuario(request, id):
     })
 
 
+@login_required
+@admin_required
+@permiso_requerido('usuarios')
+def correos_masivos(request):
+    if request.method == 'POST':
+        form = EnvioMasivoForm(request.POST)
+        if form.is_valid():
+            envio = form.save(commit=False)
+            envio.creado_por = request.user
+            envio.save()
+            # El envío se despacha fuera de la petición (enviar_correos_masivos)
+            messages.success(request, f"El envío \"{envio.asunto}\" quedó en cola.")
+            return redirect('correos_masivos')
+    else:
+        form = EnvioMasivoForm()
+
+    return render(request, 'admin/usuarios/correos_masivos.html', {
+        'form': form,
+        'envios': envios_con_resumen()[:20],
+        'active': 'usuarios'
+    })
+
+
 # ==========================================================
 #                   GESTIÓN DE PEDIDOS (ADMIN)
 # ==========================================================
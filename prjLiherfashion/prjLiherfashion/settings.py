@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # App local
     'appLiher',
@@ -72,19 +73,30 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [os.path.join(BASE_DIR, 'appLiher', 'Templates')],
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'appLiher' / 'templates'],
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',  # necesario para allauth
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'appLiher.context_processors.carrito_context',  # contador del carrito
+            ],
+            # Loader en caché explícito: cada worker compila una plantilla una
+            # sola vez (ver PRECOMPILAR_PLANTILLAS en wsgi.py)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
 ]
 
+# Compilar todas las plantillas de appLiher al arrancar cada worker de gunicorn
+PRECOMPILAR_PLANTILLAS = os.environ.get('PRECOMPILAR_PLANTILLAS', str(not DEBUG)) == 'True'
+
 WSGI_APPLICATION = 'prjLiherfashion.wsgi.application'
 
 # -------------------------------------------------------------------
@@ -106,6 +118,59 @@ DATABASES={
         'PORT': os.environ.get('POSTGRES_PORT'),
     }
 }
+# -------------------------------------------------------------------
+# Caché
+# -------------------------------------------------------------------
+# Con varios workers de gunicorn o los workers de docker-compose hace falta
+# Redis (REDIS_URL) para que las invalidaciones, las claves de idempotencia
+# y el límite de intentos se vean en todos los procesos; sin él se usa
+# memoria local, válida solo para un único proceso (desarrollo, tests).
+CACHE_COMPARTIDA = bool(os.environ.get('REDIS_URL'))
+if CACHE_COMPARTIDA:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'liherfashion',
+        }
+    }
+
+# Segundos que se reutilizan las métricas del panel de administración
+METRICAS_PANEL_TTL = 60
+
+# Segundos que se guarda cada respuesta del autocompletado del buscador
+AUTOCOMPLETAR_TTL = 300
+
+# Resultados más relevantes (20 páginas de 12) que devuelve la búsqueda con el índice en memoria
+BUSQUEDA_MAX_RESULTADOS = 240
+
+# Segundos que se guarda el JSON de detalle de cada versión de un producto
+DETALLE_PRODUCTO_TTL = 3600
+
+# Segundos que se guarda el stock de cada variante (ver appLiher.stock)
+STOCK_CACHE_TTL = 300
+
+# Segundos que se reutiliza el total aproximado de los listados paginados por cursor
+PAGINACION_TOTAL_TTL = 300
+
+# Segundos que se guardan las tarjetas y los filtros renderizados de la tienda
+FRAGMENTOS_TTL = 3600
+
+# -------------------------------------------------------------------
+# Sesiones
+# -------------------------------------------------------------------
+# Motor propio que no escribe la sesión si sus datos no cambiaron. Lee de
+# la caché solo si es compartida (Redis); con memoria local usa la base de
+# datos. Las sesiones vencidas se borran con el comando purgar_sesiones.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'appLiher.sesiones')
+SESIONES_EN_CACHE = CACHE_COMPARTIDA
+
 # -------------------------------------------------------------------
 # Password validators
 # -------------------------------------------------------------------
@@ -146,11 +211,25 @@ AUTH_USER_MODEL = 'appLiher.Usuarios'
 # Backends de autenticación
 # -------------------------------------------------------------------
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',  # necesario para admin
-    'appLiher.backends.EmailBackend',             # tu backend por email
+    'appLiher.backends.EmailBackend',             # email (también admin); decide solo los intentos por email
+    'django.contrib.auth.backends.ModelBackend',  # sesiones iniciadas antes con este backend
     'allauth.account.auth_backends.AuthenticationBackend',  # allauth
 ]
 
+# Límite de intentos fallidos de acceso (cubetas de fichas en la caché):
+# intentos seguidos permitidos por correo y segundos para recuperar cada
+# intento
+ACCESO_INTENTOS_EMAIL = 5
+ACCESO_RECARGA_SEGUNDOS = 60
+# Límite por IP, desactivado con 0. Detrás de un proxy o balanceador todos
+# los clientes llegan con la misma REMOTE_ADDR, así que solo debe
+# activarse junto con ACCESO_CABECERA_IP: la cabecera donde el proxy de
+# confianza deja la IP real (p. ej. HTTP_X_FORWARDED_FOR), de la que se
+# toma la entrada agregada por el primero de ACCESO_PROXIES_CONFIABLES
+ACCESO_INTENTOS_IP = int(os.environ.get('ACCESO_INTENTOS_IP', 0))
+ACCESO_CABECERA_IP = os.environ.get('ACCESO_CABECERA_IP')
+ACCESO_PROXIES_CONFIABLES = int(os.environ.get('ACCESO_PROXIES_CONFIABLES', 1))
+
 # -------------------------------------------------------------------
 # Configuración de Allauth (API nueva sin warnings 🚀)
 # -------------------------------------------------------------------
@@ -210,3 +289,47 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Las vistas solo encolan correos (appLiher.correos); los envía el comando
+# enviar_correos. Backend usado por ese worker (en pruebas:
+# django.core.mail.backends.locmem.EmailBackend, que los deja en memoria)
+CORREOS_BACKEND = config("CORREOS_BACKEND", default=EMAIL_BACKEND)
+# Intentos antes de marcar un correo como fallido
+CORREOS_MAX_INTENTOS = 5
+# Espera antes del primer reintento; se duplica en cada fallo (máximo 1 hora)
+CORREOS_REINTENTO_SEGUNDOS = 60
+# Tiempo que un worker retiene un lote antes de que otro pueda tomarlo
+CORREOS_BLOQUEO_SEGUNDOS = 300
+# Envíos masivos (comando enviar_correos_masivos): ritmo máximo aceptado
+# por el proveedor y mensajes por sesión SMTP antes de reconectar
+CORREOS_MASIVOS_POR_SEGUNDO = 5
+CORREOS_MASIVOS_POR_CONEXION = 100
+
+
+# -------------------------------------------------------------------
+# Carrito
+# -------------------------------------------------------------------
+# Minutos que se mantiene apartado el stock de un ítem del carrito
+RESERVA_STOCK_MINUTOS = 30
+# Días sin actividad tras los que un carrito sin completar se considera
+# abandonado (comando purgar_carritos)
+CARRITO_ABANDONADO_DIAS = 14
+# Segundos que se guarda la respuesta de un POST con clave de idempotencia
+# (agregar/actualizar carrito, finalizar compra) para reproducirla
+IDEMPOTENCIA_TTL = 600
+# Espera máxima de un reenvío mientras la petición original sigue en curso
+IDEMPOTENCIA_ESPERA_SEGUNDOS = 5
+
+# -------------------------------------------------------------------
+# Logging
+# -------------------------------------------------------------------
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'appLiher': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
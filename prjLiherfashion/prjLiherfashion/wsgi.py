@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'prjLiherfashion.settings')
 
 application = get_wsgi_application()
+
+# Sin --preload cada worker de gunicorn importa este módulo: se calienta el
+# loader en caché de ese worker antes de recibir peticiones
+if settings.PRECOMPILAR_PLANTILLAS:
+    from appLiher.plantillas import precompilar_plantillas
+    precompilar_plantillas()